@@ -0,0 +1,119 @@
+"""
+Incremental extraction of the "answer" string from a streamed answer JSON.
+
+The formatting LLM call writes {"answer": "...", "citations": [...]}. Clients of
+/ask should see the answer text as it is written, not the JSON around it, so the
+tokens are scanned as they arrive and only the decoded characters of the
+top-level "answer" value are passed on. Output that does not start with a JSON
+object (optionally inside a ```json fence) is passed through unchanged, matching
+draft_answer's fallback of using the raw completion as the answer.
+"""
+from typing import List, Optional
+
+ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class AnswerStream:
+    """Feed raw completion tokens; feed() returns the answer text they contain (possibly "")."""
+
+    def __init__(self) -> None:
+        # None until the first meaningful character, then "json", "raw" or "done"
+        self.mode: Optional[str] = None
+        self._fence = False
+        self._depth = 0
+        self._in_string = False
+        self._escape: Optional[str] = None
+        self._high_surrogate: Optional[int] = None
+        self._expect_key = False
+        self._key: List[str] = []
+        self._last_key: Optional[str] = None
+        self._value_key: Optional[str] = None
+        self._in_answer = False
+        self._out: List[str] = []
+
+    def feed(self, token: str) -> str:
+        self._out = []
+        for i, ch in enumerate(token):
+            if self.mode == "done":
+                break
+            if self.mode is None:
+                self._start(ch)
+            elif self.mode == "json":
+                self._scan(ch)
+            if self.mode == "raw":
+                self._out.append(token[i:])
+                break
+        return "".join(self._out)
+
+    def _start(self, ch: str) -> None:
+        if self._fence:
+            # skip the rest of the ```json line
+            if ch == "\n":
+                self._fence = False
+        elif ch == "`":
+            self._fence = True
+        elif ch == "{":
+            self.mode = "json"
+            self._scan(ch)
+        elif not ch.isspace():
+            self.mode = "raw"
+
+    def _emit(self, text: str) -> None:
+        if self._in_answer:
+            self._out.append(text)
+        elif self._expect_key:
+            self._key.append(text)
+
+    def _unescape(self, code: str) -> None:
+        if code[0] != "u":
+            self._emit(ESCAPES.get(code, code))
+            return
+        point = int(code[1:], 16)
+        if 0xD800 <= point < 0xDC00:
+            self._high_surrogate = point
+            return
+        if 0xDC00 <= point < 0xE000 and self._high_surrogate is not None:
+            point = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (point - 0xDC00)
+        self._high_surrogate = None
+        self._emit(chr(point))
+
+    def _scan(self, ch: str) -> None:
+        if self._in_string:
+            if self._escape is not None:
+                self._escape += ch
+                if self._escape[0] != "u" or len(self._escape) == 5:
+                    try:
+                        self._unescape(self._escape)
+                    except ValueError:
+                        pass
+                    self._escape = None
+            elif ch == "\\":
+                self._escape = ""
+            elif ch == '"':
+                self._in_string = False
+                if self._in_answer:
+                    self._in_answer = False
+                    self.mode = "done"
+                elif self._expect_key:
+                    self._last_key = "".join(self._key)
+            else:
+                self._emit(ch)
+            return
+
+        if ch == '"':
+            self._in_string = True
+            self._key = []
+            if self._depth == 1 and not self._expect_key and self._value_key == "answer":
+                self._in_answer = True
+            self._value_key = None
+        elif ch in "{[":
+            self._depth += 1
+            self._expect_key = self._depth == 1
+            self._value_key = None
+        elif ch in "}]":
+            self._depth -= 1
+        elif self._depth == 1 and ch == ",":
+            self._expect_key = True
+        elif self._depth == 1 and ch == ":":
+            self._expect_key = False
+            self._value_key = self._last_key
@@ -0,0 +1,361 @@
+"""
+Deterministic local stand-ins for Supabase and OpenAI used by the benchmarks.
+
+FakeSupabase keeps tables as lists of dicts and honours the query-builder calls the
+backend makes (table/select/eq/in_/order/range/limit/insert/upsert/update/delete/rpc);
+FakeAsyncSupabase is the same store behind awaitable execute() calls. FakeOpenAI
+and FakeChatModel answer every prompt the pipelines send with a canned reply after
+a configurable, seeded latency.
+"""
+import asyncio
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from lexical import tokenize
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class Latency:
+    """Seeded latency source: `base_ms` plus uniform jitter of up to +/- `jitter_ms`."""
+
+    def __init__(self, base_ms: float = 0.0, jitter_ms: float = 0.0, seed: int = 0) -> None:
+        self.base_ms = base_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def seconds(self) -> float:
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, self.base_ms + jitter) / 1000
+
+    def sleep(self) -> None:
+        delay = self.seconds()
+        if delay:
+            time.sleep(delay)
+
+    async def asleep(self) -> None:
+        delay = self.seconds()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+# --- Supabase ---
+
+class FakeQuery:
+    def __init__(self, db: "FakeSupabase", table: str) -> None:
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.filters = []
+        self.order_by = None
+        self.row_range = None
+        self.row_limit = None
+
+    def select(self, *_args, **_kwargs):
+        self.op = "select"
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def upsert(self, payload):
+        self.op, self.payload = "upsert", payload
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = set(values)
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self.row_range = (start, end)
+        return self
+
+    def limit(self, count):
+        self.row_limit = count
+        return self
+
+    def _run(self) -> FakeResponse:
+        with self.db.lock:
+            self.db.calls[(self.table, self.op)] = self.db.calls.get((self.table, self.op), 0) + 1
+            rows = self.db.tables.setdefault(self.table, [])
+
+            if self.op == "upsert":
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                stored = []
+                for row in payload:
+                    match = next((r for r in rows if "id" in row and r.get("id") == row["id"]), None)
+                    if match is None:
+                        match = dict(row)
+                        match.setdefault("id", self.db.next_id())
+                        rows.append(match)
+                    else:
+                        match.update(row)
+                    stored.append(dict(match))
+                return FakeResponse(stored)
+
+            if self.op == "insert":
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                inserted = []
+                for row in payload:
+                    row = dict(row)
+                    row.setdefault("id", self.db.next_id())
+                    rows.append(row)
+                    inserted.append(dict(row))
+                return FakeResponse(inserted)
+
+            matched = [row for row in rows if all(f(row) for f in self.filters)]
+            if self.op == "update":
+                for row in matched:
+                    row.update(self.payload)
+                return FakeResponse([dict(row) for row in matched])
+            if self.op == "delete":
+                removed = {id(row) for row in matched}
+                self.db.tables[self.table] = [row for row in rows if id(row) not in removed]
+                return FakeResponse([dict(row) for row in matched])
+
+            if self.order_by:
+                column, desc = self.order_by
+                matched.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+            if self.row_range:
+                matched = matched[self.row_range[0]:self.row_range[1] + 1]
+            if self.row_limit is not None:
+                matched = matched[:self.row_limit]
+            return FakeResponse([dict(row) for row in matched])
+
+    def execute(self) -> FakeResponse:
+        self.db.latency.sleep()
+        return self._run()
+
+
+class FakeRpc:
+    def __init__(self, db: "FakeSupabase", name: str, params: Dict) -> None:
+        self.db = db
+        self.name = name
+        self.params = params
+
+    def _run(self) -> FakeResponse:
+        if self.name != "search_chunks":
+            raise ValueError(f"unknown rpc {self.name}")
+        return FakeResponse(self.db.search_chunks(self.params["q"], self.params["k"], self.params.get("doc")))
+
+    def execute(self) -> FakeResponse:
+        self.db.latency.sleep()
+        return self._run()
+
+
+class FakeSupabase:
+    """
+    In-memory Supabase client. `search_chunks` ranks chunks by how many query
+    terms they contain, standing in for the Postgres hybrid search function.
+    """
+
+    def __init__(self, latency: Optional[Latency] = None) -> None:
+        self.tables: Dict[str, List[Dict]] = {}
+        self.calls: Dict[tuple, int] = {}
+        self.latency = latency or Latency()
+        self.lock = threading.RLock()
+        self._ids = itertools.count(1)
+        # chunk id -> terms, so the fake search costs little next to the code being measured
+        self._terms: Dict[str, frozenset] = {}
+
+    def next_id(self) -> str:
+        return f"id-{next(self._ids)}"
+
+    def table(self, name: str) -> FakeQuery:
+        return FakeQuery(self, name)
+
+    def rpc(self, name: str, params: Dict) -> FakeRpc:
+        return FakeRpc(self, name, params)
+
+    def search_chunks(self, query: str, top_k: int, document_id: Optional[str]) -> List[Dict]:
+        terms = set(tokenize(query))
+        with self.lock:
+            rows = [
+                row for row in self.tables.get("chunks", [])
+                if document_id is None or row.get("document_id") == document_id
+            ]
+        scored = []
+        for row in rows:
+            row_terms = self._terms.get(row["id"])
+            if row_terms is None:
+                row_terms = self._terms[row["id"]] = frozenset(
+                    tokenize(f"{row.get('section_heading')} {row.get('content')}")
+                )
+            score = len(terms & row_terms)
+            if score:
+                scored.append((score, row))
+        scored.sort(key=lambda item: -item[0])
+        return [
+            {
+                "id": row["id"],
+                "document_id": row.get("document_id"),
+                "section_heading": row.get("section_heading"),
+                "content": row.get("content"),
+                "summary": row.get("summary"),
+                "score": score,
+            }
+            for score, row in scored[:top_k]
+        ]
+
+
+class _AsyncQuery:
+    def __init__(self, query) -> None:
+        self._query = query
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if not callable(attr):
+            return attr
+
+        def chain(*args, **kwargs):
+            attr(*args, **kwargs)
+            return self
+        return chain
+
+    async def execute(self) -> FakeResponse:
+        await self._query.db.latency.asleep()
+        return self._query._run()
+
+
+class FakeAsyncSupabase:
+    """The same store as a FakeSupabase, with awaitable execute() like supabase's AClient."""
+
+    def __init__(self, db: FakeSupabase) -> None:
+        self.db = db
+
+    def table(self, name: str) -> _AsyncQuery:
+        return _AsyncQuery(self.db.table(name))
+
+    def rpc(self, name: str, params: Dict) -> _AsyncQuery:
+        return _AsyncQuery(self.db.rpc(name, params))
+
+
+# --- LLMs ---
+
+def fake_reply(system: str, user: str) -> str:
+    """A canned reply for every prompt the ingestion pipeline and the graph send."""
+    if "route clinical questions" in system:
+        return "[]"
+    if "Table of Contents" in user:
+        headings = [line.strip()[2:] for line in user.splitlines() if line.strip().startswith("- ")]
+        return str(headings[:2]).replace("'", '"')
+    if "clinical validator" in system:
+        return "yes"
+    if "Quality Assurance" in system:
+        return '{"status": "pass", "feedback": null}'
+    if '"sufficient"' in system or "clinical assistant" in system:
+        # cite the first section in the context, like a well-behaved model would
+        cited = re.search(r"\[Source: ([^\]]+)\]", user)
+        heading = cited.group(1) if cited else "Treatment"
+        answer = {"answer": f"See the guideline [Source: {heading}]", "citations": [heading]}
+        if '"sufficient"' in system:
+            answer = {"sufficient": "yes", **answer}
+        return json.dumps(answer)
+    if "identify all headings" in user:
+        return '{"headings": []}'
+    return "Summary: " + " ".join(user.split()[-40:])
+
+
+class _Message:
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+
+class _Choice:
+    def __init__(self, content: str) -> None:
+        self.message = _Message(content)
+
+
+class _Usage:
+    def __init__(self, prompt_tokens: int, completion_tokens: int) -> None:
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class _Completion:
+    def __init__(self, content: str, prompt: str = "") -> None:
+        self.choices = [_Choice(content)]
+        # word counts stand in for tokens
+        self.usage = _Usage(len(prompt.split()), len(content.split()))
+
+
+class _Completions:
+    def __init__(self, owner: "FakeOpenAI") -> None:
+        self._owner = owner
+
+    def create(self, model: str, messages: List[Dict], **_params) -> _Completion:
+        self._owner.latency.sleep()
+        self._owner.calls += 1
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        return _Completion(fake_reply(system, messages[-1]["content"]), " ".join(m["content"] for m in messages))
+
+
+class _Chat:
+    def __init__(self, owner: "FakeOpenAI") -> None:
+        self.completions = _Completions(owner)
+
+
+class FakeOpenAI:
+    """Stand-in for openai.OpenAI (chat.completions.create only)."""
+
+    def __init__(self, latency: Optional[Latency] = None) -> None:
+        self.latency = latency or Latency()
+        self.calls = 0
+        self.chat = _Chat(self)
+
+
+class FakeChatModel:
+    """Stand-in for langchain_openai.ChatOpenAI (invoke and stream)."""
+
+    model_name = "fake-chat"
+    temperature = 0.7
+
+    def __init__(self, latency: Optional[Latency] = None, stream_chunk_chars: int = 8) -> None:
+        self.latency = latency or Latency()
+        self.stream_chunk_chars = stream_chunk_chars
+        self.calls = 0
+
+    def _reply(self, messages) -> str:
+        self.latency.sleep()
+        self.calls += 1
+        system = messages[0].content if messages[0].type == "system" else ""
+        return fake_reply(system, messages[-1].content)
+
+    def invoke(self, messages) -> AIMessage:
+        return AIMessage(content=self._reply(messages))
+
+    def stream(self, messages):
+        reply = self._reply(messages)
+        for i in range(0, len(reply), self.stream_chunk_chars):
+            yield AIMessageChunk(content=reply[i:i + self.stream_chunk_chars])
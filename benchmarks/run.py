@@ -0,0 +1,241 @@
+"""
+Offline benchmarks for ingestion, /search and the question-answering graph.
+
+Everything runs against the in-memory stand-ins in benchmarks/fakes.py, so no
+Supabase project or OpenAI key is needed. Results are printed (or written with
+--output) as JSON so runs can be compared between commits:
+
+    python -m benchmarks.run --documents 20 --search-clients 16 --output before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+# Settings are read once at import time; keep the LLM response cache out of the measurements.
+os.environ["LLM_CACHE_ENABLED"] = "false"
+
+from benchmarks.fakes import FakeAsyncSupabase, FakeChatModel, FakeOpenAI, FakeSupabase, Latency  # noqa: E402
+
+TERMS = """
+metformin insulin glucose hba1c hypertension statin aspirin renal hepatic dose titration
+retinopathy neuropathy foot ulcer screening pregnancy gestational hypoglycaemia sulfonylurea
+glp1 sglt2 cardiovascular stroke cholesterol lipid weight diet exercise monitoring referral
+""".split()
+CHAPTERS = ["Introduction", "Diagnosis", "Treatment", "Monitoring", "Complications", "Special Populations"]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """p50/p95/p99/mean/max of latencies in seconds, reported in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+
+    def pick(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(50) * 1000, 3),
+        "p95_ms": round(pick(95) * 1000, 3),
+        "p99_ms": round(pick(99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def make_document(rng: random.Random, sections_per_chapter: int, words_per_section: int) -> str:
+    """Synthetic guideline with numbered chapters and sections the local heading detector recognises."""
+    parts = []
+    for c, chapter in enumerate(CHAPTERS, 1):
+        parts.append(f"{c} {chapter}\n\n{' '.join(rng.choices(TERMS, k=words_per_section))}.\n")
+        for s in range(1, sections_per_chapter + 1):
+            parts.append(
+                f"{c}.{s} {rng.choice(TERMS).title()} {rng.choice(TERMS)}\n\n"
+                f"{' '.join(rng.choices(TERMS, k=words_per_section))}.\n"
+            )
+    return "\n".join(parts)
+
+
+def install_fakes(db: FakeSupabase, openai_client: FakeOpenAI, chat_model: FakeChatModel) -> None:
+    """Point every module that talks to Supabase or OpenAI at the stand-ins."""
+    import data_version
+    import document_router
+    import lang_pipeline
+    import pipeline
+    import search_service
+    import toc_index
+
+    async_db = FakeAsyncSupabase(db)
+
+    async def get_async_client():
+        return async_db
+
+    for module in (pipeline, search_service, toc_index, document_router, lang_pipeline, data_version):
+        module.get_supabase_client = lambda: db
+    search_service.get_async_supabase_client = get_async_client
+    data_version.get_async_supabase_client = get_async_client
+    pipeline.get_openai_client = lambda: openai_client
+    lang_pipeline.get_chat_model = lambda: chat_model
+
+
+def bench_ingest(db: FakeSupabase, openai_client: FakeOpenAI, args, rng: random.Random) -> Dict:
+    import pipeline
+
+    texts = [make_document(rng, args.sections, args.words) for _ in range(args.documents)]
+    calls_before = openai_client.calls
+    started = time.perf_counter()
+    statuses = []
+    # the pipeline narrates every step (and tqdm draws on stderr); keep the JSON output clean
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        for i, text in enumerate(texts):
+            statuses.append(pipeline.process_document(text, f"doc-{i}.txt", f"benchmark://doc-{i}.txt"))
+    seconds = time.perf_counter() - started
+    chunks = len(db.tables.get("chunks", []))
+
+    return {
+        "documents": len(texts),
+        "processed": statuses.count("processed"),
+        "chunks": chunks,
+        "seconds": round(seconds, 4),
+        "chunks_per_second": round(chunks / seconds, 2) if seconds else None,
+        "llm_calls": openai_client.calls - calls_before,
+    }
+
+
+def bench_search(args, rng: random.Random) -> Dict:
+    import search_service
+
+    queries = [" ".join(rng.sample(TERMS, 2)) for _ in range(args.search_requests)]
+    search_service.invalidate_document()
+    latencies: List[float] = []
+    errors = 0
+
+    async def client(my_queries: List[str]):
+        nonlocal errors
+        for query in my_queries:
+            started = time.perf_counter()
+            try:
+                await search_service.search_chunks_async(query, args.top_k)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    async def run():
+        clients = max(1, args.search_clients)
+        await asyncio.gather(*(client(queries[i::clients]) for i in range(clients)))
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(run())
+    seconds = time.perf_counter() - started
+
+    return {
+        "clients": args.search_clients,
+        "requests": len(queries),
+        "errors": errors,
+        "seconds": round(seconds, 4),
+        "requests_per_second": round(len(queries) / seconds, 2) if seconds else None,
+        "latency": percentiles(latencies),
+        "result_cache": search_service.result_cache_stats(),
+    }
+
+
+def bench_graph(chat_model: FakeChatModel, args, rng: random.Random) -> Dict:
+    """
+    Per-node latency from the gaps between streamed state updates; the graph runs
+    one node at a time, so each gap is that node's run time.
+    """
+    import lang_pipeline
+
+    node_times: Dict[str, List[float]] = {}
+    totals: List[float] = []
+    calls_before = chat_model.calls
+
+    for i in range(args.graph_runs):
+        state = {
+            "query": " ".join(rng.sample(TERMS, 3)),
+            "document_id": None,
+            "retry_count": 0,
+            "review_feedback": None,
+            "mode": args.mode,
+        }
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = last = time.perf_counter()
+            for step in lang_pipeline.get_graph().stream(state, stream_mode="updates"):
+                now = time.perf_counter()
+                for node in step:
+                    node_times.setdefault(node, []).append(now - last)
+                last = now
+        totals.append(last - started)
+
+    return {
+        "runs": args.graph_runs,
+        "mode": args.mode,
+        "llm_calls": chat_model.calls - calls_before,
+        "total": percentiles(totals),
+        "nodes": {node: percentiles(times) for node, times in node_times.items()},
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return ""
+
+
+def main(argv=None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10, help="synthetic documents to ingest")
+    parser.add_argument("--sections", type=int, default=4, help="sections per chapter")
+    parser.add_argument("--words", type=int, default=120, help="words per section")
+    parser.add_argument("--search-clients", type=int, default=8, help="concurrent /search clients")
+    parser.add_argument("--search-requests", type=int, default=400, help="total searches across all clients")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--graph-runs", type=int, default=10)
+    parser.add_argument("--mode", default="sequential", help="answer mode passed to the graph")
+    parser.add_argument("--llm-latency-ms", type=float, default=20.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=5.0)
+    parser.add_argument("--db-latency-ms", type=float, default=2.0)
+    parser.add_argument("--db-jitter-ms", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    db = FakeSupabase(Latency(args.db_latency_ms, args.db_jitter_ms, seed=args.seed))
+    openai_client = FakeOpenAI(Latency(args.llm_latency_ms, args.llm_jitter_ms, seed=args.seed + 1))
+    chat_model = FakeChatModel(Latency(args.llm_latency_ms, args.llm_jitter_ms, seed=args.seed + 2))
+    install_fakes(db, openai_client, chat_model)
+
+    rng = random.Random(args.seed)
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "parameters": vars(args),
+        "ingest": bench_ingest(db, openai_client, args, rng),
+        "search": bench_search(args, rng),
+        "graph": bench_graph(chat_model, args, rng),
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from config import get_settings
+from lexical import tokenize
+from supabase_client import get_supabase_client
+
+MAGIC = b"BM25IDX1"
+# chunk columns stored with each indexed row and returned by search()
+FIELDS = ("id", "document_id", "section_heading", "content", "summary")
+
+
+def _indexed_text(row: Dict) -> str:
+    return " ".join(str(row.get(f) or "") for f in ("section_heading", "summary", "content"))
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over chunk section_heading, summary and content.
+
+    Postings are int32 arrays: a snapshot loaded from disk is memory-mapped and
+    read in place, and rows added afterwards go into small in-memory postings
+    that are merged in at query time. Removed rows are tombstoned and dropped
+    when the next snapshot is written.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        # term -> (start, count) into the snapshot postings
+        self._base_terms: Dict[str, List[int]] = {}
+        self._base_docs = memoryview(array("i"))
+        self._base_tfs = memoryview(array("i"))
+        self._base_meta_offsets = memoryview(array("q", [0]))
+        self._base_meta = memoryview(b"")
+        self._base_count = 0
+        self._mmap: Optional[mmap.mmap] = None
+        # term -> (doc ids, term frequencies) for rows added since the snapshot
+        self._delta: Dict[str, tuple] = {}
+        self._delta_meta: List[bytes] = []
+        self.doc_lengths = array("i")
+        self._doc_document = array("i")  # row -> index into _document_ids
+        self._document_ids: List[str] = []
+        self._document_ordinals: Dict[str, int] = {}
+        self._deleted = bytearray()
+        self._live = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._live
+
+    # --- building ---
+
+    def _document_ordinal(self, document_id: Optional[str]) -> int:
+        key = document_id or ""
+        if key not in self._document_ordinals:
+            self._document_ordinals[key] = len(self._document_ids)
+            self._document_ids.append(key)
+        return self._document_ordinals[key]
+
+    def add_chunks(self, rows: Iterable[Dict]) -> None:
+        """Index chunk rows (dicts with the FIELDS columns)."""
+        with self._lock:
+            for row in rows:
+                doc = len(self.doc_lengths)
+                terms = tokenize(_indexed_text(row))
+                for term, tf in Counter(terms).items():
+                    postings = self._delta.get(term)
+                    if postings is None:
+                        postings = self._delta[term] = (array("i"), array("i"))
+                    postings[0].append(doc)
+                    postings[1].append(tf)
+                self.doc_lengths.append(len(terms))
+                self._doc_document.append(self._document_ordinal(row.get("document_id")))
+                self._deleted.append(0)
+                self._delta_meta.append(json.dumps({f: row.get(f) for f in FIELDS}).encode("utf-8"))
+                self._live += 1
+                self._total_length += len(terms)
+
+    def remove_document(self, document_id: str) -> int:
+        """Tombstone every row of a document; returns how many rows were removed."""
+        with self._lock:
+            ordinal = self._document_ordinals.get(document_id)
+            if ordinal is None:
+                return 0
+            removed = 0
+            for doc, owner in enumerate(self._doc_document):
+                if owner == ordinal and not self._deleted[doc]:
+                    self._deleted[doc] = 1
+                    self._live -= 1
+                    self._total_length -= self.doc_lengths[doc]
+                    removed += 1
+            return removed
+
+    def replace_document(self, document_id: str, rows: Iterable[Dict]) -> None:
+        with self._lock:
+            self.remove_document(document_id)
+            self.add_chunks(rows)
+
+    # --- querying ---
+
+    def _postings(self, term: str):
+        base = self._base_terms.get(term)
+        if base is not None:
+            start, count = base
+            yield from zip(self._base_docs[start:start + count], self._base_tfs[start:start + count])
+        delta = self._delta.get(term)
+        if delta is not None:
+            yield from zip(delta[0], delta[1])
+
+    def _row(self, doc: int) -> Dict:
+        if doc < self._base_count:
+            start, end = self._base_meta_offsets[doc], self._base_meta_offsets[doc + 1]
+            return json.loads(bytes(self._base_meta[start:end]))
+        return json.loads(self._delta_meta[doc - self._base_count])
+
+    def search(self, query: str, top_k: int = 3, document_id: Optional[str] = None) -> List[Dict]:
+        """Top-k chunk rows by BM25 score, optionally restricted to one document."""
+        terms = set(tokenize(query))
+        with self._lock:
+            if not terms or not self._live:
+                return []
+            if document_id is not None:
+                ordinal = self._document_ordinals.get(document_id)
+                if ordinal is None:
+                    return []
+            avg_length = self._total_length / self._live or 1.0
+
+            scores: Dict[int, float] = {}
+            for term in terms:
+                postings = [
+                    (doc, tf) for doc, tf in self._postings(term)
+                    if not self._deleted[doc]
+                ]
+                if not postings:
+                    continue
+                idf = math.log(1 + (self._live - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc, tf in postings:
+                    if document_id is not None and self._doc_document[doc] != ordinal:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc] / avg_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+            return [{**self._row(doc), "score": round(score, 6)} for doc, score in best]
+
+    # --- snapshots ---
+
+    def save(self, path: str) -> None:
+        """
+        Write a compacted snapshot (tombstoned rows dropped) to `path` atomically.
+        Layout: MAGIC | header length | JSON header | int32 doc lengths | int32 document
+        ordinals | int32 posting doc ids | int32 posting tfs | int64 row offsets | row JSON.
+        """
+        with self._lock:
+            live = [doc for doc in range(len(self.doc_lengths)) if not self._deleted[doc]]
+            renumber = {doc: i for i, doc in enumerate(live)}
+
+            terms = {}
+            docs, tfs = array("i"), array("i")
+            for term in sorted(set(self._base_terms) | set(self._delta)):
+                start = len(docs)
+                for doc, tf in self._postings(term):
+                    if doc in renumber:
+                        docs.append(renumber[doc])
+                        tfs.append(tf)
+                if len(docs) > start:
+                    terms[term] = [start, len(docs) - start]
+
+            offsets = array("q", [0])
+            meta = bytearray()
+            for doc in live:
+                if doc < self._base_count:
+                    meta += self._base_meta[self._base_meta_offsets[doc]:self._base_meta_offsets[doc + 1]]
+                else:
+                    meta += self._delta_meta[doc - self._base_count]
+                offsets.append(len(meta))
+
+            header = json.dumps({
+                "num_docs": len(live),
+                "num_postings": len(docs),
+                "document_ids": self._document_ids,
+                "terms": terms,
+            }).encode("utf-8")
+            header += b" " * (-(len(MAGIC) + 8 + len(header)) % 8)
+
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(MAGIC)
+                f.write(struct.pack("<Q", len(header)))
+                f.write(header)
+                array("i", (self.doc_lengths[d] for d in live)).tofile(f)
+                array("i", (self._doc_document[d] for d in live)).tofile(f)
+                docs.tofile(f)
+                tfs.tofile(f)
+                if len(live) % 2:
+                    f.write(b"\0" * 4)  # keep the int64 offsets 8-byte aligned
+                offsets.tofile(f)
+                f.write(meta)
+            os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        """Open a snapshot written by save(); postings and rows stay memory-mapped."""
+        index = cls()
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{path} is not a BM25 index snapshot")
+
+        pos = len(MAGIC)
+        (header_length,) = struct.unpack("<Q", view[pos:pos + 8])
+        pos += 8
+        header = json.loads(bytes(view[pos:pos + header_length]))
+        pos += header_length
+
+        num_docs, num_postings = header["num_docs"], header["num_postings"]
+
+        def take(typecode: str, count: int) -> memoryview:
+            nonlocal pos
+            size = array(typecode).itemsize * count
+            section = view[pos:pos + size].cast(typecode)
+            pos += size
+            return section
+
+        index.doc_lengths = array("i", take("i", num_docs))
+        index._doc_document = array("i", take("i", num_docs))
+        index._base_docs = take("i", num_postings)
+        index._base_tfs = take("i", num_postings)
+        if num_docs % 2:
+            pos += 4
+        index._base_meta_offsets = take("q", num_docs + 1)
+        index._base_meta = view[pos:]
+
+        index._mmap = mapped
+        index._base_terms = header["terms"]
+        index._base_count = num_docs
+        index._document_ids = header["document_ids"]
+        index._document_ordinals = {doc_id: i for i, doc_id in enumerate(index._document_ids)}
+        index._deleted = bytearray(num_docs)
+        index._live = num_docs
+        index._total_length = sum(index.doc_lengths)
+        return index
+
+
+def build_from_supabase(page_size: int = 1000) -> BM25Index:
+    """Index every row of the chunks table, reading it page by page."""
+    sb = get_supabase_client()
+    index = BM25Index()
+    start = 0
+    while True:
+        rows = sb.table("chunks") \
+            .select(", ".join(FIELDS)) \
+            .order("id") \
+            .range(start, start + page_size - 1) \
+            .execute().data or []
+        index.add_chunks(rows)
+        if len(rows) < page_size:
+            return index
+        start += page_size
+
+
+_index: Optional[BM25Index] = None
+_index_lock = threading.Lock()
+# mtime of the snapshot _index was loaded from (or last saved to), and when it was last checked
+_snapshot_mtime: Optional[float] = None
+_checked_at = float("-inf")
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _reload_due() -> bool:
+    interval = get_settings().bm25_reload_check_seconds
+    return interval >= 0 and time.monotonic() - _checked_at >= interval
+
+
+def get_index() -> BM25Index:
+    """
+    Process-wide index: loaded from the BM25_INDEX_PATH snapshot when it exists,
+    otherwise built from the chunks table and snapshotted for the next worker.
+    The snapshot is stat'ed at most every BM25_RELOAD_CHECK_SECONDS and reloaded
+    when another process (an ingest run) has rewritten it.
+    """
+    global _index, _snapshot_mtime, _checked_at
+    if _index is not None and not _reload_due():
+        return _index
+    with _index_lock:
+        path = get_settings().bm25_index_path
+        if _index is None:
+            if os.path.exists(path):
+                _index = BM25Index.load(path)
+            else:
+                _index = build_from_supabase()
+                _index.save(path)
+            _snapshot_mtime = _mtime(path)
+        elif _reload_due():
+            mtime = _mtime(path)
+            if mtime is not None and mtime != _snapshot_mtime:
+                # save() replaces the file atomically, so the old mapping stays valid
+                # for searches still running on the previous index
+                _index = BM25Index.load(path)
+                _snapshot_mtime = mtime
+        _checked_at = time.monotonic()
+    return _index
+
+
+def update_document(document_id: str, rows: List[Dict]) -> None:
+    """Replace a document's rows in the index (called by the ingestion pipeline)."""
+    get_index().replace_document(document_id, rows)
+
+
+def save_index() -> None:
+    global _snapshot_mtime
+    if _index is not None:
+        path = get_settings().bm25_index_path
+        with _index_lock:
+            _index.save(path)
+            # our own snapshot: nothing to reload
+            _snapshot_mtime = _mtime(path)
+
+
+def reset() -> None:
+    """Forget the loaded index (tests)."""
+    global _index, _snapshot_mtime, _checked_at
+    with _index_lock:
+        _index = None
+        _snapshot_mtime = None
+        _checked_at = float("-inf")
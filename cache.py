@@ -0,0 +1,230 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+# Returned by get() when a key is absent, so callers can cache None/falsy values.
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory cache with least-recently-used eviction.
+    - max_entries bounds the size (oldest entries are evicted first)
+    - ttl_seconds expires entries on read (None = never expire)
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: Optional[float] = None) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if self.ttl_seconds is None or time.monotonic() - stored_at < self.ttl_seconds:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Drop every entry whose key matches `predicate`; returns how many were dropped."""
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                del self._data[key]
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._data),
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteCache:
+    """
+    On-disk cache tier backed by a single SQLite file.
+    Values must be JSON-serializable. Entries expire after ttl_seconds and the
+    least recently read ones are evicted once the table exceeds max_entries.
+    - reads only write back the access time when it is older than touch_seconds,
+      so hot keys do not cost a write + commit per hit
+    - eviction runs only when the estimated size passes max_entries, and trims
+      an extra tenth of the capacity so it is not repeated on every insert
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 100_000,
+        ttl_seconds: Optional[float] = None,
+        touch_seconds: float = 60.0,
+    ) -> None:
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.touch_seconds = touch_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_idx ON cache (accessed)")
+        self._conn.commit()
+        # Upper bound on the row count: counts every insert, even replacements, and is
+        # corrected by a real COUNT(*) before anything is evicted.
+        self._size_estimate = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created, accessed FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and self.ttl_seconds is not None and now - row[1] >= self.ttl_seconds:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return default
+            if now - row[2] >= self.touch_seconds:
+                self._conn.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._size_estimate += 1
+            if self._size_estimate > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Trim the least recently read rows down to ~90% of max_entries (caller holds the lock)."""
+        size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if size > self.max_entries:
+            target = self.max_entries - self.max_entries // 10
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed LIMIT ?)",
+                (size - target,),
+            )
+            size = target
+        self._size_estimate = size
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+            self._conn.commit()
+            self._size_estimate = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self),
+        }
+
+
+class TieredCache:
+    """
+    Looks keys up in each tier in order (fastest first). A hit in a slower tier
+    is copied into the faster ones; writes go to every tier.
+    """
+
+    def __init__(self, *tiers) -> None:
+        self.tiers = tiers
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        for i, tier in enumerate(self.tiers):
+            value = tier.get(key, MISSING)
+            if value is not MISSING:
+                for faster in self.tiers[:i]:
+                    faster.set(key, value)
+                self.hits += 1
+                return value
+        self.misses += 1
+        return default
+
+    def set(self, key: str, value: Any) -> None:
+        for tier in self.tiers:
+            tier.set(key, value)
+
+    def invalidate(self, key: str) -> None:
+        for tier in self.tiers:
+            tier.invalidate(key)
+
+    def clear(self) -> None:
+        for tier in self.tiers:
+            tier.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "tiers": [tier.stats() for tier in self.tiers],
+        }
@@ -0,0 +1,107 @@
+from typing import Callable, List, Optional
+
+# slot whose summary has not come back yet
+PENDING = object()
+
+# reduce(texts, final, done): summarize texts (with the chapter prompt when final)
+# and call done(summary) once it is ready, or done(None) when it failed
+Reduce = Callable[[List[str], bool, Callable[[Optional[str]], None]], None]
+
+
+class ChapterReducer:
+    """
+    Tree-reduces one chapter's section summaries into a chapter summary.
+
+    Section summaries arrive in any order. Runs of consecutive summaries are
+    grouped into batches of about `batch_tokens` tokens (at least two per batch),
+    each batch is condensed into one summary, and the condensed summaries are
+    reduced the same way, level by level, until everything fits in one final
+    chapter prompt. A batch is handed to `reduce` as soon as its summaries are in,
+    so the chapter summary is built while later sections are still being
+    summarized. A chapter that fits in one batch gets a single final call.
+    """
+
+    def __init__(self, sections: int, batch_tokens: int, count_tokens: Callable[[str], int], reduce: Reduce) -> None:
+        self.batch_tokens = batch_tokens
+        self.count_tokens = count_tokens
+        self._reduce = reduce
+        # per level: slot values in document order, start of the open batch,
+        # whether more slots can still be added, batches emitted, remainder flushed
+        self._levels: List[list] = [[PENDING] * sections]
+        self._cursors = [0]
+        self._closed = [True]
+        self._emitted = [0]
+        self._flushed = [False]
+        self.finished = False
+        self.summary: Optional[str] = None
+        if sections == 0:
+            self._finish(None)
+
+    def add(self, index: int, summary: Optional[str]) -> None:
+        """Section `index` (document order) is done; None when its summary failed."""
+        self._fill(0, index, summary)
+
+    def _fill(self, level: int, slot: int, summary: Optional[str]) -> None:
+        self._levels[level][slot] = summary or None
+        self._drain(level)
+
+    def _next_level(self, level: int) -> list:
+        if len(self._levels) == level + 1:
+            self._levels.append([])
+            self._cursors.append(0)
+            self._closed.append(False)
+            self._emitted.append(0)
+            self._flushed.append(False)
+        return self._levels[level + 1]
+
+    def _emit(self, level: int, batch: List[str]) -> None:
+        parent = self._next_level(level)
+        slot = len(parent)
+        parent.append(PENDING)
+        self._emitted[level] += 1
+        self._reduce(batch, False, lambda summary: self._fill(level + 1, slot, summary))
+
+    def _drain(self, level: int) -> None:
+        if self._flushed[level]:
+            return
+        items = self._levels[level]
+        batch: List[str] = []
+        tokens = 0
+        i = self._cursors[level]
+        while i < len(items) and items[i] is not PENDING:
+            if items[i]:
+                size = self.count_tokens(items[i])
+                if len(batch) >= 2 and tokens + size > self.batch_tokens:
+                    self._emit(level, batch)
+                    self._cursors[level] = i
+                    batch, tokens = [], 0
+                batch.append(items[i])
+                tokens += size
+            i += 1
+        if i < len(items) or not self._closed[level]:
+            # the open batch is rebuilt from the cursor when more summaries arrive
+            return
+
+        self._flushed[level] = True
+        self._cursors[level] = i
+        if not self._emitted[level]:
+            # the whole level fits in one batch: this is the chapter summary
+            if not batch:
+                self._finish(None)
+            elif level > 0 and len(batch) == 1:
+                self._finish(batch[0])
+            else:
+                self._reduce(batch, True, self._finish)
+            return
+
+        if len(batch) == 1:
+            # a lone leftover moves up a level instead of being summarized on its own
+            self._next_level(level).append(batch[0])
+        elif batch:
+            self._emit(level, batch)
+        self._closed[level + 1] = True
+        self._drain(level + 1)
+
+    def _finish(self, summary: Optional[str]) -> None:
+        self.summary = summary or None
+        self.finished = True
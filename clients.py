@@ -0,0 +1,132 @@
+"""
+Process-wide registry of external clients (Supabase, OpenAI, ChatOpenAI and the
+HTTP pools under them). Nothing is created, and no SDK is imported, until a
+client is first asked for; after that every caller shares the same instance and
+therefore the same keep-alive connections.
+"""
+import importlib.util
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+from config import get_settings
+from db_profiler import ProfiledClient
+
+if TYPE_CHECKING:
+    import httpx
+    from langchain_openai import ChatOpenAI
+    from openai import OpenAI
+    from supabase import AClient, Client
+
+_lock = threading.Lock()
+_supabase: Optional["Client"] = None
+_async_supabase: Optional["AClient"] = None
+
+
+def http2_available() -> bool:
+    """httpx only speaks HTTP/2 when the optional `h2` package is installed."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _http_options() -> dict:
+    import httpx
+
+    settings = get_settings()
+    return {
+        "http2": http2_available(),
+        "timeout": httpx.Timeout(settings.http_timeout_seconds, connect=10.0),
+        "limits": httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive,
+            keepalive_expiry=settings.http_keepalive_seconds,
+        ),
+    }
+
+
+@lru_cache
+def get_http_client() -> "httpx.Client":
+    """Shared keep-alive pool for synchronous OpenAI calls (ingestion, the graph)."""
+    import httpx
+
+    return httpx.Client(**_http_options())
+
+
+@lru_cache
+def get_async_http_client() -> "httpx.AsyncClient":
+    """Shared keep-alive pool for async OpenAI calls."""
+    import httpx
+
+    return httpx.AsyncClient(**_http_options())
+
+
+@lru_cache
+def get_openai_client() -> "OpenAI":
+    from openai import OpenAI
+
+    return OpenAI(api_key=get_settings().openai_api_key, http_client=get_http_client())
+
+
+@lru_cache
+def get_chat_model(model: str = "gpt-4o-mini") -> "ChatOpenAI":
+    """ChatOpenAI on the shared pools; stream_usage so streamed answers report token usage too."""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        api_key=get_settings().openai_api_key,
+        model=model,
+        stream_usage=True,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+    )
+
+
+def _credentials() -> tuple[str, str]:
+    settings = get_settings()
+
+    if not settings.supabase_url:
+        raise RuntimeError("Missing SUPABASE_URL")
+
+    key = settings.supabase_service_role_key or settings.supabase_anon_key
+    if not key:
+        raise RuntimeError("Missing SUPABASE_SERVICE_ROLE_KEY or SUPABASE_ANON_KEY")
+
+    return settings.supabase_url, key
+
+
+def _supabase_options(options_cls):
+    return options_cls(postgrest_client_timeout=get_settings().http_timeout_seconds)
+
+
+def _maybe_profiled(client):
+    # DB_PROFILING wraps the client so queries are reported to db_profiler
+    return ProfiledClient(client) if get_settings().db_profiling else client
+
+
+def get_supabase_client() -> "Client":
+    """
+    The one synchronous Supabase client, shared by the API, the graph and ingestion.
+    Its PostgREST session already keeps connections alive over HTTP/2.
+    """
+    global _supabase
+    if _supabase is not None:
+        return _supabase
+    with _lock:
+        if _supabase is None:
+            from supabase import ClientOptions, create_client
+
+            _supabase = _maybe_profiled(create_client(*_credentials(), options=_supabase_options(ClientOptions)))
+    return _supabase
+
+
+async def get_async_supabase_client() -> "AClient":
+    global _async_supabase
+    if _async_supabase is not None:
+        return _async_supabase
+
+    from supabase import AClientOptions, acreate_client
+
+    client = _maybe_profiled(await acreate_client(*_credentials(), options=_supabase_options(AClientOptions)))
+    # another coroutine may have finished first; keep whichever was stored
+    if _async_supabase is None:
+        _async_supabase = client
+    return _async_supabase
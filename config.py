@@ -26,10 +26,105 @@ class Settings:
         self.supabase_anon_key: Optional[str] = os.getenv("SUPABASE_ANON_KEY")
         self.supabase_service_role_key: Optional[str] = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
+        # LLM response cache shared by pipeline.py and lang_pipeline.py
+        self.llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+        # SQLite file for the on-disk tier; empty string keeps the cache in memory only
+        self.llm_cache_path: str = os.getenv("LLM_CACHE_PATH", ".cache/llm_responses.sqlite3")
+        self.llm_cache_ttl_seconds: int = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.llm_cache_memory_entries: int = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "1024"))
+        self.llm_cache_disk_entries: int = int(os.getenv("LLM_CACHE_DISK_ENTRIES", "100000"))
+
+        # search backend for /search: "rpc" (search_chunks Postgres function) or "bm25" (in-process index)
+        self.search_backend: str = os.getenv("SEARCH_BACKEND", "rpc").lower()
+        # snapshot file of the in-process BM25 index
+        self.bm25_index_path: str = os.getenv("BM25_INDEX_PATH", ".cache/bm25_index.bin")
+        # seconds between checks for a snapshot rewritten by another process; negative disables reloading
+        self.bm25_reload_check_seconds: float = float(os.getenv("BM25_RELOAD_CHECK_SECONDS", "5"))
+
+        # search_service cache of document id -> title and file_name -> url
+        self.lookup_cache_entries: int = int(os.getenv("LOOKUP_CACHE_ENTRIES", "5000"))
+        self.lookup_cache_ttl_seconds: int = int(os.getenv("LOOKUP_CACHE_TTL_SECONDS", "3600"))
+
+        # /search result cache keyed by normalized query, top_k and document_id
+        self.search_cache_entries: int = int(os.getenv("SEARCH_CACHE_ENTRIES", "2048"))
+        self.search_cache_ttl_seconds: int = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "300"))
+
+        # concurrent backend searches per /search/batch request
+        self.search_batch_concurrency: int = int(os.getenv("SEARCH_BATCH_CONCURRENCY", "8"))
+
+        # per-document table-of-contents cache used by lang_pipeline
+        self.toc_cache_entries: int = int(os.getenv("TOC_CACHE_ENTRIES", "512"))
+        self.toc_cache_ttl_seconds: int = int(os.getenv("TOC_CACHE_TTL_SECONDS", "3600"))
+
+        # cross-document routing when a question names no document
+        # documents passed from the lexical prefilter to the LLM router
+        self.routing_candidates: int = int(os.getenv("ROUTING_CANDIDATES", "20"))
+        # documents whose sections are searched for the answer
+        self.routing_top_documents: int = int(os.getenv("ROUTING_TOP_DOCUMENTS", "3"))
+        # characters of each candidate's chapter summaries shown to the router
+        self.routing_summary_chars: int = int(os.getenv("ROUTING_SUMMARY_CHARS", "800"))
+        self.routing_catalog_ttl_seconds: int = int(os.getenv("ROUTING_CATALOG_TTL_SECONDS", "600"))
+
+        # how often (seconds) cached documents, lookups and search results are checked against
+        # the data version ingestion publishes (data_version.py); negative disables the check
+        self.data_version_check_seconds: float = float(os.getenv("DATA_VERSION_CHECK_SECONDS", "5"))
+
+        # token budget for the retrieved context sent to validation/answering prompts
+        self.context_token_budget: int = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+        # share (0..1) of answers that passed the local review checks still sent to the LLM auditor
+        self.review_llm_sample_rate: float = float(os.getenv("REVIEW_LLM_SAMPLE_RATE", "0.1"))
+
+        # shared HTTP pools (clients.py) used by the OpenAI and ChatOpenAI clients
+        self.http_timeout_seconds: float = float(os.getenv("HTTP_TIMEOUT_SECONDS", "60"))
+        self.http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.http_max_keepalive: int = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+        self.http_keepalive_seconds: float = float(os.getenv("HTTP_KEEPALIVE_SECONDS", "30"))
+
+        # record Supabase round trips per request / ingest run (see db_profiler.py)
+        self.db_profiling: bool = os.getenv("DB_PROFILING", "false").lower() in ("1", "true", "yes")
+        # same-shape queries per unit of work before they are reported as a likely N+1
+        self.db_profiling_repeat_threshold: int = int(os.getenv("DB_PROFILING_REPEAT_THRESHOLD", "3"))
+
         # runtime environment (optional convenience flag)
         # e.g. "local", "dev", "prod"
         self.env: str = os.getenv("ENV", "local")
 
+        # ingestion tuning
+        # number of concurrent LLM summarization calls per document
+        self.summary_workers: int = int(os.getenv("SUMMARY_WORKERS", "8"))
+        # token budget of one batch of section summaries in the chapter summary tree-reduce
+        self.chapter_summary_batch_tokens: int = int(os.getenv("CHAPTER_SUMMARY_BATCH_TOKENS", "3000"))
+        # upper bound on LLM requests per minute across all workers (0 = unlimited)
+        self.llm_requests_per_minute: int = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+        # rows per bulk insert into the chunks table
+        self.chunk_insert_batch_size: int = int(os.getenv("CHUNK_INSERT_BATCH_SIZE", "100"))
+        # below this rule-based heading confidence (0..1) detect_headings asks the LLM
+        self.heading_confidence_threshold: float = float(os.getenv("HEADING_CONFIDENCE_THRESHOLD", "0.6"))
+        # heading detection window size and overlap (chars) for long documents
+        self.heading_window_chars: int = int(os.getenv("HEADING_WINDOW_CHARS", "5000"))
+        self.heading_window_overlap: int = int(os.getenv("HEADING_WINDOW_OVERLAP", "500"))
+        # storage location ingested by `python pipeline.py` and the default for POST /ingest
+        self.storage_bucket: str = os.getenv("STORAGE_BUCKET", "Medical Guidelines")
+        self.storage_folder: str = os.getenv("STORAGE_FOLDER", "Diabetes Text/text")
+        # background ingest jobs (ingest_jobs.py): SQLite job store and concurrent jobs
+        self.ingest_job_db_path: str = os.getenv("INGEST_JOB_DB_PATH", ".cache/ingest_jobs.sqlite3")
+        self.ingest_job_workers: int = int(os.getenv("INGEST_JOB_WORKERS", "1"))
+        self.ingest_resume_on_startup: bool = os.getenv("INGEST_RESUME_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+        # a job's runner renews its lease every third of this; other workers resume the job once it lapses
+        self.ingest_job_lease_seconds: float = float(os.getenv("INGEST_JOB_LEASE_SECONDS", "60"))
+        # bearer token required by the /ingest endpoints; they are disabled while it is unset
+        self.ingest_admin_token: Optional[str] = os.getenv("INGEST_ADMIN_TOKEN") or None
+        # pages kept per downloaded file; 0 ingests the complete document
+        self.max_pages: int = int(os.getenv("MAX_PAGES", "0"))
+        # bytes read per step when streaming a file from storage
+        self.storage_stream_chunk_bytes: int = int(os.getenv("STORAGE_STREAM_CHUNK_BYTES", str(256 * 1024)))
+        # documents processed at the same time by process_storage_bucket
+        self.ingest_document_workers: int = int(os.getenv("INGEST_DOCUMENT_WORKERS", "2"))
+        # downloaded files allowed to wait in the queue ahead of the workers
+        self.download_prefetch: int = int(os.getenv("DOWNLOAD_PREFETCH", "4"))
+        # entries requested per storage list() page
+        self.storage_list_page_size: int = int(os.getenv("STORAGE_LIST_PAGE_SIZE", "100"))
+
     @property
     def has_openai(self) -> bool:
         return bool(self.openai_api_key)
@@ -0,0 +1,115 @@
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from config import get_settings
+from lexical import bm25_scores, tokenize
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character-based estimate
+    tiktoken = None
+
+# chunks whose word shingles overlap this much with a better-ranked chunk are dropped
+OVERLAP_THRESHOLD = 0.8
+SHINGLE_SIZE = 5
+# do not bother squeezing in a trimmed chunk smaller than this
+MIN_TRIMMED_TOKENS = 80
+TRIM_MARKER = "\n[...]\n"
+
+
+@lru_cache
+def _encoding():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Token count for gpt-4o models, estimated (~4 chars/token) when tiktoken is unavailable."""
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def format_chunk(chunk: Dict) -> str:
+    return f"[Source: {chunk['section_heading']}] {chunk['content']}"
+
+
+def format_context(chunks: List[Dict]) -> str:
+    return "\n\n".join(format_chunk(c) for c in chunks)
+
+
+def trim_middle(text: str, max_tokens: int) -> str:
+    """Cut text down to max_tokens by removing its middle, keeping the head and tail."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    keep = len(text)
+    while keep > 0:
+        keep = int(keep * 0.8)
+        trimmed = text[:keep // 2].rstrip() + TRIM_MARKER + text[len(text) - keep // 2:].lstrip()
+        if count_tokens(trimmed) <= max_tokens:
+            return trimmed
+    return ""
+
+
+def _shingles(terms: List[str]) -> set:
+    if len(terms) < SHINGLE_SIZE:
+        return {tuple(terms)}
+    return {tuple(terms[i:i + SHINGLE_SIZE]) for i in range(len(terms) - SHINGLE_SIZE + 1)}
+
+
+def pack_context(query: str, chunks: List[Dict], budget: Optional[int] = None) -> List[Dict]:
+    """
+    Choose the chunks to show the LLM within a token budget.
+    Duplicate and overlapping chunks are dropped, the rest are ranked by BM25
+    relevance to the query and added best-first; the first chunk that does not
+    fit is trimmed in the middle to fill the remaining budget.
+    """
+    budget = budget or get_settings().context_token_budget
+    if not chunks:
+        return []
+
+    terms = [tokenize(f"{c.get('section_heading', '')} {c.get('content', '')}") for c in chunks]
+    scores = bm25_scores(tokenize(query), terms)
+    order = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+
+    kept = []
+    kept_shingles = []
+    seen_hashes = set()
+    for i in order:
+        content = " ".join((chunks[i].get("content") or "").split())
+        digest = hashlib.sha256(content.lower().encode("utf-8")).hexdigest()
+        if not content or digest in seen_hashes:
+            continue
+        shingles = _shingles(terms[i])
+        overlaps = any(
+            len(shingles & other) / (min(len(shingles), len(other)) or 1) >= OVERLAP_THRESHOLD
+            for other in kept_shingles
+        )
+        if overlaps:
+            continue
+        seen_hashes.add(digest)
+        kept_shingles.append(shingles)
+        kept.append(chunks[i])
+
+    packed = []
+    remaining = budget
+    for chunk in kept:
+        cost = count_tokens(format_chunk(chunk)) + 1
+        if cost <= remaining:
+            packed.append(chunk)
+            remaining -= cost
+            continue
+        if remaining >= MIN_TRIMMED_TOKENS:
+            header_cost = count_tokens(format_chunk({**chunk, "content": ""})) + 1
+            content = trim_middle(chunk["content"], remaining - header_cost)
+            if content:
+                packed.append({**chunk, "content": content})
+        break
+
+    return packed
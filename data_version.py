@@ -0,0 +1,111 @@
+"""
+Version of the ingested data that every process can see.
+
+Ingestion runs in its own process (`python pipeline.py`) as well as in /ingest
+jobs, so in-process invalidation alone never reaches the API workers. After it
+changes a document, ingestion writes a new random value to the one-row
+`ingest_version` table (migrations/005_ingest_version.sql). Processes that cache
+lookups, search results, TOCs or the routing catalog read that value at most
+every DATA_VERSION_CHECK_SECONDS and drop what they cached when it moved, which
+bounds how long they can serve data from before an ingest run elsewhere.
+"""
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from config import get_settings
+from supabase_client import get_async_supabase_client, get_supabase_client
+
+VERSION_TABLE = "ingest_version"
+
+_lock = threading.Lock()
+_version: Optional[str] = None
+_checked_at = float("-inf")
+_warned = False
+# consumer name -> version it last acted on (see changed())
+_seen: Dict[str, Optional[str]] = {}
+
+
+def _due() -> bool:
+    interval = get_settings().data_version_check_seconds
+    return interval >= 0 and time.monotonic() - _checked_at >= interval
+
+
+def _warn(error: Exception) -> None:
+    global _warned
+    if not _warned:
+        _warned = True
+        print(f"Could not read {VERSION_TABLE} ({error}); caches rely on their TTLs")
+
+
+def _first(rows) -> Optional[str]:
+    return rows[0].get("version") if rows else None
+
+
+def current() -> Optional[str]:
+    """The shared data version, re-read at most every DATA_VERSION_CHECK_SECONDS (None when unknown)."""
+    global _version, _checked_at
+    if not _due():
+        return _version
+    with _lock:
+        if _due():
+            try:
+                res = get_supabase_client().table(VERSION_TABLE).select("version").eq("id", 1).limit(1).execute()
+                _version = _first(res.data)
+            except Exception as e:
+                _warn(e)
+            _checked_at = time.monotonic()
+    return _version
+
+
+async def current_async() -> Optional[str]:
+    """current() for the async request path."""
+    global _version, _checked_at
+    if not _due():
+        return _version
+    # claim the check first so concurrent requests do not all query
+    _checked_at = time.monotonic()
+    try:
+        client = await get_async_supabase_client()
+        res = await client.table(VERSION_TABLE).select("version").eq("id", 1).limit(1).execute()
+        _version = _first(res.data)
+    except Exception as e:
+        _warn(e)
+    return _version
+
+
+def changed(consumer: str, version: Optional[str]) -> bool:
+    """True when `consumer` last acted on a different version (it should drop its cache)."""
+    with _lock:
+        if consumer not in _seen:
+            _seen[consumer] = version
+            return False
+        if _seen[consumer] == version:
+            return False
+        _seen[consumer] = version
+        return True
+
+
+def bump() -> Optional[str]:
+    """Publish a new data version after ingestion changed a document."""
+    global _version, _checked_at
+    version = uuid.uuid4().hex
+    try:
+        get_supabase_client().table(VERSION_TABLE).upsert({"id": 1, "version": version}).execute()
+    except Exception as e:
+        _warn(e)
+        return None
+    with _lock:
+        _version = version
+        _checked_at = time.monotonic()
+    return version
+
+
+def reset() -> None:
+    """Forget the cached version (tests)."""
+    global _version, _checked_at
+    with _lock:
+        _version = None
+        _checked_at = float("-inf")
+        _seen.clear()
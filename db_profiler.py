@@ -0,0 +1,206 @@
+import contextvars
+import inspect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# query-builder calls whose first argument is a column name, recorded in the query shape
+_FILTERS = frozenset({
+    "eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "is_", "in_",
+    "contains", "contained_by", "match", "order", "filter",
+})
+_OPERATIONS = frozenset({"select", "insert", "upsert", "update", "delete"})
+
+
+def _size(value: Any) -> int:
+    if value is None:
+        return 0
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+class QueryProfile:
+    """
+    Supabase round trips made during one unit of work (an HTTP request, a document
+    ingest, an ingestion run). Records also roll up into the enclosing profile.
+    """
+
+    def __init__(self, name: str, parent: Optional["QueryProfile"] = None, repeat_threshold: int = 3) -> None:
+        self.name = name
+        self.parent = parent
+        self.repeat_threshold = max(2, repeat_threshold)
+        self.queries: List[Dict] = []
+        self._lock = threading.Lock()
+
+    def record(self, query: Dict) -> None:
+        with self._lock:
+            self.queries.append(query)
+        if self.parent is not None:
+            self.parent.record(query)
+
+    def repeated(self) -> List[Dict]:
+        """Query shapes issued at least repeat_threshold times: likely N+1 patterns."""
+        with self._lock:
+            queries = list(self.queries)
+        shapes: Dict[str, Dict] = {}
+        for query in queries:
+            entry = shapes.setdefault(query["shape"], {"shape": query["shape"], "count": 0, "seconds": 0.0})
+            entry["count"] += 1
+            entry["seconds"] += query["seconds"]
+        repeated = [e for e in shapes.values() if e["count"] >= self.repeat_threshold]
+        for entry in repeated:
+            entry["seconds"] = round(entry["seconds"], 6)
+        return sorted(repeated, key=lambda e: -e["count"])
+
+    def summary(self) -> Dict:
+        with self._lock:
+            queries = list(self.queries)
+        return {
+            "name": self.name,
+            "queries": len(queries),
+            "seconds": round(sum(q["seconds"] for q in queries), 6),
+            "rows": sum(q["rows"] for q in queries),
+            "bytes_sent": sum(q["bytes_sent"] for q in queries),
+            "bytes_received": sum(q["bytes_received"] for q in queries),
+            "errors": sum(1 for q in queries if q["error"]),
+            "repeated": self.repeated(),
+        }
+
+    def format(self) -> str:
+        """One-line human summary used by the ingestion logs."""
+        s = self.summary()
+        line = (
+            f"{s['name']}: {s['queries']} queries in {s['seconds']:.3f}s, {s['rows']} rows, "
+            f"{s['bytes_sent']} B sent, {s['bytes_received']} B received"
+        )
+        if s["repeated"]:
+            line += "; repeated: " + ", ".join(f"{e['shape']} x{e['count']}" for e in s["repeated"])
+        return line
+
+
+_current: contextvars.ContextVar[Optional[QueryProfile]] = contextvars.ContextVar("vlrag_db_profile", default=None)
+
+
+def current_profile() -> Optional[QueryProfile]:
+    return _current.get()
+
+
+@contextmanager
+def profile(name: str, repeat_threshold: int = 3) -> Iterator[QueryProfile]:
+    """Record every profiled Supabase query made inside the block (nested inside any open profile)."""
+    unit = QueryProfile(name, parent=_current.get(), repeat_threshold=repeat_threshold)
+    token = _current.set(unit)
+    try:
+        yield unit
+    finally:
+        _current.reset(token)
+
+
+class _ProfiledQuery:
+    """Wraps a postgrest request builder, noting its shape and timing execute()."""
+
+    def __init__(self, builder: Any, table: str, operation: str = "select") -> None:
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._columns: List[str] = []
+        self._payload: Any = None
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            if name in _OPERATIONS:
+                self._operation = name
+                if name != "select" and args:
+                    self._payload = args[0]
+            elif name in _FILTERS and args:
+                column = args[0] if isinstance(args[0], str) else ",".join(sorted(args[0]))
+                self._columns.append(f"{name}:{column}")
+            result = attr(*args, **kwargs)
+            # builders return themselves (or a new builder) until execute()
+            if result is not None and hasattr(result, "execute"):
+                self._builder = result
+                return self
+            return result
+        return call
+
+    def _shape(self) -> str:
+        filters = f"[{','.join(self._columns)}]" if self._columns else ""
+        return f"{self._table}.{self._operation}{filters}"
+
+    def _record(self, started: float, response: Any, error: Optional[BaseException]) -> None:
+        unit = _current.get()
+        if unit is None:
+            return
+        data = getattr(response, "data", None)
+        unit.record({
+            "shape": self._shape(),
+            "table": self._table,
+            "operation": self._operation,
+            "seconds": time.perf_counter() - started,
+            "rows": len(data) if isinstance(data, list) else (1 if data else 0),
+            "bytes_sent": _size(self._payload),
+            "bytes_received": _size(data),
+            "error": error is not None,
+        })
+
+    def execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self._builder.execute(*args, **kwargs)
+        except BaseException as e:
+            self._record(started, None, e)
+            raise
+        if inspect.isawaitable(response):
+            return self._finish_async(started, response)
+        self._record(started, response, None)
+        return response
+
+    async def _finish_async(self, started: float, pending) -> Any:
+        try:
+            response = await pending
+        except BaseException as e:
+            self._record(started, None, e)
+            raise
+        self._record(started, response, None)
+        return response
+
+
+class ProfiledClient:
+    """
+    Drop-in proxy for a supabase Client or AClient that reports each query to the
+    active profile(). Outside a profile queries are only passed through.
+    """
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+
+    def table(self, name: str) -> _ProfiledQuery:
+        return _ProfiledQuery(self._client.table(name), name)
+
+    def from_(self, name: str) -> _ProfiledQuery:
+        return self.table(name)
+
+    def rpc(self, fn: str, params: Optional[Dict] = None, *args, **kwargs) -> _ProfiledQuery:
+        query = _ProfiledQuery(self._client.rpc(fn, params, *args, **kwargs), f"rpc:{fn}", "call")
+        query._payload = params
+        return query
+
+    def __getattr__(self, name: str) -> Any:
+        # storage, auth, ... are not profiled
+        return getattr(self._client, name)
+
+
+def header_value(unit: QueryProfile, max_repeated: int = 5) -> str:
+    """Compact JSON summary of a request's queries for the debug response header."""
+    s = unit.summary()
+    s["repeated"] = [(e["shape"], e["count"]) for e in s["repeated"][:max_repeated]]
+    del s["name"]
+    return json.dumps(s, separators=(",", ":"))
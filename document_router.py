@@ -0,0 +1,152 @@
+import threading
+import time
+from typing import Dict, List, Optional
+
+import data_version
+from bm25_index import BM25Index
+from config import get_settings
+from supabase_client import get_supabase_client
+
+settings = get_settings()
+
+# the whole routing catalog is cached in one object; once it is stale (TTL expired,
+# invalidated here, or the shared data version moved) it keeps being served while a
+# background thread rebuilds it, so only the very first request waits for a load
+_catalog: Optional["Catalog"] = None
+_catalog_version: Optional[str] = None
+_catalog_built_at = float("-inf")
+_catalog_stale = False
+_refreshing = False
+_catalog_lock = threading.Lock()
+
+
+class Catalog:
+    """Every document's title and chapter summaries, with a BM25 index over them."""
+
+    def __init__(self, documents: List[Dict]) -> None:
+        self.documents = documents
+        self.by_id = {doc["id"]: doc for doc in documents}
+        self.index = BM25Index()
+        self.index.add_chunks(
+            {
+                "id": doc["id"],
+                "document_id": doc["id"],
+                "section_heading": doc["title"],
+                "content": doc["profile"],
+            }
+            for doc in documents
+        )
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+def document_profile(chapter_summaries: Optional[List[Dict]], toc: Optional[List[Dict]] = None) -> str:
+    """
+    Text a document is routed on: its chapter summaries (stored by pipeline.py),
+    or its top-level headings for documents ingested before those were stored.
+    """
+    if chapter_summaries:
+        return "\n".join(f"{c.get('chapter', '')}: {c.get('summary', '')}" for c in chapter_summaries)
+    return "\n".join(entry["heading"] for entry in toc or [] if entry.get("level", 1) <= 1)
+
+
+def load_catalog(page_size: int = 1000) -> Catalog:
+    """Read id, title and routing text of every document, page by page."""
+    sb = get_supabase_client()
+    documents = []
+    start = 0
+    while True:
+        rows = sb.table("documents") \
+            .select("id, title, chapter_summaries, toc") \
+            .order("id") \
+            .range(start, start + page_size - 1) \
+            .execute().data or []
+        for row in rows:
+            documents.append({
+                "id": row["id"],
+                "title": row.get("title") or "",
+                "profile": document_profile(row.get("chapter_summaries"), row.get("toc")),
+            })
+        if len(rows) < page_size:
+            return Catalog(documents)
+        start += page_size
+
+
+def _store(catalog: Catalog, version: Optional[str]) -> None:
+    global _catalog, _catalog_version, _catalog_built_at, _catalog_stale
+    _catalog = catalog
+    _catalog_version = version
+    _catalog_built_at = time.monotonic()
+    _catalog_stale = False
+
+
+def _is_stale(version: Optional[str]) -> bool:
+    ttl = settings.routing_catalog_ttl_seconds
+    expired = bool(ttl) and time.monotonic() - _catalog_built_at >= ttl
+    return _catalog_stale or expired or version != _catalog_version
+
+
+def _refresh() -> None:
+    global _refreshing
+    try:
+        # read the version first: an ingest finishing mid-load triggers another refresh
+        version = data_version.current()
+        catalog = load_catalog()
+        with _catalog_lock:
+            _store(catalog, version)
+    except Exception as e:
+        print(f"Routing catalog refresh failed, serving the previous one: {e}")
+    finally:
+        _refreshing = False
+
+
+def get_catalog() -> Catalog:
+    """
+    The routing catalog. A stale catalog is returned as-is while it is rebuilt in
+    the background; new documents become routable once the rebuild finishes.
+    """
+    global _refreshing
+    version = data_version.current()
+    if _catalog is not None and not _is_stale(version):
+        return _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _store(load_catalog(), version)
+        elif _is_stale(version) and not _refreshing:
+            _refreshing = True
+            threading.Thread(target=_refresh, name="routing-catalog-refresh", daemon=True).start()
+        return _catalog
+
+
+def invalidate_catalog() -> None:
+    """Rebuild the catalog on next use (called by the ingestion pipeline)."""
+    global _catalog_stale
+    _catalog_stale = True
+
+
+def reset() -> None:
+    """Drop the catalog entirely (tests)."""
+    global _catalog, _catalog_version, _catalog_built_at, _catalog_stale
+    with _catalog_lock:
+        _catalog = None
+        _catalog_version = None
+        _catalog_built_at = float("-inf")
+        _catalog_stale = False
+
+
+def candidate_documents(query: str, limit: Optional[int] = None, catalog: Optional[Catalog] = None) -> List[Dict]:
+    """
+    Lexical prefilter: up to `limit` documents for the LLM router, best BM25 match first.
+    The index only touches postings of the query terms, so this stays cheap as the
+    corpus grows; documents without a match pad the list in catalog order.
+    """
+    catalog = catalog if catalog is not None else get_catalog()
+    limit = max(1, limit or settings.routing_candidates)
+
+    hits = catalog.index.search(query, top_k=limit)
+    chosen = [catalog.by_id[hit["id"]] for hit in hits if hit["id"] in catalog.by_id]
+    if len(chosen) < limit:
+        seen = {doc["id"] for doc in chosen}
+        chosen += [doc for doc in catalog.documents if doc["id"] not in seen][:limit - len(chosen)]
+    return chosen
@@ -0,0 +1,200 @@
+import re
+from typing import Optional
+
+# "3", "3.1", "3.1.2" followed by a title
+NUMBERED_RE = re.compile(r"^(?P<number>\d+(?:\.\d+)*)\.?\s+(?P<title>\S.*)$")
+CHAPTER_RE = re.compile(r"^(?:chapter|section|part|appendix)\s+(?:\d+|[IVXLC]+|[A-Z])\b", re.IGNORECASE)
+PAGE_MARKER_RE = re.compile(r"^page\s+\d+(?:\s+of\s+\d+)?$", re.IGNORECASE)
+# table-of-contents entries: "Introduction ........ 4" or "Introduction      4"
+TOC_ENTRY_RE = re.compile(r"(?:\.{3,}|\s{3,}|\t)\s*\d+$")
+LINE_RE = re.compile(r"[^\n\f]+")
+
+MAX_HEADING_CHARS = 120
+MAX_HEADING_WORDS = 12
+
+# how much each rule is trusted when computing the detector's confidence
+SCORES = {
+    "chapter": 1.0,
+    "numbered": 0.9,
+    "caps": 0.8,
+    "isolated": 0.5,
+}
+PAGE_BREAK_BONUS = 0.2
+# a "heading" seen this many times is a running page header, not a section
+RUNNING_HEADER_REPEATS = 3
+
+
+def _classify(line: str, blank_before: bool, blank_after: bool, after_page_break: bool) -> Optional[tuple[str, int]]:
+    """Return (rule, level) when the line looks like a heading."""
+    words = line.split()
+    if len(line) > MAX_HEADING_CHARS or len(words) > MAX_HEADING_WORDS:
+        return None
+    if PAGE_MARKER_RE.match(line) or TOC_ENTRY_RE.search(line):
+        return None
+    ends_like_sentence = line[-1] in ".,;"
+
+    if CHAPTER_RE.match(line):
+        return "chapter", 1
+
+    numbered = NUMBERED_RE.match(line)
+    if numbered:
+        title = numbered.group("title")
+        depth = numbered.group("number").count(".") + 1
+        # "1. Check renal function." is a list item, not a heading
+        if title[0].isupper() and not ends_like_sentence and (depth > 1 or blank_before):
+            return "numbered", min(depth, 3)
+        return None
+
+    letters = [c for c in line if c.isalpha()]
+    if len(letters) >= 3 and all(c.isupper() for c in letters) and not ends_like_sentence:
+        return "caps", 1
+
+    set_off = (blank_before and blank_after) or after_page_break
+    if set_off and line[0].isupper() and not ends_like_sentence and line[-1] != ":":
+        return "isolated", 2
+
+    return None
+
+
+def _normalize(heading: str) -> str:
+    heading = NUMBERED_RE.sub(r"\g<title>", heading)
+    return " ".join(heading.lower().split())
+
+
+def detect_headings_local(text: str) -> tuple[list[dict], float]:
+    """
+    Rule-based heading detection with exact character offsets.
+    Recognizes numbered sections, "Chapter N" lines, ALL-CAPS lines and short
+    title-like lines set off by blank lines or a form-feed page break.
+
+    Returns (headings, confidence) where headings use the same keys as the LLM
+    detector ("heading_text", "level", "start_position") and confidence is 0..1.
+    """
+    if not text:
+        return [], 0.0
+
+    lines = []
+    for match in LINE_RE.finditer(text):
+        raw = match.group()
+        stripped = raw.strip()
+        if stripped:
+            start = match.start() + (len(raw) - len(raw.lstrip()))
+            lines.append((start, match.end(), stripped))
+
+    candidates = []
+    for i, (start, end, line) in enumerate(lines):
+        gap_before = text[lines[i - 1][1]:start] if i else text[:start]
+        gap_after = text[end:lines[i + 1][0]] if i + 1 < len(lines) else "\n\n"
+        after_page_break = "\f" in gap_before
+        blank_before = i == 0 or after_page_break or gap_before.count("\n") >= 2
+        blank_after = "\f" in gap_after or gap_after.count("\n") >= 2
+
+        found = _classify(line, blank_before, blank_after, after_page_break)
+        if not found:
+            continue
+        rule, level = found
+        score = SCORES[rule] + (PAGE_BREAK_BONUS if after_page_break else 0.0)
+        candidates.append({
+            "heading_text": line,
+            "level": level,
+            "start_position": start,
+            "_end": end,
+            "_score": min(score, 1.0),
+        })
+
+    # Drop table-of-contents entries (a heading with no body before the next
+    # heading whose text shows up again later) and running page headers
+    # (the same line repeated on many pages).
+    seen_later = {}
+    counts = {}
+    for candidate in candidates:
+        key = _normalize(candidate["heading_text"])
+        seen_later[key] = candidate["start_position"]
+        counts[key] = counts.get(key, 0) + 1
+
+    headings = []
+    for i, candidate in enumerate(candidates):
+        next_start = candidates[i + 1]["start_position"] if i + 1 < len(candidates) else len(text)
+        has_body = bool(text[candidate["_end"]:next_start].strip())
+        key = _normalize(candidate["heading_text"])
+        if counts[key] >= RUNNING_HEADER_REPEATS:
+            continue
+        if seen_later[key] > candidate["start_position"] and not has_body:
+            continue
+        headings.append(candidate)
+
+    if not headings:
+        return [], 0.0
+
+    strength = sum(h["_score"] for h in headings) / len(headings)
+    coverage = min(1.0, len(headings) / 3)
+    confidence = round(strength * coverage, 3)
+
+    return [
+        {"heading_text": h["heading_text"], "level": h["level"], "start_position": h["start_position"]}
+        for h in headings
+    ], confidence
+
+
+def align_offsets(text: str, headings: list[dict]) -> list[dict]:
+    """
+    Snap reported start_positions onto the actual heading text.
+    Each heading moves to the occurrence of its heading_text closest to the reported
+    offset; headings that cannot be found and whose offset is out of range are dropped.
+    """
+    aligned = {}
+    lowered = text.lower()
+
+    for heading in headings:
+        heading_text = str(heading.get("heading_text", "")).strip()
+        try:
+            reported = int(heading.get("start_position", -1))
+        except (TypeError, ValueError):
+            reported = -1
+
+        position = None
+        if heading_text:
+            needle = heading_text.lower()
+            occurrences = [m.start() for m in re.finditer(re.escape(needle), lowered)]
+            if occurrences:
+                position = min(occurrences, key=lambda p: abs(p - reported))
+        if position is None and 0 <= reported < len(text):
+            position = reported
+        if position is None:
+            continue
+
+        aligned.setdefault(position, {**heading, "start_position": position})
+
+    return [aligned[p] for p in sorted(aligned)]
+
+
+def split_windows(text: str, size: int, overlap: int) -> list[tuple[int, str]]:
+    """Split text into (offset, window) pairs of `size` chars overlapping by `overlap`."""
+    size = max(1, size)
+    overlap = min(max(0, overlap), size - 1)
+    step = size - overlap
+    windows = []
+    start = 0
+    while True:
+        windows.append((start, text[start:start + size]))
+        if start + size >= len(text):
+            return windows
+        start += step
+
+
+def merge_window_headings(windows: list[tuple[int, str]], results: list[list[dict]], overlap: int) -> list[dict]:
+    """
+    Combine per-window headings into one list with global offsets.
+    Each window owns the half of the overlap nearest to it, so a heading seen by
+    two neighbouring windows is kept exactly once.
+    """
+    merged = {}
+    last = len(windows) - 1
+    for i, ((offset, window), headings) in enumerate(zip(windows, results)):
+        owned_start = offset + (overlap // 2 if i > 0 else 0)
+        owned_end = offset + len(window) - (overlap - overlap // 2) if i < last else offset + len(window)
+        for heading in headings:
+            position = offset + heading["start_position"]
+            if owned_start <= position < owned_end:
+                merged.setdefault(position, {**heading, "start_position": position})
+    return [merged[p] for p in sorted(merged)]
@@ -0,0 +1,355 @@
+"""
+Background ingestion jobs with a durable SQLite job store.
+
+A job ingests a list of storage files (or every .txt file in a folder) through
+pipeline.process_document on a worker pool, off the request path. Progress is
+written to the store as it happens: per-file status, chunk counts, LLM calls,
+and every chunk summary as soon as the LLM returns it. After a crash or restart,
+incomplete jobs are picked up again, skip the files they finished, and hand the
+saved summaries back to process_document, so only chunks that were never
+summarized cost another LLM call. process_document only replaces a document's
+old chunk rows (and records its content hash) after all new rows are in, so an
+interrupted run never leaves a half-written document behind as current.
+
+Several API workers can share one job store. A job is run by the runner that
+holds its lease (owner + lease_until), claimed atomically and renewed while the
+job runs; workers starting up only resume jobs whose lease has expired, so a job
+another live worker is processing is never run twice.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import bm25_index
+import metrics
+from config import get_settings
+
+FINISHED_JOB_STATUSES = ("completed", "completed_with_errors", "failed")
+FINISHED_FILE_STATUSES = ("processed", "skipped", "failed")
+
+
+class JobStore:
+    """Jobs, their files and committed chunk summaries in one SQLite file."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, status TEXT NOT NULL, bucket TEXT NOT NULL, folder TEXT NOT NULL,"
+            " requested TEXT, error TEXT, created REAL NOT NULL, started REAL, finished REAL,"
+            " owner TEXT, lease_until REAL);"
+            "CREATE TABLE IF NOT EXISTS job_files ("
+            " job_id TEXT NOT NULL, name TEXT NOT NULL, position INTEGER NOT NULL, status TEXT NOT NULL,"
+            " chunks_done INTEGER NOT NULL DEFAULT 0, chunks_total INTEGER NOT NULL DEFAULT 0,"
+            " llm_calls INTEGER NOT NULL DEFAULT 0, error TEXT, PRIMARY KEY (job_id, name));"
+            "CREATE TABLE IF NOT EXISTS job_chunks ("
+            " job_id TEXT NOT NULL, name TEXT NOT NULL, content_hash TEXT NOT NULL, summary TEXT NOT NULL,"
+            " PRIMARY KEY (job_id, name, content_hash));"
+        )
+        # job stores created before leases existed
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN lease_until REAL")
+        self._conn.commit()
+
+    def _write(self, sql: str, params=()) -> int:
+        with self._lock:
+            changed = self._conn.execute(sql, params).rowcount
+            self._conn.commit()
+        return changed
+
+    def create_job(self, bucket: str, folder: str, files: Optional[List[str]]) -> str:
+        job_id = uuid.uuid4().hex
+        self._write(
+            "INSERT INTO jobs (id, status, bucket, folder, requested, created) VALUES (?, 'queued', ?, ?, ?, ?)",
+            (job_id, bucket, folder, json.dumps(files) if files else None, time.time()),
+        )
+        return job_id
+
+    def set_job_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        now = time.time()
+        if status == "running":
+            self._write("UPDATE jobs SET status = ?, started = COALESCE(started, ?) WHERE id = ?", (status, now, job_id))
+        else:
+            self._write(
+                "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+                (status, error, now if status in FINISHED_JOB_STATUSES else None, job_id),
+            )
+
+    def add_files(self, job_id: str, names: List[str]) -> None:
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO job_files (job_id, name, position, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, name, i) for i, name in enumerate(names)],
+            )
+            self._conn.commit()
+
+    def update_file(self, job_id: str, name: str, **fields) -> None:
+        columns = ", ".join(f"{column} = ?" for column in fields)
+        self._write(f"UPDATE job_files SET {columns} WHERE job_id = ? AND name = ?", (*fields.values(), job_id, name))
+
+    def save_chunk(self, job_id: str, name: str, content_hash: str, summary: str) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO job_chunks (job_id, name, content_hash, summary) VALUES (?, ?, ?, ?)",
+            (job_id, name, content_hash, summary),
+        )
+
+    def chunk_summaries(self, job_id: str, name: str) -> Dict[str, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT content_hash, summary FROM job_chunks WHERE job_id = ? AND name = ?", (job_id, name)
+            ).fetchall()
+        return {row["content_hash"]: row["summary"] for row in rows}
+
+    def drop_chunks(self, job_id: str, name: str) -> None:
+        # once the document is stored its summaries live in the chunks table
+        self._write("DELETE FROM job_chunks WHERE job_id = ? AND name = ?", (job_id, name))
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            files = self._conn.execute(
+                "SELECT name, status, chunks_done, chunks_total, llm_calls, error"
+                " FROM job_files WHERE job_id = ? ORDER BY position",
+                (job_id,),
+            ).fetchall()
+        job = dict(job)
+        job["requested"] = json.loads(job["requested"]) if job["requested"] else None
+        job["files"] = [dict(f) for f in files]
+        return job
+
+    def list_jobs(self, limit: int = 20) -> List[Dict]:
+        with self._lock:
+            ids = [row["id"] for row in self._conn.execute(
+                "SELECT id FROM jobs ORDER BY created DESC LIMIT ?", (limit,)
+            ).fetchall()]
+        return [self.get_job(job_id) for job_id in ids]
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """
+        Take (or extend) the lease on an unfinished job. Succeeds only when nobody
+        holds it, `owner` already does, or the holder's lease has expired.
+        """
+        now = time.time()
+        return self._write(
+            "UPDATE jobs SET owner = ?, lease_until = ? WHERE id = ?"
+            f" AND status NOT IN ({', '.join('?' * len(FINISHED_JOB_STATUSES))})"
+            " AND (owner IS NULL OR owner = ? OR lease_until < ?)",
+            (owner, now + lease_seconds, job_id, *FINISHED_JOB_STATUSES, owner, now),
+        ) == 1
+
+    def renew(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        """Extend a lease `owner` still holds; False once another runner has taken the job over."""
+        return self._write(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ?",
+            (time.time() + lease_seconds, job_id, owner),
+        ) == 1
+
+    def release(self, job_id: str, owner: str) -> None:
+        self._write("UPDATE jobs SET owner = NULL, lease_until = NULL WHERE id = ? AND owner = ?", (job_id, owner))
+
+    def incomplete_jobs(self) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM jobs WHERE status NOT IN ({', '.join('?' * len(FINISHED_JOB_STATUSES))}) ORDER BY created",
+                FINISHED_JOB_STATUSES,
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+
+def job_progress(job: Dict) -> Dict:
+    """Public view of a stored job: totals, per-file detail and an ETA."""
+    files = job["files"]
+    finished = [f for f in files if f["status"] in FINISHED_FILE_STATUSES]
+    # files not started yet count as zero progress; the current file by its chunks
+    fraction = len(finished)
+    for f in files:
+        if f["status"] == "running" and f["chunks_total"]:
+            fraction += f["chunks_done"] / f["chunks_total"]
+    progress = fraction / len(files) if files else 0.0
+
+    eta_seconds = None
+    if job["status"] == "running" and job["started"] and 0 < progress < 1:
+        elapsed = time.time() - job["started"]
+        eta_seconds = round(elapsed * (1 - progress) / progress, 1)
+
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "bucket": job["bucket"],
+        "folder": job["folder"],
+        "error": job["error"],
+        "files_total": len(files),
+        "files_done": len(finished),
+        "files_failed": sum(1 for f in files if f["status"] == "failed"),
+        "chunks_done": sum(f["chunks_done"] for f in files),
+        "chunks_total": sum(f["chunks_total"] for f in files),
+        "llm_calls": sum(f["llm_calls"] for f in files),
+        "progress": round(progress, 4),
+        "eta_seconds": eta_seconds,
+        "files": files,
+    }
+
+
+class JobLeaseLost(Exception):
+    """Another runner took the job over after this one failed to renew its lease."""
+
+
+class IngestJobRunner:
+    """
+    Runs stored jobs on a small thread pool. Every job it queues is leased to this
+    runner first and the leases are renewed in the background until the job ends.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 1, lease_seconds: Optional[float] = None) -> None:
+        self.store = store
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds if lease_seconds is not None else get_settings().ingest_job_lease_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest-job")
+        self._active = set()
+        self._active_lock = threading.Lock()
+        threading.Thread(target=self._renew_leases, name="ingest-job-leases", daemon=True).start()
+
+    def submit(self, bucket: str, folder: str, files: Optional[List[str]] = None) -> str:
+        job_id = self.store.create_job(bucket, folder, files)
+        self._schedule(job_id)
+        return job_id
+
+    def resume(self) -> List[str]:
+        """
+        Re-queue unfinished jobs nobody holds a live lease on: those left behind by a
+        process that stopped. Jobs another running worker owns are left alone.
+        """
+        resumed = [job_id for job_id in self.store.incomplete_jobs() if self._schedule(job_id)]
+        if resumed:
+            print(f"Resuming {len(resumed)} ingest job(s)")
+        return resumed
+
+    def _schedule(self, job_id: str) -> bool:
+        with self._active_lock:
+            if job_id in self._active or not self.store.claim(job_id, self.owner, self.lease_seconds):
+                return False
+            self._active.add(job_id)
+        self._pool.submit(self._run, job_id)
+        return True
+
+    def _renew_leases(self) -> None:
+        while True:
+            time.sleep(max(0.05, self.lease_seconds / 3))
+            with self._active_lock:
+                active = list(self._active)
+            for job_id in active:
+                try:
+                    self.store.renew(job_id, self.owner, self.lease_seconds)
+                except Exception as e:
+                    print(f"✗ Could not renew the lease on ingest job {job_id}: {e}")
+
+    def _run(self, job_id: str) -> None:
+        try:
+            self._run_job(job_id)
+        except JobLeaseLost:
+            print(f"✗ Ingest job {job_id} was taken over by another worker; stopping here")
+        except Exception as e:
+            print(f"✗ Ingest job {job_id} failed: {e}")
+            self.store.set_job_status(job_id, "failed", str(e))
+        finally:
+            self._save_index()
+            with self._active_lock:
+                self._active.discard(job_id)
+            self.store.release(job_id, self.owner)
+
+    def _save_index(self) -> None:
+        """Snapshot the BM25 index the job updated, so other processes (and restarts) see the new chunks."""
+        try:
+            bm25_index.save_index()
+        except Exception as e:
+            print(f"✗ Could not save the BM25 index: {e}")
+
+    def _run_job(self, job_id: str) -> None:
+        # imported here so that importing the app does not load the ingestion pipeline
+        import pipeline
+
+        job = self.store.get_job(job_id)
+        self.store.set_job_status(job_id, "running")
+        bucket, folder = job["bucket"], job["folder"]
+
+        if not job["files"]:
+            names = job["requested"]
+            if not names:
+                names = [f["name"] for f in pipeline.list_bucket_files(bucket, folder) if f["name"].endswith(".txt")]
+            self.store.add_files(job_id, names)
+            job = self.store.get_job(job_id)
+
+        for file in job["files"]:
+            if file["status"] in FINISHED_FILE_STATUSES:
+                continue
+            # never start a document another runner may be processing too
+            if not self.store.renew(job_id, self.owner, self.lease_seconds):
+                raise JobLeaseLost(job_id)
+            self._run_file(pipeline, job_id, bucket, folder, file["name"])
+
+        files = self.store.get_job(job_id)["files"]
+        failed = sum(1 for f in files if f["status"] == "failed")
+        if not failed:
+            self.store.set_job_status(job_id, "completed")
+        else:
+            status = "failed" if failed == len(files) else "completed_with_errors"
+            self.store.set_job_status(job_id, status, f"{failed} of {len(files)} files failed")
+
+    def _run_file(self, pipeline, job_id: str, bucket: str, folder: str, name: str) -> None:
+        path = f"{folder}/{name}" if folder else name
+        self.store.update_file(job_id, name, status="running", error=None)
+
+        with metrics.collect() as collected:
+            def llm_calls() -> int:
+                return sum(1 for call in collected.llm_calls if not call["cached"])
+
+            def on_chunk(done: int, total: int, content_hash: str, summary: str) -> None:
+                self.store.save_chunk(job_id, name, content_hash, summary)
+                self.store.update_file(job_id, name, chunks_done=done, chunks_total=total, llm_calls=llm_calls())
+
+            try:
+                text = pipeline.download_text(bucket, path)
+                status = pipeline.process_document(
+                    text,
+                    name,
+                    f"supabase://{bucket}/{path}",
+                    known_summaries=self.store.chunk_summaries(job_id, name),
+                    on_chunk=on_chunk,
+                )
+                error = None if status != "failed" else "Processing failed"
+            except Exception as e:
+                print(f"✗ Error processing {name}: {e}")
+                status, error = "failed", str(e)
+
+        self.store.update_file(job_id, name, status=status, error=error, llm_calls=llm_calls())
+        if status != "failed":
+            self.store.drop_chunks(job_id, name)
+
+
+@lru_cache
+def get_job_runner() -> IngestJobRunner:
+    settings = get_settings()
+    return IngestJobRunner(JobStore(settings.ingest_job_db_path), settings.ingest_job_workers)
+
+
+def resume_incomplete_jobs() -> List[str]:
+    return get_job_runner().resume()
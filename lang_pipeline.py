@@ -1,16 +1,70 @@
 import json
 import operator
-from typing import Annotated, List, Optional, Dict, TypedDict, Union, Literal
+import queue
+import threading
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from typing import Annotated, Callable, Iterator, List, Optional, Dict, Tuple, TypedDict, Union, Literal
 from langgraph.graph import StateGraph, END
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig
 from config import get_settings
+import metrics
+import review_checks
+from answer_stream import AnswerStream
+from clients import get_chat_model
+from context_packer import count_tokens, format_context, pack_context
+from document_router import candidate_documents
+from llm_cache import cached_completion
 from supabase_client import get_supabase_client
+from toc_index import format_toc, get_toc
 
 # Load settings
 settings = get_settings()
-llm = ChatOpenAI(api_key=settings.openai_api_key, model="gpt-4o-mini")
+
+
+def invoke_llm(messages: List[BaseMessage], on_token: Optional[Callable[[str], None]] = None) -> AIMessage:
+    """
+    llm.invoke through the shared response cache.
+    When on_token is given the completion is streamed and each token is passed to it
+    (a cached answer is delivered as a single token).
+    Wall time, token usage and cache hits are recorded in metrics.
+    """
+    llm = get_chat_model()
+    key_messages = [{"role": m.type, "content": m.content} for m in messages]
+    params = {"temperature": llm.temperature}
+    streamed = []
+    usage = {}
+    called = []
+
+    def call():
+        called.append(True)
+        if on_token is None:
+            response = llm.invoke(messages)
+            usage.update(getattr(response, "usage_metadata", None) or {})
+            return response.content
+        for chunk in llm.stream(messages):
+            usage.update(getattr(chunk, "usage_metadata", None) or {})
+            if chunk.content:
+                streamed.append(chunk.content)
+                on_token(chunk.content)
+        return "".join(streamed)
+
+    started = time.perf_counter()
+    content = cached_completion(llm.model_name, key_messages, params, call)
+    metrics.observe_llm_call(
+        llm.model_name,
+        time.perf_counter() - started,
+        # providers that report no usage get an estimate from the packer's tokenizer
+        usage.get("input_tokens") or count_tokens("\n".join(str(m["content"]) for m in key_messages)),
+        usage.get("output_tokens") or count_tokens(content),
+        cached=not called,
+    )
+    if on_token is not None and not streamed:
+        on_token(content)
+    return AIMessage(content=content)
 
 # --- STATE DEFINITION ---
 class AgentState(TypedDict):
@@ -19,10 +73,17 @@ class AgentState(TypedDict):
     """
     query: str
     document_id: Optional[str]
+    # Documents picked by the Routing Node (just document_id when one was given)
+    document_ids: List[str]
+    # document id -> section headings selected from that document's TOC
+    document_sections: Dict[str, List[str]]
     # List of relevant section headings identified by the Structure Node
     target_sections: List[str]
     # The actual text chunks retrieved from Supabase
     retrieved_chunks: List[Dict]
+    # Token-budgeted context built once from retrieved_chunks and shared by
+    # validation, answering and every review retry
+    context: str
     # 'yes' or 'no' from the Validation Node
     is_valid: str
     # Final output response
@@ -31,33 +92,75 @@ class AgentState(TypedDict):
     review_feedback: Optional[str]
     # Count of how many times we've tried to improve the answer
     retry_count: int
+    # 'sequential' (validate, then answer), 'speculative' or 'single_call'
+    mode: str
+
+# --- NODE 0: DOCUMENT ROUTING NODE ---
+def rank_documents(query: str, candidates: List[Dict], top_n: int) -> List[str]:
+    """
+    One LLM call that picks the top_n candidate documents most likely to answer the query.
+    Falls back to the lexical order when there is nothing to choose or the reply is unusable.
+    """
+    lexical_order = [doc['id'] for doc in candidates]
+    if len(candidates) <= top_n:
+        return lexical_order
+
+    listing = "\n\n".join(
+        f"id: {doc['id']}\ntitle: {doc['title']}\nchapters: {doc['profile'][:settings.routing_summary_chars]}"
+        for doc in candidates
+    )
+    messages = [
+        SystemMessage(content=f"""You route clinical questions to guidelines.
+    Given the candidate documents (title and chapter summaries), pick the {top_n} most likely to contain the answer.
+    Return ONLY a JSON array of document ids, most relevant first."""),
+        HumanMessage(content=f"Query: {query}\n\nCandidate documents:\n{listing}")
+    ]
+
+    try:
+        content = invoke_llm(messages).content.replace("```json", "").replace("```", "").strip()
+        chosen = json.loads(content)
+    except Exception:
+        print("   Error parsing LLM response for routing.")
+        chosen = []
+    known = set(lexical_order)
+    ranked = []
+    for doc_id in chosen if isinstance(chosen, list) else []:
+        if str(doc_id) in known and str(doc_id) not in ranked:
+            ranked.append(str(doc_id))
+    return ranked[:top_n] or lexical_order[:top_n]
+
+def document_routing_node(state: AgentState):
+    """
+    Pick the documents to search when the query names none: a lexical prefilter over
+    every document's title and chapter summaries, then one LLM ranking of the shortlist.
+    """
+    print("--- NODE 0: DOCUMENT ROUTING ---")
+    if state.get('document_id'):
+        return {"document_ids": [state['document_id']]}
+
+    try:
+        candidates = candidate_documents(state['query'])
+    except Exception as e:
+        print(f"   Error loading the document catalog: {e}")
+        return {"document_ids": []}
+
+    doc_ids = rank_documents(state['query'], candidates, max(1, settings.routing_top_documents))
+    print(f"   Routed to {len(doc_ids)} of {len(candidates)} candidate documents.")
+    return {"document_ids": doc_ids}
+
 
 # --- NODE 1: HIERARCHICAL STRUCTURE NODE ---
-def hierarchical_structure_node(state: AgentState):
-    print(f"--- NODE 1: HIERARCHICAL STRUCTURE ({state['query']}) ---")
-    query = state['query']
-    doc_id = state.get('document_id')
-    
-    sb = get_supabase_client()
+def select_sections(query: str, doc_id: str) -> List[str]:
+    """Ask the LLM which headings of one document's TOC are likely to hold the answer"""
+    toc = get_toc(doc_id)
     
-    # 1. Fetch Document Structure (Table of Contents)
-    if not doc_id:
-        res = sb.table("documents").select("id").limit(1).execute()
-        if res.data:
-            doc_id = res.data[0]['id']
-        else:
-            return {"target_sections": []}
-
-    res = sb.table("chunks").select("section_heading").eq("document_id", doc_id).execute()
-    
-    if not res.data:
-        print("   No structure found.")
-        return {"target_sections": []}
+    if not toc:
+        print(f"   No structure found for {doc_id}.")
+        return []
 
-    toc = list(set([row['section_heading'] for row in res.data]))
-    toc_str = "\n".join([f"- {h}" for h in toc])
+    toc_str = format_toc(toc)
 
-    # 2. LLM Reasoning to Select Sections
+    # LLM Reasoning to Select Sections
     system_prompt = """You are a clinical reasoning assistant. 
     You have the Table of Contents (TOC) for a clinical guideline. 
     Identify the specific section headings that are most likely to contain the answer to the user's query.
@@ -75,7 +178,7 @@ def hierarchical_structure_node(state: AgentState):
         HumanMessage(content=user_prompt)
     ]
     
-    response = llm.invoke(messages)
+    response = invoke_llm(messages)
     
     try:
         content = response.content.replace("```json", "").replace("```", "").strip()
@@ -85,80 +188,101 @@ def hierarchical_structure_node(state: AgentState):
     except:
         print("   Error parsing LLM response for structure.")
         selected_sections = []
+    return selected_sections
+
+def hierarchical_structure_node(state: AgentState):
+    print(f"--- NODE 1: HIERARCHICAL STRUCTURE ({state['query']}) ---")
+    query = state['query']
+    doc_ids = state.get('document_ids') or ([state['document_id']] if state.get('document_id') else [])
+
+    if not doc_ids:
+        return {"target_sections": [], "document_sections": {}}
+
+    # Section selection for every routed document at once
+    with ThreadPoolExecutor(max_workers=len(doc_ids)) as pool:
+        selected = list(pool.map(metrics.in_context(lambda doc_id: select_sections(query, doc_id)), doc_ids))
 
-    print(f"   Identified {len(selected_sections)} relevant sections.")
+    document_sections = {doc_id: sections for doc_id, sections in zip(doc_ids, selected) if sections}
+    target_sections = list(dict.fromkeys(s for sections in selected for s in sections))
+
+    print(f"   Identified {len(target_sections)} relevant sections in {len(document_sections)} documents.")
     # Initialize retry_count to 0 here
-    return {"target_sections": selected_sections, "document_id": doc_id, "retry_count": 0}
+    return {"target_sections": target_sections, "document_sections": document_sections, "retry_count": 0}
 
 
 # --- NODE 2: CHUNK RETRIEVAL NODE ---
-def chunk_retrieval_node(state: AgentState):
-    print("--- NODE 2: CHUNK RETRIEVAL ---")
-    sections = state.get("target_sections", [])
-    doc_id = state.get("document_id")
-    
-    if not sections or not doc_id:
-        return {"retrieved_chunks": []}
-        
+def fetch_section_chunks(doc_id: str, sections: List[str]) -> List[Dict]:
     sb = get_supabase_client()
-    chunks = []
-    
     try:
         res = sb.table("chunks") \
-            .select("content, section_heading, id") \
+            .select("content, section_heading, id, document_id") \
             .eq("document_id", doc_id) \
             .in_("section_heading", sections) \
             .execute()
-            
-        chunks = res.data if res.data else []
+        return res.data if res.data else []
     except Exception as e:
         print(f"   Error fetching chunks: {e}")
+        return []
+
+def chunk_retrieval_node(state: AgentState):
+    print("--- NODE 2: CHUNK RETRIEVAL ---")
+    sections = state.get("target_sections", [])
+    doc_id = state.get("document_id")
+    document_sections = state.get("document_sections") or ({doc_id: sections} if doc_id and sections else {})
+    
+    if not document_sections:
+        return {"retrieved_chunks": [], "context": ""}
+        
+    with ThreadPoolExecutor(max_workers=len(document_sections)) as pool:
+        fetched = list(pool.map(metrics.in_context(lambda item: fetch_section_chunks(*item)), document_sections.items()))
+    chunks = [chunk for doc_chunks in fetched for chunk in doc_chunks]
         
-    print(f"   Retrieved {len(chunks)} chunks.")
-    return {"retrieved_chunks": chunks}
+    packed = pack_context(state['query'], chunks)
+    print(f"   Retrieved {len(chunks)} chunks, packed {len(packed)} into the context.")
+    return {"retrieved_chunks": chunks, "context": format_context(packed)}
 
 
 # --- NODE 3: VALIDATION NODE ---
-def validation_node(state: AgentState):
-    print("--- NODE 3: VALIDATION ---")
-    query = state['query']
-    chunks = state.get('retrieved_chunks', [])
-    
-    if not chunks:
-        return {"is_valid": "no"}
+def validate_context(query: str, context_text: str) -> str:
+    """Ask the LLM whether the context can answer the query; returns 'yes' or 'no'"""
+    if not context_text:
+        return "no"
 
-    context_text = "\n\n".join([f"Section: {c['section_heading']}\nContent: {c['content']}" for c in chunks])
-    
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a clinical validator. Determine if the provided context contains sufficient information to answer the query safely."),
         ("human", "Query: {query}\n\nContext:\n{context}\n\nDoes the context contain the answer? Respond with only 'yes' or 'no'.")
     ])
     
-    chain = prompt | llm
-    response = chain.invoke({"query": query, "context": context_text})
+    response = invoke_llm(prompt.format_messages(query=query, context=context_text))
     decision = response.content.strip().lower()
     
     if "yes" in decision:
-        decision = "yes"
-    else:
-        decision = "no"
-        
+        return "yes"
+    return "no"
+
+def validation_node(state: AgentState):
+    print("--- NODE 3: VALIDATION ---")
+    decision = validate_context(state['query'], state.get('context', ''))
     print(f"   Validation decision: {decision}")
     return {"is_valid": decision}
 
 
 # --- NODE 4: RESPONSE FORMATTING NODE (Updated for Feedback) ---
-def response_formatting_node(state: AgentState):
-    print(f"--- NODE 4: RESPONSE FORMATTING (Attempt {state.get('retry_count', 0) + 1}) ---")
-    query = state['query']
-    chunks = state.get('retrieved_chunks', [])
-    feedback = state.get('review_feedback')
-    
-    context_text = "\n\n".join([f"[Source: {c['section_heading']}] {c['content']}" for c in chunks])
-    
-    system_prompt = """You are a clinical assistant. Answer the query using ONLY the provided context. 
+ANSWER_SYSTEM_PROMPT = """You are a clinical assistant. Answer the query using ONLY the provided context. 
     Include citations in brackets [Source: Section Name] for every claim.
     Format your response as a JSON object with keys: "answer" and "citations" (list of strings)."""
+
+def parse_json_response(content: str) -> Optional[Dict]:
+    try:
+        parsed = json.loads(content.replace("```json", "").replace("```", "").strip())
+    except Exception:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+def draft_answer(query: str, context_text: str, feedback: Optional[str] = None,
+                 on_token: Optional[Callable[[str], None]] = None) -> Dict:
+    """Generate the answer JSON ({"answer", "citations"}) from the packed context"""
+    system_prompt = ANSWER_SYSTEM_PROMPT
     
     # Inject feedback if this is a retry
     if feedback:
@@ -169,20 +293,94 @@ def response_formatting_node(state: AgentState):
         HumanMessage(content=f"Query: {query}\n\nContext:\n{context_text}")
     ]
     
-    response = llm.invoke(messages)
+    response = invoke_llm(messages, on_token=on_token)
     
-    try:
-        content = response.content.replace("```json", "").replace("```", "").strip()
-        final_json = json.loads(content)
-    except:
+    final_json = parse_json_response(response.content)
+    if final_json is None:
         final_json = {
             "answer": response.content,
             "citations": []
         }
-        
+    return final_json
+
+def response_formatting_node(state: AgentState, config: Optional[RunnableConfig] = None):
+    attempt = state.get('retry_count', 0) + 1
+    print(f"--- NODE 4: RESPONSE FORMATTING (Attempt {attempt}) ---")
+    
+    # stream_pipeline passes a token sink so clients see the answer as it is written;
+    # only the text of the "answer" field is passed on, not the JSON around it
+    token_sink = ((config or {}).get("configurable") or {}).get("token_sink")
+    on_token = None
+    if token_sink:
+        answer_stream = AnswerStream()
+
+        def on_token(token: str):
+            text = answer_stream.feed(token)
+            if text:
+                token_sink(text, attempt)
+
+    final_json = draft_answer(
+        state['query'],
+        state.get('context', ''),
+        state.get('review_feedback'),
+        on_token=on_token,
+    )
     return {"final_response": final_json}
 
 
+# --- NODE 3+4: SPECULATIVE / SINGLE-CALL ANSWER NODE ---
+def single_call_answer(query: str, context_text: str) -> Tuple[str, Dict]:
+    """
+    One completion that returns both the sufficiency verdict and the answer JSON.
+    Falls back to validate_context + draft_answer when the verdict cannot be read.
+    """
+    system_prompt = ANSWER_SYSTEM_PROMPT + """
+    First decide whether the context contains sufficient information to answer the query safely.
+    Return a JSON object with keys: "sufficient" ("yes" or "no"), "answer" and "citations" (list of strings).
+    If "sufficient" is "no", leave "answer" empty and "citations" as []."""
+
+    response = invoke_llm([
+        SystemMessage(content=system_prompt),
+        HumanMessage(content=f"Query: {query}\n\nContext:\n{context_text}")
+    ])
+    parsed = parse_json_response(response.content)
+    if parsed is None or "sufficient" not in parsed:
+        # an unreadable verdict must not turn into a refusal: redo it as two calls
+        print("   Single-call response had no readable verdict; falling back to separate validation and answer calls")
+        decision = validate_context(query, context_text)
+        return decision, draft_answer(query, context_text) if decision == "yes" else {}
+
+    decision = "yes" if "yes" in str(parsed.get("sufficient", "")).lower() else "no"
+    return decision, {"answer": parsed.get("answer", ""), "citations": parsed.get("citations", [])}
+
+def speculative_answer_node(state: AgentState):
+    """
+    Validation and answer generation without waiting on each other.
+    - "speculative": both LLM calls run concurrently; the draft is dropped if validation says no
+    - "single_call": one completion returns the verdict and the answer together
+    """
+    mode = state.get("mode", "speculative")
+    print(f"--- NODE 3+4: {mode.upper()} VALIDATION + ANSWER ---")
+    query = state['query']
+    context_text = state.get('context', '')
+
+    if not context_text:
+        return {"is_valid": "no"}
+
+    if mode == "single_call":
+        decision, draft = single_call_answer(query, context_text)
+    else:
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            verdict = pool.submit(metrics.in_context(validate_context), query, context_text)
+            answer = pool.submit(metrics.in_context(draft_answer), query, context_text)
+            decision, draft = verdict.result(), answer.result()
+
+    print(f"   Validation decision: {decision}")
+    if decision != "yes":
+        return {"is_valid": "no"}
+    return {"is_valid": "yes", "final_response": draft}
+
+
 # --- NODE 5: QUALITY REVIEW NODE (New Function) ---
 def quality_review_node(state: AgentState):
     print("--- NODE 5: QUALITY REVIEW ---")
@@ -196,6 +394,20 @@ def quality_review_node(state: AgentState):
         print("   Max retries reached. Accepting output.")
         return {"review_feedback": None}
 
+    # Mechanical checks (JSON shape, inline citations, cited sections retrieved) run locally
+    local = review_checks.check_answer(response, state.get('retrieved_chunks', []))
+    if not local["passed"]:
+        print(f"   Local Check FAILED: {review_checks.feedback(local)}")
+        return {
+            "review_feedback": review_checks.feedback(local),
+            "retry_count": retries + 1
+        }
+    if not review_checks.needs_llm_review(local, answer_text, settings.review_llm_sample_rate):
+        print("   Local Check PASSED.")
+        return {"review_feedback": None}
+    if local["reasons"]:
+        print(f"   Local Check uncertain ({'; '.join(local['reasons'])}), asking the auditor.")
+
     # LLM grades the output
     system_prompt = """You are a Quality Assurance auditor for a clinical AI. 
     Review the provided answer. It MUST meet these criteria:
@@ -214,7 +426,7 @@ def quality_review_node(state: AgentState):
         HumanMessage(content=user_content)
     ]
     
-    res = llm.invoke(messages)
+    res = invoke_llm(messages)
     
     try:
         content = res.content.replace("```json", "").replace("```", "").strip()
@@ -235,6 +447,16 @@ def quality_review_node(state: AgentState):
 
 
 # --- CONDITIONAL EDGES ---
+def choose_answer_path(state: AgentState):
+    if state.get("mode", "sequential") in ("speculative", "single_call"):
+        return "speculative_answer"
+    return "validation"
+
+def decide_after_speculation(state: AgentState):
+    if state["is_valid"] == "yes":
+        return "quality_review"
+    return "insufficient_info"
+
 def decide_next_node(state: AgentState):
     if state["is_valid"] == "yes":
         return "response_formatting"
@@ -264,18 +486,28 @@ def build_graph():
     workflow = StateGraph(AgentState)
 
     # Add Nodes
-    workflow.add_node("hierarchical_structure", hierarchical_structure_node)
-    workflow.add_node("chunk_retrieval", chunk_retrieval_node)
-    workflow.add_node("validation", validation_node)
-    workflow.add_node("response_formatting", response_formatting_node)
-    workflow.add_node("quality_review", quality_review_node)
-    workflow.add_node("insufficient_info", insufficient_info_node)
+    workflow.add_node("document_routing", metrics.timed_node("document_routing", document_routing_node))
+    workflow.add_node("hierarchical_structure", metrics.timed_node("hierarchical_structure", hierarchical_structure_node))
+    workflow.add_node("chunk_retrieval", metrics.timed_node("chunk_retrieval", chunk_retrieval_node))
+    workflow.add_node("validation", metrics.timed_node("validation", validation_node))
+    workflow.add_node("speculative_answer", metrics.timed_node("speculative_answer", speculative_answer_node))
+    workflow.add_node("response_formatting", metrics.timed_node("response_formatting", response_formatting_node))
+    workflow.add_node("quality_review", metrics.timed_node("quality_review", quality_review_node))
+    workflow.add_node("insufficient_info", metrics.timed_node("insufficient_info", insufficient_info_node))
 
     # Define Edges
-    workflow.set_entry_point("hierarchical_structure")
+    workflow.set_entry_point("document_routing")
     
+    workflow.add_edge("document_routing", "hierarchical_structure")
     workflow.add_edge("hierarchical_structure", "chunk_retrieval")
-    workflow.add_edge("chunk_retrieval", "validation")
+    workflow.add_conditional_edges(
+        "chunk_retrieval",
+        choose_answer_path,
+        {
+            "validation": "validation",
+            "speculative_answer": "speculative_answer"
+        }
+    )
     
     # Conditional Edge 1: Validation -> Formatting OR Insufficient Info
     workflow.add_conditional_edges(
@@ -287,6 +519,15 @@ def build_graph():
         }
     )
     
+    workflow.add_conditional_edges(
+        "speculative_answer",
+        decide_after_speculation,
+        {
+            "quality_review": "quality_review",
+            "insufficient_info": "insufficient_info"
+        }
+    )
+
     # Edge: Formatting -> Quality Review
     workflow.add_edge("response_formatting", "quality_review")
     
@@ -304,21 +545,126 @@ def build_graph():
 
     return workflow.compile()
 
-# Entry point for usage
-app = build_graph()
+@lru_cache
+def get_graph():
+    """The compiled graph, built on first use rather than at import"""
+    return build_graph()
+
+def __getattr__(name: str):
+    # `lang_pipeline.app` predates get_graph(); keep it working without compiling at import
+    if name == "app":
+        return get_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def run_pipeline(query: str, doc_id: Optional[str] = None):
+ANSWER_MODES = ("sequential", "speculative", "single_call")
+
+def run_pipeline(query: str, doc_id: Optional[str] = None, mode: str = "sequential", include_metrics: bool = False):
     """
     Public function to run the vectorless RAG pipeline.
+    `mode` picks how validation and answering are scheduled (see ANSWER_MODES).
+    With include_metrics the result gains a "metrics" key: per-node wall time,
+    LLM calls, tokens, cache hits and review retries of this run.
     """
     initial_state = {
         "query": query, 
         "document_id": doc_id, 
         "retry_count": 0,
-        "review_feedback": None
+        "review_feedback": None,
+        "mode": mode
     }
-    result = app.invoke(initial_state)
-    return result.get("final_response")
+    with metrics.collect() as collected:
+        result = get_graph().invoke(initial_state)
+    retries = result.get("retry_count") or 0
+    summary = collected.summary(retries)
+    metrics.observe_pipeline(mode, summary["total_seconds"], retries)
+
+    final_response = result.get("final_response")
+    if include_metrics:
+        return {**(final_response or {}), "metrics": summary}
+    return final_response
+
+def _progress(node: str, update: Optional[Dict]) -> Dict:
+    """Small, JSON-safe summary of a node's state update for progress events"""
+    update = update or {}
+    event = {"node": node}
+    if "document_ids" in update:
+        event["document_ids"] = update["document_ids"]
+    if "target_sections" in update:
+        event["target_sections"] = update["target_sections"]
+    if "retrieved_chunks" in update:
+        event["retrieved_chunks"] = len(update["retrieved_chunks"] or [])
+    if "is_valid" in update:
+        event["is_valid"] = update["is_valid"]
+    if "review_feedback" in update:
+        event["review_feedback"] = update["review_feedback"]
+    return event
+
+class PipelineCancelled(Exception):
+    """Raised inside the worker thread once the stream_pipeline consumer has gone away"""
+
+
+def stream_pipeline(query: str, doc_id: Optional[str] = None, mode: str = "sequential") -> Iterator[Tuple[str, Dict]]:
+    """
+    Run the pipeline and yield (event, data) pairs as it progresses:
+    - ("node", {...}) when a graph node finishes
+    - ("token", {"text", "attempt"}) for each answer token from the formatting LLM call
+      (speculative drafts are not streamed since they may be discarded)
+    - ("final", {"answer", "citations"}) once the answer has passed review
+    - ("error", {"detail"}) if the run fails
+
+    Closing the generator (the client disconnected) cancels the run: the worker
+    thread stops at the next streamed token or finished node.
+    """
+    events = queue.Queue()
+    done = object()
+    cancelled = threading.Event()
+
+    def token_sink(token: str, attempt: int):
+        if cancelled.is_set():
+            raise PipelineCancelled()
+        events.put(("token", {"text": token, "attempt": attempt}))
+
+    def run():
+        initial_state = {
+            "query": query,
+            "document_id": doc_id,
+            "retry_count": 0,
+            "review_feedback": None,
+            "mode": mode
+        }
+        final_response = None
+        retries = 0
+        try:
+            config = {"configurable": {"token_sink": token_sink}}
+            with metrics.collect() as collected:
+                for step in get_graph().stream(initial_state, config=config, stream_mode="updates"):
+                    if cancelled.is_set():
+                        raise PipelineCancelled()
+                    for node, update in step.items():
+                        events.put(("node", _progress(node, update)))
+                        if update and "final_response" in update:
+                            final_response = update["final_response"]
+                        if update and "retry_count" in update:
+                            retries = update["retry_count"] or 0
+            metrics.observe_pipeline(mode, collected.summary(retries)["total_seconds"], retries)
+            events.put(("final", final_response or {"answer": "", "citations": []}))
+        except PipelineCancelled:
+            print("   Pipeline cancelled: client disconnected")
+        except Exception as e:
+            print(f"   Pipeline failed: {e}")
+            events.put(("error", {"detail": "Pipeline failed"}))
+        finally:
+            events.put(done)
+
+    threading.Thread(target=run, daemon=True).start()
+    try:
+        while True:
+            item = events.get()
+            if item is done:
+                return
+            yield item
+    finally:
+        cancelled.set()
 
 if __name__ == "__main__":
     # Test run
@@ -0,0 +1,46 @@
+import math
+import re
+from collections import Counter
+from typing import Iterable, List, Sequence
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# common English words that carry no signal for ranking clinical text
+STOPWORDS = frozenset("""
+a an and are as at be by can do does for from has have how i in is it its may
+of on or should that the this to was what when where which who why will with
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased alphanumeric terms with stopwords removed."""
+    return [t for t in TOKEN_RE.findall((text or "").lower()) if t not in STOPWORDS]
+
+
+def bm25_scores(
+    query_terms: Iterable[str],
+    documents: Sequence[Sequence[str]],
+    k1: float = 1.5,
+    b: float = 0.75,
+) -> List[float]:
+    """Okapi BM25 score of every tokenized document for the query terms."""
+    if not documents:
+        return []
+
+    query_terms = set(query_terms)
+    avg_len = sum(len(d) for d in documents) / len(documents) or 1.0
+    doc_freq = Counter(term for d in documents for term in set(d) if term in query_terms)
+    n = len(documents)
+
+    scores = []
+    for terms in documents:
+        counts = Counter(terms)
+        score = 0.0
+        for term in query_terms:
+            tf = counts.get(term)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(terms) / avg_len))
+        scores.append(score)
+    return scores
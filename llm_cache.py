@@ -0,0 +1,59 @@
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+from cache import MISSING, LRUCache, SQLiteCache, TieredCache
+from config import get_settings
+
+
+def cache_key(model: str, messages: list, params: Optional[dict] = None) -> str:
+    """Stable key for an LLM request: model + messages + generation parameters."""
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params or {}},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@lru_cache
+def get_llm_cache() -> Optional[TieredCache]:
+    """
+    Shared response cache for ingestion and the LangGraph pipeline.
+    Memory LRU in front of an optional SQLite file; None when disabled.
+    """
+    settings = get_settings()
+    if not settings.llm_cache_enabled:
+        return None
+
+    ttl = settings.llm_cache_ttl_seconds or None
+    tiers = [LRUCache(settings.llm_cache_memory_entries, ttl)]
+    if settings.llm_cache_path:
+        tiers.append(SQLiteCache(settings.llm_cache_path, settings.llm_cache_disk_entries, ttl))
+    return TieredCache(*tiers)
+
+
+def cached_completion(model: str, messages: list, params: Optional[dict], call: Callable[[], str]) -> str:
+    """
+    Return the cached response text for this request, or run `call` and cache its result.
+    Failed calls are never cached. A failing cache (e.g. a locked SQLite file) counts as a
+    miss and never fails the LLM call itself.
+    """
+    cache = get_llm_cache()
+    if cache is None:
+        return call()
+
+    key = cache_key(model, messages, params)
+    try:
+        content: Any = cache.get(key, MISSING)
+    except Exception as e:
+        print(f"   LLM cache read failed, calling the model: {e}")
+        content = MISSING
+    if content is MISSING:
+        content = call()
+        try:
+            cache.set(key, content)
+        except Exception as e:
+            print(f"   LLM cache write failed: {e}")
+    return content
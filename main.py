@@ -1,14 +1,48 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
+import db_profiler
+from config import get_settings
 from routers.health import router as health_router
 from routers.documents import router as documents_router
 from routers.search import router as search_router
+from routers.ask import router as ask_router
+from routers.metrics import router as metrics_router
+from routers.ingest import router as ingest_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # pick up ingest jobs that were interrupted by the last shutdown or crash
+    if get_settings().ingest_resume_on_startup:
+        import ingest_jobs
+
+        ingest_jobs.resume_incomplete_jobs()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.middleware("http")
+async def db_profile_header(request: Request, call_next):
+    """With DB_PROFILING on, report the request's Supabase round trips in X-DB-Profile."""
+    settings = get_settings()
+    if not settings.db_profiling:
+        return await call_next(request)
+    with db_profiler.profile(request.url.path, settings.db_profiling_repeat_threshold) as unit:
+        response = await call_next(request)
+    response.headers["X-DB-Profile"] = db_profiler.header_value(unit)
+    return response
 
-app = FastAPI()
 
 # Routers
 app.include_router(health_router)
 app.include_router(documents_router)
 app.include_router(search_router)
+app.include_router(ask_router)
+app.include_router(metrics_router)
+app.include_router(ingest_router)
 
 app.mount("/", StaticFiles(directory="static", html=True), name="static")
@@ -0,0 +1,192 @@
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# default latency buckets (seconds), from a cached TOC lookup up to a slow retry loop
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (16, 64, 256, 1024, 2048, 4096, 8192, 16384, 32768)
+RETRY_BUCKETS = (0, 1, 2, 3)
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Thread-safe Prometheus-style histogram with a fixed set of label names."""
+
+    def __init__(self, name: str, help_text: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # label values -> (per-bucket counts, sum, count)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    labels = _labels(self.label_names, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _labels(self.label_names, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+    def clear(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+
+NODE_DURATION = Histogram(
+    "vlrag_node_duration_seconds", "Wall time of each LangGraph node.", ("node",))
+LLM_DURATION = Histogram(
+    "vlrag_llm_call_duration_seconds", "Wall time of LLM calls, including response cache hits.", ("model", "cached"))
+LLM_TOKENS = Histogram(
+    "vlrag_llm_tokens", "Tokens per LLM call that reached the provider.", ("model", "kind"), TOKEN_BUCKETS)
+PIPELINE_DURATION = Histogram(
+    "vlrag_pipeline_duration_seconds", "Wall time of a full question-answering run.", ("mode",))
+PIPELINE_RETRIES = Histogram(
+    "vlrag_pipeline_retries", "Quality-review retries per question-answering run.", ("mode",), RETRY_BUCKETS)
+
+HISTOGRAMS = (NODE_DURATION, LLM_DURATION, LLM_TOKENS, PIPELINE_DURATION, PIPELINE_RETRIES)
+
+
+class RequestMetrics:
+    """Per-run breakdown collected while a pipeline run is active (see collect())."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.nodes: List[Dict] = []
+        self.llm_calls: List[Dict] = []
+
+    def add_node(self, node: str, seconds: float) -> None:
+        with self._lock:
+            self.nodes.append({"node": node, "seconds": round(seconds, 6)})
+
+    def add_llm_call(self, call: Dict) -> None:
+        with self._lock:
+            self.llm_calls.append(call)
+
+    def summary(self, retries: int = 0) -> Dict:
+        with self._lock:
+            calls = list(self.llm_calls)
+            nodes = list(self.nodes)
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 6),
+            "retries": retries,
+            "nodes": nodes,
+            "llm": {
+                "calls": len(calls),
+                "cache_hits": sum(1 for c in calls if c["cached"]),
+                "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+                "completion_tokens": sum(c["completion_tokens"] for c in calls),
+                "seconds": round(sum(c["seconds"] for c in calls), 6),
+            },
+        }
+
+
+_current: contextvars.ContextVar[Optional[RequestMetrics]] = contextvars.ContextVar("vlrag_request_metrics", default=None)
+
+
+@contextmanager
+def collect() -> Iterator[RequestMetrics]:
+    """Collect per-node and per-LLM-call metrics for everything run inside the block."""
+    request = RequestMetrics()
+    token = _current.set(request)
+    try:
+        yield request
+    finally:
+        _current.reset(token)
+
+
+def in_context(fn: Callable) -> Callable:
+    """
+    Bind fn to the caller's context so work handed to a thread pool is still
+    attributed to the current request.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def timed_node(name: str, fn: Callable) -> Callable:
+    """Wrap a graph node so its wall time is recorded (keeps the signature LangGraph inspects)."""
+    @functools.wraps(fn)
+    def node(state, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(state, **kwargs)
+        finally:
+            observe_node(name, time.perf_counter() - started)
+    return node
+
+
+def observe_node(node: str, seconds: float) -> None:
+    NODE_DURATION.observe(seconds, node=node)
+    request = _current.get()
+    if request is not None:
+        request.add_node(node, seconds)
+
+
+def observe_llm_call(model: str, seconds: float, prompt_tokens: int, completion_tokens: int, cached: bool) -> None:
+    """Record one LLM call; cache hits cost no provider tokens and are counted with zero."""
+    if cached:
+        prompt_tokens = completion_tokens = 0
+    LLM_DURATION.observe(seconds, model=model, cached=str(cached).lower())
+    if not cached:
+        LLM_TOKENS.observe(prompt_tokens, model=model, kind="prompt")
+        LLM_TOKENS.observe(completion_tokens, model=model, kind="completion")
+    request = _current.get()
+    if request is not None:
+        request.add_llm_call({
+            "model": model,
+            "seconds": round(seconds, 6),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached": cached,
+        })
+
+
+def observe_pipeline(mode: str, seconds: float, retries: int) -> None:
+    PIPELINE_DURATION.observe(seconds, mode=mode)
+    PIPELINE_RETRIES.observe(retries, mode=mode)
+
+
+def render_prometheus() -> str:
+    """Every histogram in the Prometheus text exposition format."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines.extend(histogram.render())
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    for histogram in HISTOGRAMS:
+        histogram.clear()
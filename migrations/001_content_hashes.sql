@@ -0,0 +1,7 @@
+-- Content hashes used by pipeline.py to skip unchanged documents and
+-- reuse summaries of unchanged chunks on re-ingestion.
+alter table documents add column if not exists content_hash text;
+alter table chunks add column if not exists content_hash text;
+
+create index if not exists documents_source_idx on documents (source);
+create index if not exists chunks_document_id_content_hash_idx on chunks (document_id, content_hash);
@@ -0,0 +1,11 @@
+-- One row per document with its title and mapped URL, so search_service can
+-- enrich results with a single query instead of chaining documents ->
+-- "Document URL Mapping".
+-- security_invoker (Postgres 15+) makes the view apply the caller's RLS policies
+-- on both tables instead of the view owner's; re-running this file also fixes
+-- views created by earlier versions of it.
+create or replace view document_url_lookup
+with (security_invoker = true) as
+select d.id, d.title, m.url
+from documents d
+left join "Document URL Mapping" m on m.file_name = d.title;
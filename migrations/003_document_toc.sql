@@ -0,0 +1,3 @@
+-- Table of contents built at ingest time (ordered headings with levels),
+-- read by lang_pipeline's structure node instead of scanning chunks.
+alter table documents add column if not exists toc jsonb;
@@ -0,0 +1,3 @@
+-- Chapter summaries per document ([{"chapter", "summary"}] in document order),
+-- read by document_router to route questions that name no document.
+alter table documents add column if not exists chapter_summaries jsonb;
@@ -0,0 +1,14 @@
+-- One-row table holding the current version of the ingested data. Ingestion
+-- writes a new value after changing a document; API processes poll it (see
+-- data_version.py) to drop caches filled from the previous version.
+create table if not exists ingest_version (
+    id int primary key default 1 check (id = 1),
+    version text not null,
+    updated_at timestamptz not null default now()
+);
+insert into ingest_version (id, version) values (1, 'initial') on conflict (id) do nothing;
+
+-- readable with the anon key, writable only with the service role
+alter table ingest_version enable row level security;
+drop policy if exists "ingest_version is readable" on ingest_version;
+create policy "ingest_version is readable" on ingest_version for select using (true);
@@ -0,0 +1,20 @@
+-- One documents row per source. pipeline.py looks documents up by source, so
+-- duplicates (left by concurrent or interrupted runs) made it pick an arbitrary
+-- row. Keep the row pipeline.find_document picks (the first by id with a
+-- content hash, else the first by id), delete the rest with their chunks, and
+-- enforce uniqueness from now on. Run it while no ingestion is in progress.
+create temporary table duplicate_documents as
+select id from (
+    select id,
+           row_number() over (partition by source order by (content_hash is null), id) as rank
+    from documents
+    where source is not null
+) ranked
+where rank > 1;
+
+delete from chunks where document_id in (select id from duplicate_documents);
+delete from documents where id in (select id from duplicate_documents);
+drop table duplicate_documents;
+
+drop index if exists documents_source_idx;
+create unique index if not exists documents_source_key on documents (source);
@@ -1,19 +1,79 @@
 import os
 import json
+import hashlib
 import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from openai import OpenAI
-from supabase import create_client, Client
+from typing import Callable
+from queue import Queue
 from tqdm import tqdm  # Import progress bar
 from config import get_settings
+from chapter_reducer import ChapterReducer
+from context_packer import count_tokens
+from heading_detector import align_offsets, detect_headings_local, merge_window_headings, split_windows
+import bm25_index
+import data_version
+import db_profiler
+from clients import get_openai_client, get_supabase_client
+import metrics
+import storage_reader
+from document_router import invalidate_catalog
+from llm_cache import cached_completion
+from search_service import invalidate_document
+from toc_index import build_toc, invalidate_toc
 
 settings = get_settings()
 
-client = OpenAI(api_key=settings.openai_api_key)
+# The OpenAI and Supabase clients come from the shared registry in clients.py
+# (created on first use; the service_role key is preferred so ingestion bypasses RLS).
 
-# Use service_role_key for backend scripts to bypass RLS
-supa_key = settings.supabase_service_role_key if settings.supabase_service_role_key else settings.supabase_anon_key
-supabase: Client = create_client(settings.supabase_url, supa_key)
+
+class RateLimiter:
+    """Spaces out calls so that at most `per_minute` start in any minute (0 disables)."""
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+llm_rate_limiter = RateLimiter(settings.llm_requests_per_minute)
+
+
+def chat_completion(messages: list[dict], model: str = "gpt-4o-mini", **params) -> str:
+    """Cached, rate-limited chat completion; returns the message content"""
+    usage = []
+
+    def call():
+        llm_rate_limiter.wait()
+        response = get_openai_client().chat.completions.create(model=model, messages=messages, **params)
+        usage.append(response.usage)
+        return response.choices[0].message.content
+
+    started = time.perf_counter()
+    content = cached_completion(model, messages, params, call)
+    reported = usage[0] if usage else None
+    metrics.observe_llm_call(
+        model,
+        time.perf_counter() - started,
+        getattr(reported, 'prompt_tokens', 0) or 0,
+        getattr(reported, 'completion_tokens', 0) or 0,
+        cached=not usage,
+    )
+    return content
 
 def clean_json_response(content: str) -> str:
     """Helper to strip markdown code blocks from LLM response"""
@@ -46,23 +106,49 @@ def limit_to_first_n_pages(text: str, n: int = 3) -> str:
     return "\n\n".join(pages[:n])
 
 def detect_headings(text: str) -> list[dict]:
+    """Identify headings across the whole document.
+
+    The rule-based detector runs over the full text first. When it is unsure, the text
+    is split into overlapping windows that are segmented in parallel (locally where
+    possible, otherwise by the LLM) and merged back using global offsets.
+    """
+    headings, confidence = detect_headings_local(text)
+    if confidence >= settings.heading_confidence_threshold:
+        return headings
+
+    overlap = settings.heading_window_overlap
+    windows = split_windows(text, settings.heading_window_chars, overlap)
+    if len(windows) == 1:
+        return detect_window_headings(text)
+
+    print(f"  - Local heading confidence {confidence:.2f}, segmenting {len(windows)} windows")
+    with ThreadPoolExecutor(max_workers=max(1, settings.summary_workers)) as pool:
+        results = list(pool.map(metrics.in_context(lambda window: detect_window_headings(window[1])), windows))
+    return merge_window_headings(windows, results, overlap)
+
+def detect_window_headings(text: str) -> list[dict]:
+    """Headings for one window: rule-based when confident, LLM otherwise"""
+    headings, confidence = detect_headings_local(text)
+    if confidence >= settings.heading_confidence_threshold:
+        return headings
+    return detect_headings_llm(text) or headings
+
+def detect_headings_llm(text: str) -> list[dict]:
     """Use LLM to identify chapter headings and structure"""
     prompt = f"""Analyze this clinical document and identify all headings and their hierarchy.
     Return a strictly valid JSON array of objects with these exact keys: "heading_text", "level" (integer 1-3), and "start_position" (integer index).
     It's very possible you will encounter an initial list of all chapter headings - ignore that and look for the actual headings, likely with new lines before and after.
 
     Document:
-    {text[:5000]}
+    {text[:settings.heading_window_chars]}
     """
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
+        content = chat_completion(
+            [{"role": "user", "content": prompt}],
             response_format={"type": "json_object"} 
         )
         
-        content = response.choices[0].message.content
         cleaned_content = clean_json_response(content)
         data = json.loads(cleaned_content)
         
@@ -80,7 +166,8 @@ def detect_headings(text: str) -> list[dict]:
             if isinstance(item, dict) and 'start_position' in item:
                 validated_data.append(item)
                 
-        return validated_data
+        # The model's offsets are approximate; snap them onto the real heading text
+        return align_offsets(text, validated_data)
 
     except Exception as e:
         print(f"Warning: Heading detection failed ({e}). Treating as single chunk.")
@@ -128,12 +215,7 @@ def summarize_chunk(content: str, heading: str) -> str:
     Content: {content[:2000]}
     """
     
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}]
-    )
-    
-    return response.choices[0].message.content
+    return chat_completion([{"role": "user", "content": prompt}])
 
 def create_chapter_summary(section_summaries: list[str], chapter_name: str) -> str:
     """Create chapter-wide summary from section summaries"""
@@ -149,28 +231,251 @@ def create_chapter_summary(section_summaries: list[str], chapter_name: str) -> s
     {combined}
     """
     
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}]
-    )
+    return chat_completion([{"role": "user", "content": prompt}])
+
+def combine_section_summaries(section_summaries: list[str], chapter_name: str) -> str:
+    """Condense consecutive section summaries of a large chapter into one (a step of the chapter tree-reduce)"""
+    combined = "\n".join(section_summaries)
+
+    prompt = f"""Combine these consecutive section summaries from one chapter into a single summary.
+    Keep every key clinical recommendation, treatment and threshold; drop repetition.
     
-    return response.choices[0].message.content
+    Chapter: {chapter_name}
+    Section summaries:
+    {combined}
+    """
+
+    return chat_completion([{"role": "user", "content": prompt}])
+
+def summarize_chapters(
+    chapters: dict[str, list[dict]],
+    pbar=None,
+    max_workers: int = None,
+    known_summaries: dict[str, str] = None,
+    known_chapter_summaries: dict[str, str] = None,
+    on_summary: Callable[[dict, str], None] = None,
+) -> tuple[dict[int, str], dict[str, str]]:
+    """Summarize every chunk concurrently and tree-reduce each chapter while its sections finish.
+
+    Section summaries are condensed in token-bounded batches (CHAPTER_SUMMARY_BATCH_TOKENS)
+    as soon as a run of consecutive ones is ready, so large chapters never need one
+    oversized prompt; chapters that fit in one batch get a single chapter summary call.
+    Reductions are run ahead of the chunks still waiting for a worker, so each
+    chapter's summary is ready soon after its own chunks, not after the whole document's.
+
+    `known_summaries` maps chunk content hashes to summaries from a previous run and
+    `known_chapter_summaries` maps chapter names to still-valid chapter summaries;
+    both are reused instead of calling the LLM. `on_summary(chunk, summary)` is called
+    as each chunk's summary becomes available (reused ones included).
+
+    Returns (chunk summaries keyed by chunk position, chapter summaries keyed by chapter name).
+    Chunks whose summary failed are left out, the same way the sequential loop skipped them.
+    """
+    max_workers = max_workers or settings.summary_workers
+    known_summaries = known_summaries or {}
+    known_chapter_summaries = known_chapter_summaries or {}
+    summaries = {}
+    reducers = {}
+
+    workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # every call in flight, with the callback that handles its result (run on this thread)
+        pending = {}
+        # calls not yet handed to the pool: at most `workers` are ever submitted, so a
+        # reduction queued here runs on the next free worker instead of waiting behind
+        # every chunk of the document (chunks go in document order, chapter by chapter)
+        reductions = deque()
+        chunk_calls = deque()
+
+        def submit_ready():
+            while len(pending) < workers and (reductions or chunk_calls):
+                fn, args, done = (reductions or chunk_calls).popleft()
+                pending[pool.submit(metrics.in_context(fn), *args)] = done
+
+        def chapter_reducer(chapter_name: str) -> ChapterReducer:
+            def reduce(texts, final, done):
+                def handle(future):
+                    try:
+                        done(future.result())
+                    except Exception as e:
+                        print(f"\nError summarizing chapter {chapter_name}: {e}")
+                        done(None)
+
+                fn = create_chapter_summary if final else combine_section_summaries
+                reductions.append((fn, (texts, chapter_name), handle))
+
+            return ChapterReducer(len(chapters[chapter_name]), settings.chapter_summary_batch_tokens, count_tokens, reduce)
+
+        def chunk_handler(chapter_name: str, index: int, chunk: dict):
+            def handle(future):
+                summary = None
+                try:
+                    summary = summaries[chunk['position']] = future.result()
+                    if pbar is not None:
+                        pbar.update(1)  # Update progress bar
+                    if on_summary is not None:
+                        on_summary(chunk, summary)
+                except Exception as e:
+                    print(f"\nError processing chunk: {e}")
+                if chapter_name in reducers:
+                    reducers[chapter_name].add(index, summary)
+            return handle
+
+        for chapter_name, chapter_chunks in chapters.items():
+            if chapter_name not in known_chapter_summaries:
+                reducers[chapter_name] = chapter_reducer(chapter_name)
+            for index, chunk in enumerate(chapter_chunks):
+                if chunk.get('content_hash') in known_summaries:
+                    summaries[chunk['position']] = known_summaries[chunk['content_hash']]
+                    if pbar is not None:
+                        pbar.update(1)
+                    if on_summary is not None:
+                        on_summary(chunk, summaries[chunk['position']])
+                    if chapter_name in reducers:
+                        reducers[chapter_name].add(index, summaries[chunk['position']])
+                    continue
+                chunk_calls.append((summarize_chunk, (chunk['content'], chunk['heading']), chunk_handler(chapter_name, index, chunk)))
+
+        submit_ready()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.pop(future)(future)
+            submit_ready()
+
+    chapter_summaries = {
+        name: summary for name, summary in known_chapter_summaries.items() if name in chapters
+    }
+    for chapter_name, reducer in reducers.items():
+        if reducer.summary:
+            chapter_summaries[chapter_name] = reducer.summary
+    return summaries, chapter_summaries
+
+def reusable_chapter_summaries(chapters: dict[str, list[dict]], previous_chunks: list[dict]) -> dict[str, str]:
+    """Find chapters whose stored summary is still valid.
+
+    A chapter summary can be reused when the chapter is made of exactly the same
+    chunk hashes as the previous chapter that produced it.
+    """
+    by_hash = {row['content_hash']: row for row in previous_chunks if row.get('content_hash')}
+    previous_members = {}
+    for row in previous_chunks:
+        if row.get('chapter_summary'):
+            previous_members.setdefault(row['chapter_summary'], set()).add(row.get('content_hash'))
+
+    reusable = {}
+    for chapter_name, chapter_chunks in chapters.items():
+        hashes = {chunk['content_hash'] for chunk in chapter_chunks}
+        if not hashes or not all(h in by_hash for h in hashes):
+            continue
+        previous = {by_hash[h].get('chapter_summary') for h in hashes}
+        if len(previous) != 1:
+            continue
+        (chapter_summary,) = previous
+        if chapter_summary and previous_members.get(chapter_summary) == hashes:
+            reusable[chapter_name] = chapter_summary
+    return reusable
+
+def insert_chunks(rows: list[dict], batch_size: int = None) -> dict[int, str]:
+    """Bulk insert chunk rows and return their ids keyed by position_in_doc.
+
+    Rows go in batches of `batch_size`. If a batch is rejected, its rows are retried
+    one at a time so a single bad chunk does not drop its neighbours.
+    """
+    batch_size = max(1, batch_size or settings.chunk_insert_batch_size)
+    supabase = get_supabase_client()
+    chunk_ids = {}
+
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        try:
+            res = supabase.table('chunks').insert(batch).execute()
+            inserted = res.data or []
+        except Exception as e:
+            print(f"\nBulk insert failed ({e}), retrying rows individually")
+            inserted = []
+            for row in batch:
+                try:
+                    res = supabase.table('chunks').insert(row).execute()
+                    inserted.extend(res.data or [])
+                except Exception as row_error:
+                    print(f"\nError storing chunk: {row_error}")
+
+        for row in inserted:
+            chunk_ids[row['position_in_doc']] = row['id']
+
+    return chunk_ids
+
+def content_hash(*parts: str) -> str:
+    """Stable sha256 over one or more text parts"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def find_document(supabase, source: str):
+    """
+    The documents row for `source`, or None. Read-only.
+
+    migrations/006_unique_document_source.sql makes `source` unique. On a database
+    without it duplicates are reported, not deleted (another run may still be
+    writing one of them), and the same row is always picked: the first by id that
+    was fully ingested, else the first by id.
+    """
+    rows = supabase.table('documents').select('id, content_hash').eq('source', source).order('id').execute().data or []
+    if not rows:
+        return None
+    keep = next((row for row in rows if row.get('content_hash')), rows[0])
+    if len(rows) > 1:
+        print(f"  - Warning: {len(rows)} document rows for {source}; using {keep['id']}."
+              " Apply migrations/006_unique_document_source.sql to remove the duplicates")
+    return keep
+
+def process_document(
+    text: str,
+    filename: str,
+    source: str,
+    known_summaries: dict[str, str] = None,
+    on_chunk: Callable[[int, int, str, str], None] = None,
+):
+    """Main pipeline: Process text content → Supabase tables
 
-def process_document(text: str, filename: str, source: str):
-    """Main pipeline: Process text content → Supabase tables"""
+    Documents are keyed by `source`. An unchanged file (same content hash) is skipped;
+    a changed one only re-summarizes the chunks whose content hash is new.
+
+    `known_summaries` adds chunk summaries (by content hash) saved elsewhere, e.g. by an
+    interrupted ingest job, and `on_chunk(done, total, content_hash, summary)` reports
+    each chunk summary as it is produced so a caller can persist it.
+    """
     print(f"Processing {filename}...")
-    
-    # Insert document record
-    doc_response = supabase.table('documents').insert({
-        'title': filename,
-        'source': source
-    }).execute()
-    
-    if hasattr(doc_response, 'data') and doc_response.data:
-        doc_id = doc_response.data[0]['id']
+    doc_hash = content_hash(text)
+    supabase = get_supabase_client()
+
+    existing = find_document(supabase, source)
+    previous_chunks = []
+
+    if existing:
+        doc_id = existing['id']
+        if existing.get('content_hash') == doc_hash:
+            print(f"  - Unchanged, skipping {filename}")
+            return "skipped"
+        previous_chunks = supabase.table('chunks') \
+            .select('id, content_hash, summary, chapter_summary') \
+            .eq('document_id', doc_id) \
+            .execute().data or []
     else:
-        print(f"Error creating document record for {filename}")
-        return
+        # Insert document record
+        doc_response = supabase.table('documents').insert({
+            'title': filename,
+            'source': source
+        }).execute()
+        
+        if hasattr(doc_response, 'data') and doc_response.data:
+            doc_id = doc_response.data[0]['id']
+        else:
+            print(f"Error creating document record for {filename}")
+            return "failed"
 
     # Detect structure
     headings = detect_headings(text)
@@ -180,6 +485,9 @@ def process_document(text: str, filename: str, source: str):
     chunks = chunk_by_headings(text, headings)
     print(f"  - Created {len(chunks)} chunks")
     
+    for chunk in chunks:
+        chunk['content_hash'] = content_hash(chunk['heading'], chunk['content'])
+
     # Group chunks by chapter
     chapters = {}
     current_chapter = "General"
@@ -196,85 +504,210 @@ def process_document(text: str, filename: str, source: str):
     # Calculate total operations for progress bar
     total_chunks = len(chunks)
     
+    known_summaries = {
+        **(known_summaries or {}),
+        **{row['content_hash']: row['summary'] for row in previous_chunks if row.get('content_hash') and row.get('summary')},
+    }
+    known_chapter_summaries = reusable_chapter_summaries(chapters, previous_chunks)
+    if previous_chunks:
+        reused = sum(1 for chunk in chunks if chunk['content_hash'] in known_summaries)
+        print(f"  - Reusing {reused} chunk and {len(known_chapter_summaries)} chapter summaries")
+
     print("  - Generating summaries...")
+    done_count = 0
+    done_lock = threading.Lock()
+
+    def chunk_done(chunk: dict, summary: str):
+        nonlocal done_count
+        if on_chunk is None:
+            return
+        with done_lock:
+            done_count += 1
+            done = done_count
+        on_chunk(done, total_chunks, chunk['content_hash'], summary)
     
     # Use tqdm for a progress bar
     with tqdm(total=total_chunks, unit="chunk") as pbar:
-        for chapter_name, chapter_chunks in chapters.items():
-            if not chapter_chunks:
+        summaries, chapter_summaries = summarize_chapters(
+            chapters,
+            pbar,
+            known_summaries=known_summaries,
+            known_chapter_summaries=known_chapter_summaries,
+            on_summary=chunk_done,
+        )
+
+    # Store in database, in document order, chapter summaries included
+    rows = []
+    for chapter_name, chapter_chunks in chapters.items():
+        for chunk in chapter_chunks:
+            if chunk['position'] not in summaries:
                 continue
-                
-            section_summaries = []
-            
-            for chunk in chapter_chunks:
-                try:
-                    # Summarize section
-                    summary = summarize_chunk(chunk['content'], chunk['heading'])
-                    section_summaries.append(summary)
-                    
-                    # Store in database
-                    supabase.table('chunks').insert({
-                        'document_id': doc_id,
-                        'section_heading': chunk['heading'],
-                        'content': chunk['content'],
-                        'summary': summary,
-                        'position_in_doc': chunk['position']
-                    }).execute()
-                    
-                    pbar.update(1)  # Update progress bar
-                    
-                except Exception as e:
-                    print(f"\nError processing chunk: {e}")
-            
-            # Create chapter summary (outside the chunk loop)
-            if section_summaries:
-                chapter_summary = create_chapter_summary(section_summaries, chapter_name)
-                
-                # Update all chunks in this chapter
-                for chunk in chapter_chunks:
-                    supabase.table('chunks').update({
-                        'chapter_summary': chapter_summary
-                    }).match({
-                        'document_id': doc_id,
-                        'section_heading': chunk['heading']
-                    }).execute()
+            rows.append({
+                'document_id': doc_id,
+                'section_heading': chunk['heading'],
+                'content': chunk['content'],
+                'summary': summaries[chunk['position']],
+                'position_in_doc': chunk['position'],
+                'content_hash': chunk['content_hash'],
+                'chapter_summary': chapter_summaries.get(chapter_name),
+            })
+    chunk_ids = insert_chunks(rows)
+    complete = len(chunk_ids) == len(chunks)
+    chapters_stored = all(chapter_summaries.get(chapter_name) for chapter_name in chapters)
+
+    # Replace the previous version's rows only once all new ones are in; after a
+    # partial insert both stay until the next run, which reuses their summaries
+    if complete:
+        stale_ids = [row['id'] for row in previous_chunks]
+        batch_size = max(1, settings.chunk_insert_batch_size)
+        for i in range(0, len(stale_ids), batch_size):
+            supabase.table('chunks').delete().in_('id', stale_ids[i:i + batch_size]).execute()
+
+    # Store the table of contents with the document so queries never scan chunks for it
+    document_update = {'toc': build_toc([c for c in chunks if c['position'] in chunk_ids])}
+    # ...and the chapter summaries document_router routes questions on
+    document_update['chapter_summaries'] = [
+        {'chapter': chapter_name, 'summary': chapter_summaries[chapter_name]}
+        for chapter_name in chapters if chapter_summaries.get(chapter_name)
+    ]
+
+    # Only record the hash when every chunk and chapter summary made it, so a partial run is retried next time
+    if complete and chapters_stored:
+        document_update['content_hash'] = doc_hash
+    elif not complete:
+        print(f"  - {len(chunks) - len(chunk_ids)} chunks failed; {filename} will be retried on the next run")
+    else:
+        print(f"  - Chapter summaries failed; {filename} will be retried on the next run")
+    supabase.table('documents').update(document_update).eq('id', doc_id).execute()
     
+    if settings.search_backend == "bm25":
+        bm25_index.update_document(doc_id, [
+            {**row, 'id': chunk_ids[row['position_in_doc']]} for row in rows if row['position_in_doc'] in chunk_ids
+        ])
+    invalidate_document(doc_id, filename)
+    invalidate_toc(doc_id)
+    invalidate_catalog()
+    # tell API processes (which cannot see the calls above) that the data changed
+    data_version.bump()
     print(f"\n✓ Processed {filename}")
+    return "processed"
+
+def list_bucket_files(bucket_name: str, folder_path: str, page_size: int = None):
+    """Yield every entry in a storage folder, one list() page at a time"""
+    page_size = max(1, page_size or settings.storage_list_page_size)
+    storage = get_supabase_client().storage.from_(bucket_name)
+    offset = 0
+
+    while True:
+        page = storage.list(folder_path, {
+            "limit": page_size,
+            "offset": offset,
+            "sortBy": {"column": "name", "order": "asc"}
+        })
+        if not page:
+            return
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += page_size
+
+def download_text(bucket_name: str, file_path_in_bucket: str) -> str:
+    """Stream a text file from storage, stopping after the first MAX_PAGES pages when set"""
+    return storage_reader.read_text(
+        get_supabase_client(),
+        bucket_name,
+        file_path_in_bucket,
+        max_pages=settings.max_pages,
+        chunk_size=settings.storage_stream_chunk_bytes,
+    )
 
 def process_storage_bucket():
-    """Process all .txt files from Supabase Storage bucket"""
-    bucket_name = "Medical Guidelines"
-    folder_path = "Diabetes Text/text"
+    """Process all .txt files from Supabase Storage bucket
+
+    Runs as a staged pipeline: a downloader thread prefetches files into a bounded
+    queue while a pool of workers runs process_document on several files at once.
+    """
+    bucket_name = settings.storage_bucket
+    folder_path = settings.storage_folder
     
     print(f"Connecting to Storage Bucket: {bucket_name}...")
-    
-    try:
-        files = supabase.storage.from_(bucket_name).list(folder_path)
-        
-        if not files:
-            print("No files found.")
-            return
 
-        for file in files:
-            if file['name'].endswith('.txt'):
+    started = time.perf_counter()
+    stats = {"processed": 0, "skipped": 0, "failed": 0}
+    stats_lock = threading.Lock()
+    workers = max(1, settings.ingest_document_workers)
+    downloads = Queue(maxsize=max(1, settings.download_prefetch))
+    done = object()
+
+    def record(status: str):
+        with stats_lock:
+            stats[status] += 1
+
+    def download_files():
+        try:
+            for file in list_bucket_files(bucket_name, folder_path):
+                if not file['name'].endswith('.txt'):
+                    record("skipped")
+                    continue
+
                 file_path_in_bucket = f"{folder_path}/{file['name']}"
                 print(f"\nDownloading {file_path_in_bucket}...")
-                
-                content_bytes = supabase.storage.from_(bucket_name).download(file_path_in_bucket)
-                text_content = content_bytes.decode('utf-8')
-                # Limit to the first 3 pages to avoid processing whole documents
-                text_content = limit_to_first_n_pages(text_content, 3)
-                
-                process_document(
-                    text=text_content, 
-                    filename=file['name'], 
-                    source=f"supabase://{bucket_name}/{file_path_in_bucket}"
-                )
-            else:
-                pass 
-                
-    except Exception as e:
-        print(f"✗ Error: {e}")
+                try:
+                    text_content = download_text(bucket_name, file_path_in_bucket)
+                except Exception as e:
+                    print(f"✗ Error downloading {file_path_in_bucket}: {e}")
+                    record("failed")
+                    continue
+
+                downloads.put((file['name'], file_path_in_bucket, text_content))
+        except Exception as e:
+            print(f"✗ Error: {e}")
+        finally:
+            for _ in range(workers):
+                downloads.put(done)
+
+    def process_downloads():
+        while True:
+            item = downloads.get()
+            if item is done:
+                return
+            filename, file_path_in_bucket, text_content = item
+            with db_profiler.profile(filename, settings.db_profiling_repeat_threshold) as document_profile:
+                try:
+                    status = process_document(
+                        text=text_content, 
+                        filename=filename, 
+                        source=f"supabase://{bucket_name}/{file_path_in_bucket}"
+                    )
+                except Exception as e:
+                    print(f"✗ Error processing {filename}: {e}")
+                    status = "failed"
+            if settings.db_profiling:
+                print(f"  - DB: {document_profile.format()}")
+            record(status)
+
+    # the worker threads report their queries to this run's profile
+    with db_profiler.profile("ingest run", settings.db_profiling_repeat_threshold) as run_profile:
+        downloader = threading.Thread(target=metrics.in_context(download_files), daemon=True)
+        downloader.start()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for _ in range(workers):
+                pool.submit(metrics.in_context(process_downloads))
+        downloader.join()
+
+    bm25_index.save_index()
+
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    if not any(stats[k] for k in ("processed", "skipped", "failed")):
+        print("No files found.")
+    print(
+        f"\nDone in {stats['seconds']}s: {stats['processed']} processed, "
+        f"{stats['skipped']} skipped, {stats['failed']} failed"
+    )
+    if settings.db_profiling:
+        stats["db"] = run_profile.summary()
+        print(f"DB: {run_profile.format()}")
+    return stats
 
 if __name__ == "__main__":
     process_storage_bucket()
\ No newline at end of file
@@ -0,0 +1,132 @@
+"""
+Rule-based answer review that runs before the LLM quality auditor.
+
+Most of what the auditor checked is mechanical: is the answer well-formed JSON,
+does it cite its sources inline, and do the citations name sections that were
+actually retrieved. Those checks run locally here. A failing check produces
+feedback for the retry without an LLM call; a passing answer is only sent to
+the auditor when it looks uncertain or is picked by the sampling rate.
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional
+
+CITATION_RE = re.compile(r"\[Source:\s*([^\]]+?)\s*\]", re.IGNORECASE)
+SENTENCE_RE = re.compile(r"[^.!?]+[.!?]?")
+_NON_WORD_RE = re.compile(r"[^\w]+")
+
+# an answer with more sentences than this per inline citation is probably under-cited
+MAX_SENTENCES_PER_CITATION = 4
+
+
+def normalize_heading(text: str) -> str:
+    return _NON_WORD_RE.sub(" ", str(text).lower()).strip()
+
+
+def match_heading(citation: str, headings: Dict[str, str]) -> Optional[str]:
+    """
+    "exact" when the citation names a retrieved section heading, "partial" when one
+    contains the other (e.g. "Treatment" for "3.1 Treatment"), None when it matches nothing.
+    """
+    cited = normalize_heading(citation)
+    if not cited:
+        return None
+    if cited in headings:
+        return "exact"
+    for heading in headings:
+        if cited in heading or heading in cited:
+            return "partial"
+    return None
+
+
+def check_answer(response, retrieved_chunks: List[Dict]) -> Dict:
+    """
+    Review an answer JSON ({"answer", "citations"}) against the chunks it was built from.
+
+    Returns {"passed", "problems", "uncertain", "reasons"}: problems are failed checks
+    (phrased as fix instructions), reasons explain why a passing answer is uncertain.
+    """
+    problems: List[str] = []
+    reasons: List[str] = []
+
+    if not isinstance(response, dict):
+        return {"passed": False, "problems": ["Return a JSON object with keys \"answer\" and \"citations\"."],
+                "uncertain": False, "reasons": []}
+
+    answer = response.get("answer")
+    citations = response.get("citations")
+    if not isinstance(answer, str) or not answer.strip():
+        problems.append("The \"answer\" field must be a non-empty string.")
+        answer = ""
+    elif parse_leaked_json(answer):
+        problems.append("Return only the JSON object; the answer text contains raw JSON.")
+    if not isinstance(citations, list) or not all(isinstance(c, str) for c in citations):
+        problems.append("The \"citations\" field must be a list of section names.")
+        citations = []
+
+    inline = CITATION_RE.findall(answer)
+    if answer and not inline:
+        problems.append("Cite the supporting section inline for every claim, e.g. [Source: Section Name].")
+
+    headings = {
+        normalize_heading(chunk.get("section_heading", "")): chunk.get("section_heading", "")
+        for chunk in retrieved_chunks or []
+        if chunk.get("section_heading")
+    }
+    unknown = []
+    for citation in dict.fromkeys(inline + citations):
+        match = match_heading(citation, headings)
+        if match is None:
+            unknown.append(citation)
+        elif match == "partial":
+            reasons.append(f"citation \"{citation}\" only partially matches a retrieved section")
+    if not headings and inline:
+        reasons.append("no retrieved section headings to check citations against")
+    elif unknown:
+        problems.append(
+            "These citations do not match any retrieved section: "
+            + ", ".join(f"\"{c}\"" for c in unknown)
+            + ". Only cite these sections: "
+            + ", ".join(f"\"{h}\"" for h in headings.values())
+            + "."
+        )
+
+    if inline and citations:
+        listed = {normalize_heading(c) for c in citations}
+        if {normalize_heading(c) for c in inline} != listed:
+            reasons.append("inline citations differ from the citations list")
+    sentences = [s for s in SENTENCE_RE.findall(answer) if s.strip()]
+    if inline and len(sentences) > MAX_SENTENCES_PER_CITATION * len(inline):
+        reasons.append(f"{len(sentences)} sentences for {len(inline)} inline citations")
+
+    return {"passed": not problems, "problems": problems, "uncertain": bool(reasons), "reasons": reasons}
+
+
+def parse_leaked_json(answer: str) -> bool:
+    """The model sometimes returns the JSON object as the answer text when parsing failed upstream."""
+    stripped = answer.strip().strip("`").strip()
+    if stripped.startswith("json"):
+        stripped = stripped[4:].lstrip()
+    return stripped.startswith("{") and "\"answer\"" in stripped
+
+
+def feedback(result: Dict) -> str:
+    return " ".join(result["problems"])
+
+
+def sampled(answer: str, rate: float) -> bool:
+    """
+    Deterministic sampling: the same answer is always either audited or not, so
+    cached and replayed runs behave the same.
+    """
+    if rate <= 0:
+        return False
+    if rate >= 1:
+        return True
+    digest = hashlib.sha256(answer.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 < rate
+
+
+def needs_llm_review(result: Dict, answer: str, rate: float) -> bool:
+    """Only answers that passed the local checks go to the auditor, and only when uncertain or sampled."""
+    return result["passed"] and (result["uncertain"] or sampled(answer, rate))
@@ -0,0 +1,40 @@
+import json
+from typing import Literal, Optional
+
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+router = APIRouter(tags=["ask"])
+
+
+class AskRequest(BaseModel):
+    query: str = Field(..., min_length=1)
+    document_id: Optional[str] = None
+    # how validation and answer generation are scheduled (see lang_pipeline.ANSWER_MODES)
+    mode: Literal["sequential", "speculative", "single_call"] = "sequential"
+
+
+@router.post("/ask")
+def ask(req: AskRequest):
+    """
+    Server-sent events: "node" progress events, then "token" events for the answer
+    as it is generated, then a "final" event with the answer and citations.
+    """
+    # imported here so that importing the app does not build the LangGraph workflow
+    from lang_pipeline import stream_pipeline
+
+    def events():
+        stream = stream_pipeline(req.query, req.document_id, req.mode)
+        try:
+            for event, data in stream:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            # on client disconnect this cancels the pipeline run
+            stream.close()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
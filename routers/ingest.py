@@ -0,0 +1,107 @@
+import asyncio
+import hmac
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+
+from config import get_settings
+from ingest_jobs import FINISHED_JOB_STATUSES, get_job_runner, job_progress
+
+
+def require_admin_token(authorization: Optional[str] = Header(None)) -> None:
+    """Ingestion writes to the database and spends LLM calls: only callers with INGEST_ADMIN_TOKEN may use it."""
+    token = get_settings().ingest_admin_token
+    if not token:
+        raise HTTPException(status_code=403, detail="Ingestion API is disabled; set INGEST_ADMIN_TOKEN to enable it")
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.encode(), token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(tags=["ingest"], dependencies=[Depends(require_admin_token)])
+
+# how often /ingest/{job_id}/events checks the job store for progress
+EVENT_POLL_SECONDS = 1.0
+
+
+class IngestRequest(BaseModel):
+    # defaults to STORAGE_BUCKET / STORAGE_FOLDER
+    bucket: Optional[str] = None
+    folder: Optional[str] = None
+    # file names inside the folder; all .txt files when omitted
+    files: Optional[List[str]] = Field(None, min_length=1)
+
+
+def _progress(job_id: str) -> Optional[dict]:
+    job = get_job_runner().store.get_job(job_id)
+    return job_progress(job) if job is not None else None
+
+
+def _progress_or_404(job_id: str) -> dict:
+    progress = _progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return progress
+
+
+@router.post("/ingest", status_code=202)
+def start_ingest(req: IngestRequest):
+    """Queue a background ingestion job; poll GET /ingest/{job_id} for progress."""
+    settings = get_settings()
+    bucket = req.bucket or settings.storage_bucket
+    folder = req.folder if req.folder is not None else settings.storage_folder
+    job_id = get_job_runner().submit(bucket, folder, req.files)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/ingest")
+def list_ingest_jobs(limit: int = Query(20, ge=1, le=100)):
+    return {"jobs": [job_progress(job) for job in get_job_runner().store.list_jobs(limit)]}
+
+
+@router.get("/ingest/{job_id}")
+def read_ingest_job(job_id: str):
+    """
+    200: job status, per-file progress and ETA
+    404: unknown job id
+    """
+    return _progress_or_404(job_id)
+
+
+@router.get("/ingest/{job_id}/events")
+def ingest_job_events(job_id: str):
+    """
+    Server-sent "progress" events whenever the job changes, ending with a "done" event
+    (or an "error" event if the job disappears from the store mid-stream).
+    """
+    _progress_or_404(job_id)
+
+    async def events():
+        last = None
+        while True:
+            # SQLite reads block; keep them off the event loop
+            progress = await run_in_threadpool(_progress, job_id)
+            if progress is None:
+                # the response has already started, so report it in the stream instead of a 404
+                yield f"event: error\ndata: {json.dumps({'detail': 'Job not found'})}\n\n"
+                return
+            finished = progress["status"] in FINISHED_JOB_STATUSES
+            # the ETA moves every poll; only report real progress
+            snapshot = {k: v for k, v in progress.items() if k != "eta_seconds"}
+            if finished:
+                yield f"event: done\ndata: {json.dumps(progress)}\n\n"
+                return
+            if snapshot != last:
+                last = snapshot
+                yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+            await asyncio.sleep(EVENT_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
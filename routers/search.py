@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
-from typing import Optional
-from search_service import search_chunks
+from typing import List, Optional
+from search_service import search_batch_async, search_chunks_async
 
 router = APIRouter(tags=["search"])
 
@@ -10,10 +10,25 @@ class SearchRequest(BaseModel):
     top_k: int = Field(3, ge=1, le=20)
     document_id: Optional[str] = None
 
+class BatchSearchRequest(BaseModel):
+    queries: List[SearchRequest] = Field(..., min_length=1, max_length=500)
+
 @router.post("/search")
-def search(req: SearchRequest):
+async def search(req: SearchRequest):
     try:
-        results = search_chunks(req.query, req.top_k, req.document_id)
+        results = await search_chunks_async(req.query, req.top_k, req.document_id)
         return {"query": req.query, "results": results}
     except Exception:
         raise HTTPException(status_code=500, detail="Search failed")
+
+
+@router.post("/search/batch")
+async def search_batch(req: BatchSearchRequest):
+    """
+    Results come back in input order; a failed query carries an "error" instead of "results".
+    """
+    try:
+        results = await search_batch_async([(q.query, q.top_k, q.document_id) for q in req.queries])
+        return {"results": results}
+    except Exception:
+        raise HTTPException(status_code=500, detail="Search failed")
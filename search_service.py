@@ -1,7 +1,123 @@
-from typing import Optional, Dict, List
-from supabase_client import get_supabase_client
+import asyncio
+import re
+from typing import Optional, Dict, List, Tuple
+import bm25_index
+import data_version
+from cache import MISSING, LRUCache
+from config import get_settings
+from supabase_client import get_async_supabase_client, get_supabase_client
 
 RPC_NAME = "search_chunks"
+# documents joined with "Document URL Mapping" (see migrations/002_document_url_lookup.sql)
+URL_LOOKUP_VIEW = "document_url_lookup"
+
+settings = get_settings()
+
+# These mappings almost never change, so keep them in process:
+# document id -> title, and file_name (title) -> url (None when unmapped).
+# Dropped when ingestion (in any process) publishes a new data_version.
+_titles = LRUCache(settings.lookup_cache_entries, settings.lookup_cache_ttl_seconds or None)
+_urls = LRUCache(settings.lookup_cache_entries, settings.lookup_cache_ttl_seconds or None)
+
+# (normalized query, top_k, document_id) -> enriched results; cleared with the lookups
+# when the shared data_version moves, so deleted chunk ids are not served for long
+_results = LRUCache(settings.search_cache_entries, settings.search_cache_ttl_seconds or None)
+# identical searches currently running, shared by concurrent callers
+_in_flight: Dict[Tuple, "asyncio.Future"] = {}
+# bumped on invalidation so searches started before it are not cached
+_generation = 0
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]+")
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and punctuation-insensitive form of a query, used as the cache key."""
+    return " ".join(_PUNCTUATION_RE.sub(" ", query.lower()).split())
+
+
+def _result_key(query: str, top_k: int, document_id: Optional[str]) -> Tuple:
+    return normalize_query(query), top_k, document_id
+
+
+def invalidate_document(document_id: Optional[str] = None, file_name: Optional[str] = None) -> None:
+    """
+    Drop cached lookups and search results for a document (called by the ingestion pipeline).
+    Results of unfiltered searches are dropped too, since the document may now rank in them.
+    With no arguments every cache is cleared.
+    """
+    global _generation
+    _generation += 1
+
+    if document_id is None and file_name is None:
+        _titles.clear()
+        _urls.clear()
+        _results.clear()
+        return
+    _results.invalidate_where(lambda key: key[2] is None or key[2] == document_id)
+    if document_id is not None:
+        title = _titles.get(document_id)
+        _titles.invalidate(document_id)
+        if title is not None:
+            _urls.invalidate(title)
+    if file_name is not None:
+        _urls.invalidate(file_name)
+
+
+def _sync_data_version(version: Optional[str]) -> None:
+    """
+    Drop lookups and results cached before ingestion, possibly in another process,
+    published `version` (bumping _generation so searches already running are not cached).
+    """
+    if data_version.changed("search_service", version):
+        invalidate_document()
+
+
+def lookup_cache_stats() -> Dict:
+    return {"titles": _titles.stats(), "urls": _urls.stats()}
+
+
+def result_cache_stats() -> Dict:
+    return {**_results.stats(), "in_flight": len(_in_flight)}
+
+
+def _copy_results(results: List[Dict]) -> List[Dict]:
+    # callers may mutate result dicts; never hand out the cached objects
+    return [dict(r) for r in results]
+
+
+def _document_ids(results: List[Dict]) -> List[str]:
+    return list(set(r['document_id'] for r in results if r.get('document_id')))
+
+
+def _cached_urls(doc_ids: List[str]) -> Tuple[Dict[str, Optional[str]], List[str]]:
+    """Resolve document id -> url from the cache; returns (found, ids that missed)."""
+    found = {}
+    missing = []
+    for doc_id in doc_ids:
+        title = _titles.get(doc_id, MISSING)
+        url = _urls.get(title, MISSING) if title is not MISSING else MISSING
+        if url is MISSING:
+            missing.append(doc_id)
+        else:
+            found[doc_id] = url
+    return found, missing
+
+
+def _remember(lookup_rows: List[Dict]) -> Dict[str, Optional[str]]:
+    # 'Document URL Mapping' is keyed by the document's file_name/title
+    for row in lookup_rows:
+        _titles.set(row['id'], row.get('title'))
+        _urls.set(row.get('title'), row.get('url'))
+    return {row['id']: row.get('url') for row in lookup_rows}
+
+
+def _attach_urls(results: List[Dict], id_to_url: Dict[str, Optional[str]]) -> List[Dict]:
+    for r in results:
+        # If we found a mapping, attach it. Otherwise None.
+        r['url'] = id_to_url.get(r.get('document_id'))
+
+    return results
+
 
 def search_chunks(
     query: str,
@@ -11,45 +127,164 @@ def search_chunks(
     if not query.strip():
         return []
 
+    _sync_data_version(data_version.current())
+    key = _result_key(query, top_k, document_id)
+    cached = _results.get(key, MISSING)
+    if cached is not MISSING:
+        return _copy_results(cached)
+    generation = _generation
+
     sb = get_supabase_client()
-    
-    # 1. Run the vector/hybrid search RPC
-    params = {"q": query, "k": top_k, "doc": document_id}
-    res = sb.rpc(RPC_NAME, params).execute()
-    results = res.data or []
 
-    if not results:
-        return []
+    # 1. Run the vector/hybrid search RPC (or the local BM25 index)
+    if settings.search_backend == "bm25":
+        results = bm25_index.get_index().search(query, top_k, document_id)
+    else:
+        params = {"q": query, "k": top_k, "doc": document_id}
+        res = sb.rpc(RPC_NAME, params).execute()
+        results = res.data or []
 
     # 2. Extract unique Document IDs from the search results
-    doc_ids = list(set(r['document_id'] for r in results if r.get('document_id')))
+    doc_ids = _document_ids(results)
+
+    if doc_ids:
+        # 3. Resolve titles and URLs, fetching only the ids the cache does not know
+        id_to_url, missing = _cached_urls(doc_ids)
+        if missing:
+            lookup = sb.table(URL_LOOKUP_VIEW).select("id, title, url").in_("id", missing).execute()
+            id_to_url.update(_remember(lookup.data or []))
+
+        # 4. Attach the URL to each search result
+        _attach_urls(results, id_to_url)
+
+    if generation == _generation:
+        _results.set(key, _copy_results(results))
+    return results
+
+
+async def search_chunks_async(
+    query: str,
+    top_k: int = 3,
+    document_id: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Same as search_chunks, but on the async Supabase client so the /search route
+    does not hold a threadpool slot while waiting on the database.
+    Results are cached per normalized query, and concurrent identical searches
+    share a single backend call.
+    """
+    if not query.strip():
+        return []
+
+    _sync_data_version(await data_version.current_async())
+    key = _result_key(query, top_k, document_id)
+    cached = _results.get(key, MISSING)
+    if cached is not MISSING:
+        return _copy_results(cached)
+
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_search_uncached_async(key, query, top_k, document_id))
+        _in_flight[key] = task
+        task.add_done_callback(lambda _: _in_flight.pop(key, None))
+    # shield: one caller disconnecting must not cancel the search for the others
+    results = await asyncio.shield(task)
+    return _copy_results(results)
+
+
+async def _search_uncached_async(key: Tuple, query: str, top_k: int, document_id: Optional[str]) -> List[Dict]:
+    generation = _generation
+    sb = await get_async_supabase_client()
 
+    results = await _run_backend_async(sb, query, top_k, document_id)
+    await _enrich_async(sb, results)
+
+    if generation == _generation:
+        _results.set(key, results)
+    return results
+
+
+async def _run_backend_async(sb, query: str, top_k: int, document_id: Optional[str]) -> List[Dict]:
+    if settings.search_backend == "bm25":
+        # CPU-bound, and get_index() may build or reload the snapshot: both run off the event loop
+        return await asyncio.to_thread(lambda: bm25_index.get_index().search(query, top_k, document_id))
+    params = {"q": query, "k": top_k, "doc": document_id}
+    res = await sb.rpc(RPC_NAME, params).execute()
+    return res.data or []
+
+
+async def _enrich_async(sb, results: List[Dict]) -> List[Dict]:
+    """Attach URLs with at most one lookup query for the ids the cache does not know."""
+    doc_ids = _document_ids(results)
     if not doc_ids:
         return results
+    id_to_url, missing = _cached_urls(doc_ids)
+    if missing:
+        lookup = await sb.table(URL_LOOKUP_VIEW).select("id, title, url").in_("id", missing).execute()
+        id_to_url.update(_remember(lookup.data or []))
+    return _attach_urls(results, id_to_url)
 
-    # 3. Fetch Document Titles (file_names) from the 'documents' table
-    # We need the title because 'Document URL Mapping' uses file_name, not UUID
-    docs_res = sb.table("documents").select("id, title").in_("id", doc_ids).execute()
-    
-    # Map UUID -> Filename (e.g. "uuid-123" -> "page_1.txt")
-    id_to_filename = {d['id']: d['title'] for d in docs_res.data}
-    
-    # 4. Fetch URLs from 'Document URL Mapping' table
-    # Note: Using exact table name from your image
-    filenames = list(id_to_filename.values())
-    if filenames:
-        url_res = sb.table("Document URL Mapping").select("file_name, url").in_("file_name", filenames).execute()
-        
-        # Map Filename -> URL
-        filename_to_url = {u['file_name']: u['url'] for u in url_res.data}
-    else:
-        filename_to_url = {}
 
-    # 5. Attach the URL to each search result
-    for r in results:
-        doc_uuid = r.get('document_id')
-        filename = id_to_filename.get(doc_uuid)
-        # If we found a mapping, attach it. Otherwise None.
-        r['url'] = filename_to_url.get(filename)
+async def search_batch_async(
+    requests: List[Tuple[str, int, Optional[str]]],
+    concurrency: Optional[int] = None,
+) -> List[Dict]:
+    """
+    Run many (query, top_k, document_id) searches at once.
+    Backend calls run concurrently (at most `concurrency` at a time), identical
+    queries in the batch share one call, and URL enrichment runs once for the
+    union of all returned documents.
+    Returns one {"query", "results"} or {"query", "error"} dict per request, in input order;
+    if only the URL lookup fails, results come back with url None instead of as errors.
+    """
+    _sync_data_version(await data_version.current_async())
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.search_batch_concurrency))
+    generation = _generation
+    outputs: List[Optional[Dict]] = [None] * len(requests)
+    pending: Dict[Tuple, List[int]] = {}
+
+    for i, (query, top_k, document_id) in enumerate(requests):
+        if not query.strip():
+            outputs[i] = {"query": query, "results": []}
+            continue
+        key = _result_key(query, top_k, document_id)
+        cached = _results.get(key, MISSING)
+        if cached is not MISSING:
+            outputs[i] = {"query": query, "results": _copy_results(cached)}
+        else:
+            pending.setdefault(key, []).append(i)
+
+    if pending:
+        sb = await get_async_supabase_client()
+
+        async def run(indices: List[int]) -> List[Dict]:
+            query, top_k, document_id = requests[indices[0]]
+            async with semaphore:
+                return await _run_backend_async(sb, query, top_k, document_id)
+
+        keys = list(pending)
+        found = await asyncio.gather(*(run(pending[key]) for key in keys), return_exceptions=True)
+
+        succeeded = [r for results in found if not isinstance(results, BaseException) for r in results]
+        enriched = True
+        try:
+            await _enrich_async(sb, succeeded)
+        except Exception as e:
+            # the searches themselves worked: return them with the URLs already cached
+            # (None for the rest) and keep them out of the result cache so the next
+            # request tries the lookup again
+            print(f"Batch enrichment failed, returning results without URLs: {e}")
+            enriched = False
+            _attach_urls(succeeded, _cached_urls(_document_ids(succeeded))[0])
+
+        for key, results in zip(keys, found):
+            for i in pending[key]:
+                query = requests[i][0]
+                if isinstance(results, BaseException):
+                    outputs[i] = {"query": query, "error": "Search failed"}
+                else:
+                    outputs[i] = {"query": query, "results": _copy_results(results)}
+            if not isinstance(results, BaseException) and enriched and generation == _generation:
+                _results.set(key, results)
 
-    return results
\ No newline at end of file
+    return outputs
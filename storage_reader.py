@@ -0,0 +1,141 @@
+"""
+Streaming reader for text files in Supabase Storage.
+
+Files are fetched through a short-lived signed URL and read in chunks on the
+shared HTTP pool, decoded incrementally and cut into pages as they arrive. With
+a page limit the download stops as soon as enough pages have been read, so
+only the kept pages are ever held in memory, never the whole file or its bytes.
+Without a limit (MAX_PAGES=0) the whole decoded file is returned, since the
+pipeline hashes and chunks the complete text.
+"""
+import codecs
+import re
+from typing import Iterable, Iterator, List, Optional
+
+# a "Page <num>" marker at the start of a line (after optional whitespace)
+PAGE_MARKER_RE = re.compile(r"\s*Page\s+\d+\b")
+
+
+class PageLimiter:
+    """
+    Incremental version of pipeline.limit_to_first_n_pages.
+
+    Text is fed in arbitrary pieces; pages are split on form-feeds or on lines
+    starting with "Page <num>", whichever kind of break shows up first (the
+    whole-text version prefers form-feeds when the file has any). feed() returns
+    True once `max_pages` full pages are in and the rest of the file is not needed.
+    """
+
+    def __init__(self, max_pages: int) -> None:
+        self.max_pages = max_pages
+        self.mode: Optional[str] = None
+        self.pages: List[str] = []
+        self.done = False
+        self._page: List[str] = []
+        # the text dropped after each kept page (its "\f" or "Page N" break), so
+        # the file can be rebuilt unchanged when it has fewer pages than the limit
+        self._breaks: List[str] = []
+        self._line = ""
+        self._first_line = True
+
+    def feed(self, text: str) -> bool:
+        if self.done or not text:
+            return self.done
+        lines = (self._line + text).split("\n")
+        self._line = lines.pop()
+        for line in lines:
+            self._add_line(line + "\n")
+            if self.done:
+                return True
+        if self.mode != "page" and "\f" in self._line:
+            # form-feeds end pages without waiting for the end of the line
+            head, _, self._line = self._line.rpartition("\f")
+            self._add_line(head + "\f")
+        return self.done
+
+    def close(self) -> str:
+        """Flush the last partial line and return the kept text."""
+        if not self.done and self._line:
+            self._add_line(self._line)
+        self._line = ""
+        if self.done:
+            return "\n\n".join(self.pages)
+        # fewer breaks than the limit: the file is returned unchanged
+        text = "".join(page + dropped for page, dropped in zip(self.pages, self._breaks))
+        return text + "".join(self._page)
+
+    def _end_page(self, text: str, dropped: str) -> None:
+        self.pages.append(text)
+        self._breaks.append(dropped)
+        self._page = []
+        if len(self.pages) == self.max_pages:
+            self.done = True
+
+    def _add_line(self, line: str) -> None:
+        if self.mode != "page" and "\f" in line:
+            self.mode = "formfeed"
+            *ended, line = line.split("\f")
+            for part in ended:
+                self._end_page("".join(self._page) + part, "\f")
+                if self.done:
+                    return
+        elif self.mode != "formfeed" and not self._first_line:
+            marker = PAGE_MARKER_RE.match(line)
+            if marker:
+                self.mode = "page"
+                # like re.split on "\n\s*Page N": the page ends at the first newline
+                # of the whitespace run before the marker
+                page = "".join(self._page)
+                cut = page.find("\n", len(page.rstrip()))
+                if cut == -1:
+                    cut = len(page)
+                self._end_page(page[:cut], page[cut:] + line[:marker.end()])
+                if self.done:
+                    return
+                line = line[marker.end():]
+
+        self._first_line = False
+        self._page.append(line)
+
+
+def decode_stream(chunks: Iterable[bytes], encoding: str = "utf-8") -> Iterator[str]:
+    """Decode byte chunks as they arrive; multi-byte characters may straddle chunks."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def read_pages(chunks: Iterable[bytes], max_pages: int = 0) -> str:
+    """Decode a byte stream, keeping only the first `max_pages` pages (0 keeps everything)."""
+    if not max_pages:
+        return "".join(decode_stream(chunks))
+    limiter = PageLimiter(max_pages)
+    for text in decode_stream(chunks):
+        if limiter.feed(text):
+            break
+    return limiter.close()
+
+
+def stream_bytes(client, bucket_name: str, path: str, chunk_size: int, expires_in: int = 60) -> Iterator[bytes]:
+    """Yield the object's bytes in chunks; closing the generator ends the download."""
+    from clients import get_http_client
+
+    signed = client.storage.from_(bucket_name).create_signed_url(path, expires_in)
+    url = signed.get("signedURL") or signed.get("signedUrl")
+    with get_http_client().stream("GET", url) as response:
+        response.raise_for_status()
+        yield from response.iter_bytes(chunk_size)
+
+
+def read_text(client, bucket_name: str, path: str, max_pages: int = 0, chunk_size: int = 256 * 1024) -> str:
+    """Stream a text file from storage and return its first `max_pages` pages (0 keeps the whole file)."""
+    chunks = stream_bytes(client, bucket_name, path, chunk_size)
+    try:
+        return read_pages(chunks, max_pages)
+    finally:
+        chunks.close()
@@ -0,0 +1,11 @@
+import pytest
+
+import data_version
+from config import get_settings
+
+
+@pytest.fixture(autouse=True)
+def no_shared_data_version(monkeypatch):
+    # tests never reach a real ingest_version table; the ones that need it patch it in
+    monkeypatch.setattr(get_settings(), "data_version_check_seconds", -1)
+    data_version.reset()
@@ -0,0 +1,28 @@
+import json
+
+from answer_stream import AnswerStream
+
+
+def stream(tokens):
+    answer = AnswerStream()
+    return [answer.feed(token) for token in tokens]
+
+
+def test_only_the_answer_text_is_streamed():
+    text = json.dumps({"answer": "Metformin \"first\"\nline [Source: Treatment]", "citations": ["Treatment"]})
+    # one character at a time, so keys, escapes and quotes are split across tokens
+    assert "".join(stream(list(text))) == "Metformin \"first\"\nline [Source: Treatment]"
+
+
+def test_answer_after_other_keys_and_inside_a_fence():
+    text = '```json\n{"citations": ["answer"], "meta": {"answer": "no"}, "answer": "Ins\\u00fclin \\ud83d\\udc89"}\n```'
+    tokens = [text[i:i + 3] for i in range(0, len(text), 3)]
+    assert "".join(stream(tokens)) == "Insülin 💉"
+
+
+def test_plain_text_completion_is_passed_through():
+    assert stream(["  Metformin", " is first line."]) == ["Metformin", " is first line."]
+
+
+def test_nothing_after_the_answer_string_is_streamed():
+    assert stream(['{"answer": "Yes', '."', ', "citations": ["A"]}']) == ["Yes", ".", ""]
@@ -0,0 +1,30 @@
+import sys
+import types
+
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+
+def test_ask_streams_node_token_and_final_events(monkeypatch):
+    def fake_stream_pipeline(query, doc_id, mode):
+        yield "node", {"node": "validation", "is_valid": "yes"}
+        yield "token", {"text": "Metformin", "attempt": 1}
+        yield "final", {"answer": "Metformin [Source: Treatment]", "citations": ["Treatment"]}
+
+    # stand-in for the graph module, which the router imports lazily
+    monkeypatch.setitem(sys.modules, "lang_pipeline", types.SimpleNamespace(stream_pipeline=fake_stream_pipeline))
+
+    res = client.post("/ask", json={"query": "first line treatment?"})
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/event-stream")
+
+    events = [block.split("\n")[0] for block in res.text.strip().split("\n\n")]
+    assert events == ["event: node", "event: token", "event: final"]
+    assert '"citations": ["Treatment"]' in res.text
+
+
+def test_ask_requires_query():
+    res = client.post("/ask", json={"query": ""})
+    assert res.status_code == 422
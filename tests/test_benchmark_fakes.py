@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+import asyncio
+
+from benchmarks.fakes import FakeAsyncSupabase, FakeOpenAI, FakeSupabase
+
+
+def test_fake_supabase_honours_the_query_builder():
+    db = FakeSupabase()
+    inserted = db.table("chunks").insert([
+        {"document_id": "d1", "section_heading": "Treatment", "content": "metformin first line", "position_in_doc": 1},
+        {"document_id": "d1", "section_heading": "Diagnosis", "content": "hba1c threshold", "position_in_doc": 0},
+        {"document_id": "d2", "section_heading": "Treatment", "content": "insulin", "position_in_doc": 0},
+    ]).execute().data
+    ids = [row["id"] for row in inserted]
+
+    rows = db.table("chunks").select("*").eq("document_id", "d1").order("position_in_doc").execute().data
+    assert [r["section_heading"] for r in rows] == ["Diagnosis", "Treatment"]
+
+    db.table("chunks").update({"summary": "s"}).in_("id", ids[:2]).execute()
+    db.table("chunks").delete().in_("id", ids[2:]).execute()
+    assert [r.get("summary") for r in db.tables["chunks"]] == ["s", "s"]
+
+    hits = db.rpc("search_chunks", {"q": "metformin dose", "k": 3, "doc": None}).execute().data
+    assert [h["id"] for h in hits] == [ids[0]]
+
+    async_hits = asyncio.run(FakeAsyncSupabase(db).rpc("search_chunks", {"q": "hba1c", "k": 3}).execute())
+    assert [h["id"] for h in async_hits.data] == [ids[1]]
+
+
+def test_fake_openai_returns_canned_completions():
+    client = FakeOpenAI()
+    response = client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "Summarize this section: metformin first line"}],
+    )
+    assert response.choices[0].message.content.startswith("Summary:")
+    assert client.calls == 1
@@ -0,0 +1,88 @@
+import os
+import time
+
+import bm25_index
+from bm25_index import BM25Index
+from config import get_settings
+
+ROWS = [
+    {"id": "c1", "document_id": "d1", "section_heading": "Treatment", "content": "Metformin is first line therapy.", "summary": None},
+    {"id": "c2", "document_id": "d1", "section_heading": "Monitoring", "content": "Check HbA1c every 3 months.", "summary": "HbA1c checks"},
+    {"id": "c3", "document_id": "d2", "section_heading": "Insulin", "content": "Insulin is added when metformin fails.", "summary": None},
+]
+
+
+def make_index():
+    index = BM25Index()
+    index.add_chunks(ROWS)
+    return index
+
+
+def test_search_ranks_by_bm25_and_filters_by_document():
+    index = make_index()
+
+    results = index.search("first line metformin", top_k=3)
+    assert [r["id"] for r in results] == ["c1", "c3"]
+    assert results[0]["section_heading"] == "Treatment"
+    assert results[0]["score"] > results[1]["score"]
+
+    assert [r["id"] for r in index.search("metformin", top_k=3, document_id="d2")] == ["c3"]
+    assert index.search("metformin", document_id="unknown") == []
+
+
+def test_replace_document_updates_results():
+    index = make_index()
+    index.replace_document("d1", [
+        {"id": "c4", "document_id": "d1", "section_heading": "Treatment", "content": "SGLT2 inhibitors are preferred.", "summary": None},
+    ])
+
+    assert [r["id"] for r in index.search("metformin", top_k=5)] == ["c3"]
+    assert [r["id"] for r in index.search("sglt2", top_k=5)] == ["c4"]
+    assert len(index) == 2
+
+
+def test_snapshot_roundtrip_is_memory_mapped_and_accepts_updates(tmp_path):
+    path = str(tmp_path / "index.bin")
+    index = make_index()
+    index.remove_document("d2")
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+    assert len(loaded) == 2
+    assert [r["id"] for r in loaded.search("hba1c")] == ["c2"]
+    assert loaded.search("insulin") == []
+
+    loaded.add_chunks([ROWS[2]])
+    assert [r["id"] for r in loaded.search("metformin", top_k=5)] == ["c1", "c3"]
+
+    loaded.save(path)
+    reloaded = BM25Index.load(path)
+    assert sorted(r["id"] for r in reloaded.search("metformin insulin hba1c", top_k=5)) == ["c1", "c2", "c3"]
+
+
+def test_get_index_reloads_a_snapshot_rewritten_by_another_process(tmp_path, monkeypatch):
+    path = str(tmp_path / "index.bin")
+    settings = get_settings()
+    monkeypatch.setattr(settings, "bm25_index_path", path)
+    monkeypatch.setattr(settings, "bm25_reload_check_seconds", 0)
+    bm25_index.reset()
+
+    first = make_index()
+    first.remove_document("d2")
+    first.save(path)
+    assert bm25_index.get_index().search("insulin") == []
+
+    # an ingest run elsewhere rewrites the snapshot
+    make_index().save(path)
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert [r["id"] for r in bm25_index.get_index().search("insulin")] == ["c3"]
+
+    # our own saves are not reloaded, and checks can be turned off
+    loaded = bm25_index.get_index()
+    bm25_index.save_index()
+    assert bm25_index.get_index() is loaded
+    monkeypatch.setattr(settings, "bm25_reload_check_seconds", -1)
+    first.save(path)
+    os.utime(path, (time.time() + 20, time.time() + 20))
+    assert bm25_index.get_index() is loaded
+    bm25_index.reset()
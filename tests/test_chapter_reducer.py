@@ -0,0 +1,139 @@
+import pipeline
+from chapter_reducer import ChapterReducer
+
+
+class Calls:
+    """Records reduce() calls and lets the test decide when each one finishes."""
+
+    def __init__(self):
+        self.pending = []
+        self.log = []
+
+    def reduce(self, texts, final, done):
+        self.log.append((list(texts), final))
+        self.pending.append((texts, final, done))
+
+    def finish_all(self):
+        while self.pending:
+            texts, final, done = self.pending.pop(0)
+            done(("FINAL(" if final else "(") + "+".join(texts) + ")")
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_small_chapter_gets_one_final_call():
+    calls = Calls()
+    reducer = ChapterReducer(3, 100, words, calls.reduce)
+    for i in (2, 0, 1):
+        reducer.add(i, f"s{i}")
+    calls.finish_all()
+
+    assert calls.log == [(["s0", "s1", "s2"], True)]
+    assert reducer.finished and reducer.summary == "FINAL(s0+s1+s2)"
+
+
+def test_large_chapter_is_reduced_in_order_and_starts_before_all_sections_finish():
+    calls = Calls()
+    # each summary is 2 "tokens"; a batch holds at most two of them
+    reducer = ChapterReducer(5, 4, words, calls.reduce)
+    reducer.add(0, "a a")
+    reducer.add(1, "b b")
+    assert calls.log == []
+    reducer.add(2, "c c")
+    # the first batch is sent while sections 3 and 4 are still running
+    assert calls.log == [(["a a", "b b"], False)]
+
+    reducer.add(4, "e e")
+    reducer.add(3, "d d")
+    calls.finish_all()
+
+    assert reducer.finished
+    # the level above is still over budget, so it is reduced once more
+    assert reducer.summary == "FINAL(((a a+b b)+(c c+d d))+e e)"
+    assert [final for _, final in calls.log] == [False, False, False, True]
+
+
+def test_failed_sections_are_skipped_and_all_failed_gives_no_summary():
+    calls = Calls()
+    reducer = ChapterReducer(2, 100, words, calls.reduce)
+    reducer.add(0, None)
+    reducer.add(1, "b")
+    calls.finish_all()
+    assert reducer.summary == "FINAL(b)"
+
+    empty = ChapterReducer(2, 100, words, calls.reduce)
+    empty.add(0, None)
+    empty.add(1, None)
+    assert empty.finished and empty.summary is None
+
+
+def test_oversized_summaries_still_converge():
+    calls = Calls()
+    reducer = ChapterReducer(6, 1, words, calls.reduce)
+    for i in range(6):
+        reducer.add(i, f"s{i} long")
+    for _ in range(10):
+        calls.finish_all()
+    assert reducer.finished
+    assert calls.log[-1][1] is True
+
+
+def stub_llm_calls(monkeypatch, batch_tokens):
+    """Replace the summary calls in pipeline with stubs that record the order they run in."""
+    log = []
+
+    def summarize_chunk(content, heading):
+        log.append(("chunk", content))
+        return "x x"
+
+    def combine_section_summaries(texts, chapter_name):
+        log.append(("combine", chapter_name, len(texts)))
+        return "c c"
+
+    def create_chapter_summary(texts, chapter_name):
+        log.append(("chapter", chapter_name, len(texts)))
+        return f"summary of {chapter_name}"
+
+    monkeypatch.setattr(pipeline, "summarize_chunk", summarize_chunk)
+    monkeypatch.setattr(pipeline, "combine_section_summaries", combine_section_summaries)
+    monkeypatch.setattr(pipeline, "create_chapter_summary", create_chapter_summary)
+    monkeypatch.setattr(pipeline, "count_tokens", words)
+    monkeypatch.setattr(pipeline.settings, "chapter_summary_batch_tokens", batch_tokens)
+    return log
+
+
+def chapter(name, count, start=0):
+    return [{"content": f"{name}{i}", "heading": name, "position": start + i} for i in range(count)]
+
+
+def test_reductions_run_before_the_remaining_chunks(monkeypatch):
+    log = stub_llm_calls(monkeypatch, batch_tokens=4)
+    chapters = {"A": chapter("a", 5), "B": chapter("b", 2, start=10)}
+
+    summaries, chapter_summaries = pipeline.summarize_chapters(chapters, max_workers=1)
+
+    # with one worker, every reduction runs as soon as its batch is ready
+    # instead of queueing behind all seven chunk calls
+    assert log == [
+        ("chunk", "a0"), ("chunk", "a1"), ("chunk", "a2"),
+        ("combine", "A", 2),
+        ("chunk", "a3"), ("chunk", "a4"),
+        ("combine", "A", 2), ("combine", "A", 2), ("chapter", "A", 2),
+        ("chunk", "b0"), ("chunk", "b1"),
+        ("chapter", "B", 2),
+    ]
+    assert len(summaries) == 7
+    assert chapter_summaries == {"A": "summary of A", "B": "summary of B"}
+
+
+def test_chapter_summaries_overlap_with_later_chapters_chunks(monkeypatch):
+    log = stub_llm_calls(monkeypatch, batch_tokens=100)
+    chapters = {"A": chapter("a", 2), "B": chapter("b", 2, start=10), "C": chapter("c", 2, start=20)}
+
+    _, chapter_summaries = pipeline.summarize_chapters(chapters, max_workers=2)
+
+    # chapter A is summarized while later chapters' chunks are still waiting for a worker
+    assert log.index(("chapter", "A", 2)) < log.index(("chunk", "c0"))
+    assert chapter_summaries == {name: f"summary of {name}" for name in chapters}
@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# generous for slow CI machines; `import main` takes well under a second locally
+IMPORT_BUDGET_SECONDS = 3.0
+# SDKs that must only load when a client or the graph is first used
+LAZY_MODULES = ("supabase", "openai", "langchain_openai", "langgraph", "tiktoken")
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+print(json.dumps({{
+    "seconds": time.perf_counter() - started,
+    "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules],
+}}))
+"""
+
+
+def test_import_main_is_fast_and_lazy():
+    repo = Path(__file__).resolve().parent.parent
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=repo, capture_output=True, text=True, check=True
+    ).stdout
+    probe = json.loads(out.strip().splitlines()[-1])
+
+    assert probe["loaded"] == []
+    assert probe["seconds"] < IMPORT_BUDGET_SECONDS
+
+
+def test_clients_are_shared_and_created_once(monkeypatch):
+    import clients
+    from config import get_settings
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    get_settings.cache_clear()
+    clients.get_http_client.cache_clear()
+    clients.get_openai_client.cache_clear()
+    try:
+        openai_client = clients.get_openai_client()
+        assert clients.get_openai_client() is openai_client
+        assert openai_client._client is clients.get_http_client()
+    finally:
+        clients.get_openai_client.cache_clear()
+        get_settings.cache_clear()
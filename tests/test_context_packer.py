@@ -0,0 +1,47 @@
+import context_packer
+from context_packer import count_tokens, format_context, pack_context, trim_middle
+from lexical import bm25_scores, tokenize
+
+
+def test_bm25_ranks_matching_documents_first():
+    docs = [tokenize("insulin pump settings"), tokenize("metformin is first line for type 2 diabetes")]
+    scores = bm25_scores(tokenize("What is first line treatment?"), docs)
+    assert scores[1] > scores[0]
+
+
+def test_pack_context_ranks_and_drops_duplicates():
+    chunks = [
+        {"section_heading": "Insulin", "content": "Insulin pumps need regular review."},
+        {"section_heading": "Treatment", "content": "Metformin is the first line treatment for type 2 diabetes."},
+        {"section_heading": "Treatment (copy)", "content": "Metformin is the first line  treatment for type 2 diabetes."},
+    ]
+    packed = pack_context("first line treatment metformin", chunks, budget=1000)
+
+    assert [c["section_heading"] for c in packed] == ["Treatment", "Insulin"]
+
+
+def test_pack_context_drops_chunks_contained_in_better_ones():
+    long_text = "Metformin is first line. Review renal function every year before increasing the dose further."
+    chunks = [
+        {"section_heading": "Full", "content": long_text},
+        {"section_heading": "Excerpt", "content": "Review renal function every year before increasing the dose"},
+    ]
+    packed = pack_context("metformin renal function", chunks, budget=1000)
+    assert [c["section_heading"] for c in packed] == ["Full"]
+
+
+def test_pack_context_respects_budget_by_trimming_the_middle():
+    chunks = [
+        {"section_heading": "Treatment", "content": "metformin " * 50},
+        {"section_heading": "Monitoring", "content": "start " + "hba1c " * 2000 + "end"},
+    ]
+    packed = pack_context("metformin hba1c", chunks, budget=400)
+
+    assert count_tokens(format_context(packed)) <= 400
+    trimmed = packed[-1]["content"]
+    assert context_packer.TRIM_MARKER in trimmed
+    assert trimmed.startswith("start") and trimmed.endswith("end")
+
+
+def test_trim_middle_keeps_short_text_unchanged():
+    assert trim_middle("short text", 100) == "short text"
@@ -0,0 +1,97 @@
+import data_version
+import toc_index
+from config import get_settings
+
+
+class DummyRes:
+    def __init__(self, data):
+        self.data = data
+
+
+class VersionTable:
+    """ingest_version with one row; counts reads."""
+
+    def __init__(self, version):
+        self.version = version
+        self.reads = 0
+
+    def table(self, name):
+        assert name == data_version.VERSION_TABLE
+        return self
+
+    def select(self, *_args):
+        return self
+
+    def eq(self, *_args):
+        return self
+
+    def limit(self, *_args):
+        return self
+
+    def upsert(self, row):
+        self.version = row["version"]
+        return self
+
+    def execute(self):
+        self.reads += 1
+        return DummyRes([{"version": self.version}])
+
+
+def test_version_is_read_at_most_once_per_interval(monkeypatch):
+    db = VersionTable("v1")
+    monkeypatch.setattr(data_version, "get_supabase_client", lambda: db)
+    monkeypatch.setattr(get_settings(), "data_version_check_seconds", 60)
+    data_version.reset()
+
+    assert data_version.current() == "v1"
+    db.version = "v2"
+    assert data_version.current() == "v1"
+    assert db.reads == 1
+
+    monkeypatch.setattr(get_settings(), "data_version_check_seconds", 0)
+    assert data_version.current() == "v2"
+
+
+def test_bump_publishes_a_new_version(monkeypatch):
+    db = VersionTable("v1")
+    monkeypatch.setattr(data_version, "get_supabase_client", lambda: db)
+    data_version.reset()
+
+    published = data_version.bump()
+    assert db.version == published != "v1"
+
+
+def test_changed_reports_each_new_version_once():
+    data_version.reset()
+    assert data_version.changed("cache", "v1") is False
+    assert data_version.changed("cache", "v1") is False
+    assert data_version.changed("cache", "v2") is True
+    assert data_version.changed("cache", "v2") is False
+
+
+def test_toc_is_reloaded_after_ingestion_in_another_process(monkeypatch):
+    versions = iter(["v1", "v1", "v2"])
+    monkeypatch.setattr(data_version, "current", lambda: next(versions))
+    reads = []
+
+    class Table:
+        def select(self, *_args):
+            return self
+
+        def eq(self, *_args):
+            return self
+
+        def limit(self, *_args):
+            return self
+
+        def execute(self):
+            reads.append(1)
+            return DummyRes([{"toc": [{"heading": f"Read {len(reads)}", "level": 1, "position": 0}]}])
+
+    monkeypatch.setattr(toc_index, "get_supabase_client", lambda: type("Client", (), {"table": lambda self, name: Table()})())
+    toc_index.invalidate_toc()
+
+    assert toc_index.get_toc("doc")[0]["heading"] == "Read 1"
+    assert toc_index.get_toc("doc")[0]["heading"] == "Read 1"
+    # the CLI re-ingested the document: no in-process invalidate_toc, only a new version
+    assert toc_index.get_toc("doc")[0]["heading"] == "Read 2"
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+import db_profiler
+import main
+import routers.health as health_router_module
+
+
+class DummyRes:
+    def __init__(self, data):
+        self.data = data
+
+
+class DummyQuery:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    def update(self, *_args, **_kwargs):
+        return self
+
+    def eq(self, *_args, **_kwargs):
+        return self
+
+    def in_(self, *_args, **_kwargs):
+        return self
+
+    def limit(self, *_args, **_kwargs):
+        return self
+
+    def execute(self):
+        return DummyRes(self.rows)
+
+
+class AsyncDummyQuery(DummyQuery):
+    async def execute(self):
+        return DummyRes(self.rows)
+
+
+class DummyClient:
+    def __init__(self, query_cls=DummyQuery):
+        self.query_cls = query_cls
+
+    def table(self, *_args, **_kwargs):
+        return self.query_cls([{"id": 1}, {"id": 2}])
+
+    def rpc(self, *_args, **_kwargs):
+        return self.query_cls([{"id": 3}])
+
+
+def test_profiled_client_records_queries_and_flags_repeats():
+    sb = db_profiler.ProfiledClient(DummyClient())
+
+    with db_profiler.profile("run") as run:
+        with db_profiler.profile("doc.txt", repeat_threshold=3) as unit:
+            sb.table("documents").select("id").eq("source", "s").limit(1).execute()
+            for i in range(3):
+                sb.table("chunks").update({"chapter_summary": "x" * i}).in_("id", [i]).execute()
+    # outside a profile the client only passes queries through
+    assert sb.table("documents").select("id").execute().data == [{"id": 1}, {"id": 2}]
+
+    summary = unit.summary()
+    assert summary["queries"] == 4
+    assert summary["rows"] == 8
+    assert summary["bytes_sent"] > 0
+    assert [(e["shape"], e["count"]) for e in summary["repeated"]] == [("chunks.update[in_:id]", 3)]
+    assert run.summary()["queries"] == 4
+
+
+def test_profiled_async_client_records_awaited_queries():
+    sb = db_profiler.ProfiledClient(DummyClient(AsyncDummyQuery))
+
+    async def run():
+        with db_profiler.profile("search") as unit:
+            res = await sb.rpc("search_chunks", {"q": "metformin"}).execute()
+        return res, unit
+
+    res, unit = asyncio.run(run())
+    assert res.data == [{"id": 3}]
+    assert unit.summary()["queries"] == 1
+    assert unit.queries[0]["shape"] == "rpc:search_chunks.call"
+
+
+def test_debug_header_reports_request_queries(monkeypatch):
+    settings = SimpleNamespace(db_profiling=True, db_profiling_repeat_threshold=3)
+    monkeypatch.setattr(main, "get_settings", lambda: settings)
+    monkeypatch.setattr(
+        health_router_module, "get_supabase_client", lambda: db_profiler.ProfiledClient(DummyClient())
+    )
+
+    res = TestClient(main.app).get("/health/deep")
+
+    profile = json.loads(res.headers["X-DB-Profile"])
+    assert profile["queries"] == 1
+    assert profile["repeated"] == []
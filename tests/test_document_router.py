@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import threading
+
+import document_router
+
+
+def make_catalog():
+    return document_router.Catalog([
+        {"id": "d1", "title": "Hypertension in adults", "profile": "Diagnosis: blood pressure thresholds"},
+        {"id": "d2", "title": "Type 2 diabetes", "profile": "Treatment: metformin first line, HbA1c targets"},
+        {"id": "d3", "title": "Asthma", "profile": "Inhaled corticosteroids and reliever therapy"},
+    ])
+
+
+def test_document_profile_prefers_chapter_summaries():
+    summaries = [{"chapter": "Treatment", "summary": "Metformin first."}]
+    toc = [{"heading": "Treatment", "level": 1}, {"heading": "Dosing", "level": 2}]
+
+    assert document_router.document_profile(summaries, toc) == "Treatment: Metformin first."
+    assert document_router.document_profile(None, toc) == "Treatment"
+
+
+def test_candidate_documents_ranks_lexical_matches_first_and_pads():
+    catalog = make_catalog()
+
+    candidates = document_router.candidate_documents("metformin dose", limit=2, catalog=catalog)
+    assert [doc["id"] for doc in candidates] == ["d2", "d1"]
+
+    candidates = document_router.candidate_documents("metformin", limit=1, catalog=catalog)
+    assert [doc["id"] for doc in candidates] == ["d2"]
+
+
+def test_stale_catalog_is_served_while_it_is_rebuilt_in_the_background(monkeypatch):
+    version = ["v1"]
+    release = threading.Event()
+    loads = []
+
+    def load_catalog():
+        loads.append(version[0])
+        if len(loads) > 1:
+            release.wait(5)
+        return document_router.Catalog([{"id": f"d{len(loads)}", "title": "t", "profile": "p"}])
+
+    monkeypatch.setattr(document_router, "load_catalog", load_catalog)
+    monkeypatch.setattr(document_router.data_version, "current", lambda: version[0])
+    document_router.reset()
+
+    first = document_router.get_catalog()
+    assert list(first.by_id) == ["d1"]
+    assert document_router.get_catalog() is first
+
+    # ingestion in another process moved the shared version: no request waits for the reload
+    version[0] = "v2"
+    assert document_router.get_catalog() is first
+    assert document_router.get_catalog() is first
+    release.set()
+    for thread in threading.enumerate():
+        if thread.name == "routing-catalog-refresh":
+            thread.join(5)
+    assert list(document_router.get_catalog().by_id) == ["d2"]
+    assert loads == ["v1", "v2"]
+    document_router.reset()
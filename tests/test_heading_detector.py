@@ -0,0 +1,83 @@
+from heading_detector import align_offsets, detect_headings_local, merge_window_headings, split_windows
+
+
+def test_detects_numbered_sections_with_exact_offsets():
+    text = (
+        "1 Introduction\n\n"
+        "Diabetes is a chronic condition.\n\n"
+        "1.1 Scope\n"
+        "This guideline covers adults.\n\n"
+        "2 Treatment\n\n"
+        "Metformin is first line.\n"
+    )
+    headings, confidence = detect_headings_local(text)
+
+    assert [h["heading_text"] for h in headings] == ["1 Introduction", "1.1 Scope", "2 Treatment"]
+    assert [h["level"] for h in headings] == [1, 2, 1]
+    for h in headings:
+        assert text[h["start_position"]:].startswith(h["heading_text"])
+    assert confidence >= 0.6
+
+
+def test_detects_caps_and_page_break_headings_and_skips_page_markers():
+    text = (
+        "OVERVIEW\n"
+        "Type 2 diabetes management.\n"
+        "Page 2\n"
+        "\fGlycaemic targets\n"
+        "Aim for HbA1c below 53 mmol/mol.\n"
+    )
+    headings, _ = detect_headings_local(text)
+
+    assert [h["heading_text"] for h in headings] == ["OVERVIEW", "Glycaemic targets"]
+    assert headings[1]["start_position"] == text.index("Glycaemic targets")
+
+
+def test_ignores_table_of_contents_and_list_items():
+    text = (
+        "CONTENTS\n\n"
+        "1 Introduction ........ 2\n"
+        "2 Treatment ........ 5\n\n"
+        "1 Introduction\n\n"
+        "Steps:\n"
+        "1. Check renal function.\n"
+        "2. Start metformin.\n\n"
+        "2 Treatment\n\n"
+        "Metformin is first line.\n"
+    )
+    headings, _ = detect_headings_local(text)
+
+    texts = [h["heading_text"] for h in headings]
+    assert "1 Introduction ........ 2" not in texts
+    assert "1. Check renal function." not in texts
+    assert texts[-2:] == ["1 Introduction", "2 Treatment"]
+
+
+def test_plain_prose_has_low_confidence():
+    headings, confidence = detect_headings_local("Just a paragraph of text without any structure at all.")
+    assert confidence < 0.6
+
+
+def test_align_offsets_snaps_llm_positions_to_heading_text():
+    text = "Intro text here.\n\nTreatment\nUse metformin.\n"
+    aligned = align_offsets(text, [
+        {"heading_text": "Treatment", "level": 1, "start_position": 3},
+        {"heading_text": "Missing heading", "level": 2, "start_position": 999},
+    ])
+    assert aligned == [{"heading_text": "Treatment", "level": 1, "start_position": text.index("Treatment")}]
+
+
+def test_window_merge_keeps_overlapping_headings_once_with_global_offsets():
+    text = "".join(f"\n\nSECTION NUMBER {i}\n\n" + "body text. " * 30 for i in range(6))
+    windows = split_windows(text, 400, 100)
+    assert len(windows) > 1
+    assert windows[-1][0] + len(windows[-1][1]) == len(text)
+
+    results = [detect_headings_local(window)[0] for _, window in windows]
+    merged = merge_window_headings(windows, results, 100)
+
+    positions = [h["start_position"] for h in merged]
+    assert positions == sorted(set(positions))
+    assert [h["heading_text"] for h in merged] == [f"SECTION NUMBER {i}" for i in range(6)]
+    for h in merged:
+        assert text[h["start_position"]:].startswith(h["heading_text"])
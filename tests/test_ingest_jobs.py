@@ -0,0 +1,251 @@
+import sys
+import threading
+import time
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+import ingest_jobs
+import routers.ingest as ingest_router_module
+from config import get_settings
+from main import app
+
+client = TestClient(app)
+ADMIN = {"Authorization": "Bearer admin-token"}
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(get_settings(), "ingest_admin_token", "admin-token")
+
+
+def fake_pipeline(calls):
+    """Stand-in for pipeline: two chunks per file, each summary reported through on_chunk."""
+    def process_document(text, filename, source, known_summaries=None, on_chunk=None):
+        calls.append((filename, dict(known_summaries or {})))
+        for done, chunk_hash in enumerate((f"{filename}-1", f"{filename}-2"), 1):
+            on_chunk(done, 2, chunk_hash, (known_summaries or {}).get(chunk_hash, f"summary of {chunk_hash}"))
+        return "processed"
+
+    return types.SimpleNamespace(
+        list_bucket_files=lambda bucket, folder: [{"name": "a.txt"}, {"name": "notes.md"}, {"name": "b.txt"}],
+        download_text=lambda bucket, path: f"text of {path}",
+        process_document=process_document,
+    )
+
+
+def run_to_completion(runner):
+    runner._pool.shutdown(wait=True)
+
+
+def test_job_ingests_every_txt_file_and_reports_progress(tmp_path, monkeypatch):
+    calls = []
+    saved = []
+    monkeypatch.setitem(sys.modules, "pipeline", fake_pipeline(calls))
+    monkeypatch.setattr(ingest_jobs.bm25_index, "save_index", lambda: saved.append(True))
+    runner = ingest_jobs.IngestJobRunner(ingest_jobs.JobStore(str(tmp_path / "jobs.sqlite3")))
+
+    job_id = runner.submit("bucket", "folder")
+    run_to_completion(runner)
+
+    progress = ingest_jobs.job_progress(runner.store.get_job(job_id))
+    assert [name for name, _ in calls] == ["a.txt", "b.txt"]
+    assert progress["status"] == "completed"
+    assert progress["files_done"] == progress["files_total"] == 2
+    assert progress["chunks_done"] == progress["chunks_total"] == 4
+    assert progress["progress"] == 1.0
+    # the BM25 snapshot is written once the job is done
+    assert saved == [True]
+    # summaries are only kept until the document is stored
+    assert runner.store.chunk_summaries(job_id, "a.txt") == {}
+
+
+def test_interrupted_job_resumes_from_saved_chunk_summaries(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setitem(sys.modules, "pipeline", fake_pipeline(calls))
+    store = ingest_jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    # state left behind by a process that died while summarizing b.txt
+    job_id = store.create_job("bucket", "folder", ["a.txt", "b.txt"])
+    store.set_job_status(job_id, "running")
+    store.add_files(job_id, ["a.txt", "b.txt"])
+    store.update_file(job_id, "a.txt", status="processed", chunks_done=2, chunks_total=2)
+    store.update_file(job_id, "b.txt", status="running", chunks_done=1, chunks_total=2)
+    store.save_chunk(job_id, "b.txt", "b.txt-1", "saved summary")
+    assert ingest_jobs.job_progress(store.get_job(job_id))["progress"] == 0.75
+
+    runner = ingest_jobs.IngestJobRunner(store)
+    assert runner.resume() == [job_id]
+    run_to_completion(runner)
+
+    assert calls == [("b.txt", {"b.txt-1": "saved summary"})]
+    assert store.get_job(job_id)["status"] == "completed"
+
+
+def test_failed_files_are_reported_in_the_job_status(tmp_path, monkeypatch):
+    pipeline = fake_pipeline([])
+
+    def download_text(bucket, path):
+        if path.endswith("a.txt"):
+            raise RuntimeError("object not found")
+        return "text"
+
+    pipeline.download_text = download_text
+    monkeypatch.setitem(sys.modules, "pipeline", pipeline)
+    runner = ingest_jobs.IngestJobRunner(ingest_jobs.JobStore(str(tmp_path / "jobs.sqlite3")))
+
+    job_id = runner.submit("bucket", "folder", ["a.txt", "b.txt"])
+    run_to_completion(runner)
+
+    job = runner.store.get_job(job_id)
+    assert (job["status"], job["error"]) == ("completed_with_errors", "1 of 2 files failed")
+    assert [(f["name"], f["status"], f["error"]) for f in job["files"]] == [
+        ("a.txt", "failed", "object not found"),
+        ("b.txt", "processed", None),
+    ]
+    progress = ingest_jobs.job_progress(job)
+    assert (progress["files_done"], progress["files_failed"]) == (2, 1)
+
+    # nothing ingested at all: the job itself failed
+    runner = ingest_jobs.IngestJobRunner(runner.store)
+    job_id = runner.submit("bucket", "folder", ["a.txt"])
+    run_to_completion(runner)
+    job = runner.store.get_job(job_id)
+    assert (job["status"], job["error"]) == ("failed", "1 of 1 files failed")
+
+
+class FakeRunner:
+    def __init__(self, store):
+        self.store = store
+        self.submitted = []
+
+    def submit(self, bucket, folder, files=None):
+        self.submitted.append((bucket, folder, files))
+        job_id = self.store.create_job(bucket, folder, files)
+        self.store.add_files(job_id, files or [])
+        return job_id
+
+
+def test_ingest_endpoints(tmp_path, monkeypatch):
+    runner = FakeRunner(ingest_jobs.JobStore(str(tmp_path / "jobs.sqlite3")))
+    monkeypatch.setattr(ingest_router_module, "get_job_runner", lambda: runner)
+
+    res = client.post("/ingest", json={"folder": "guidelines", "files": ["a.txt"]}, headers=ADMIN)
+    assert res.status_code == 202
+    job_id = res.json()["job_id"]
+    assert runner.submitted == [("Medical Guidelines", "guidelines", ["a.txt"])]
+
+    body = client.get(f"/ingest/{job_id}", headers=ADMIN).json()
+    assert body["status"] == "queued"
+    assert body["files"][0]["name"] == "a.txt"
+    assert [job["job_id"] for job in client.get("/ingest", headers=ADMIN).json()["jobs"]] == [job_id]
+
+    assert client.get("/ingest/missing", headers=ADMIN).status_code == 404
+    assert client.get("/ingest?limit=0", headers=ADMIN).status_code == 422
+    assert client.get("/ingest?limit=101", headers=ADMIN).status_code == 422
+
+
+def test_ingest_endpoints_require_the_admin_token(monkeypatch):
+    monkeypatch.setattr(ingest_router_module, "get_job_runner", lambda: pytest.fail("runner used without auth"))
+
+    assert client.post("/ingest", json={}).status_code == 401
+    assert client.post("/ingest", json={}, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get("/ingest", headers={"Authorization": "admin-token"}).status_code == 401
+
+    # no token configured: the endpoints are disabled altogether
+    monkeypatch.setattr(get_settings(), "ingest_admin_token", None)
+    assert client.post("/ingest", json={}, headers=ADMIN).status_code == 403
+
+
+def test_ingest_events_stream_until_done(tmp_path, monkeypatch):
+    store = ingest_jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create_job("bucket", "folder", ["a.txt"])
+    store.add_files(job_id, ["a.txt"])
+    store.set_job_status(job_id, "running")
+    monkeypatch.setattr(ingest_router_module, "get_job_runner", lambda: types.SimpleNamespace(store=store))
+    monkeypatch.setattr(ingest_router_module, "EVENT_POLL_SECONDS", 0)
+
+    original = ingest_router_module.job_progress
+    polls = []
+
+    def job_progress(job):
+        # the job finishes after the first progress event has been sent
+        polls.append(job["status"])
+        if len(polls) == 2:
+            store.set_job_status(job_id, "completed")
+        return original(job)
+
+    monkeypatch.setattr(ingest_router_module, "job_progress", job_progress)
+
+    res = client.get(f"/ingest/{job_id}/events", headers=ADMIN)
+    assert res.headers["content-type"].startswith("text/event-stream")
+    events = [block.split("\n")[0] for block in res.text.strip().split("\n\n")]
+    assert events[0] == "event: progress"
+    assert events[-1] == "event: done"
+
+
+def test_ingest_events_report_a_job_removed_mid_stream(tmp_path, monkeypatch):
+    store = ingest_jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+    job_id = store.create_job("bucket", "folder", ["a.txt"])
+    store.add_files(job_id, ["a.txt"])
+    monkeypatch.setattr(ingest_router_module, "get_job_runner", lambda: types.SimpleNamespace(store=store))
+    monkeypatch.setattr(ingest_router_module, "EVENT_POLL_SECONDS", 0)
+
+    original = ingest_router_module.job_progress
+    polls = []
+
+    def job_progress(job):
+        # the job is deleted after the first progress event has been sent
+        polls.append(job_id)
+        if len(polls) == 2:
+            store._write("DELETE FROM jobs WHERE id = ?", (job_id,))
+        return original(job)
+
+    monkeypatch.setattr(ingest_router_module, "job_progress", job_progress)
+
+    res = client.get(f"/ingest/{job_id}/events", headers=ADMIN)
+    assert res.status_code == 200
+    blocks = res.text.strip().split("\n\n")
+    assert [block.split("\n")[0] for block in blocks] == ["event: progress", "event: error"]
+    assert '"detail": "Job not found"' in blocks[-1]
+
+
+def test_runners_sharing_a_store_never_run_the_same_job(tmp_path, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+    pipeline = fake_pipeline(calls)
+    process_document = pipeline.process_document
+
+    def blocking_process_document(*args, **kwargs):
+        started.set()
+        release.wait(5)
+        return process_document(*args, **kwargs)
+
+    pipeline.process_document = blocking_process_document
+    monkeypatch.setitem(sys.modules, "pipeline", pipeline)
+    path = str(tmp_path / "jobs.sqlite3")
+    # two API workers with their own connections to one job store
+    first = ingest_jobs.IngestJobRunner(ingest_jobs.JobStore(path), lease_seconds=0.3)
+    second = ingest_jobs.IngestJobRunner(ingest_jobs.JobStore(path), lease_seconds=0.3)
+
+    job_id = first.submit("bucket", "folder", ["a.txt"])
+    assert started.wait(5)
+    # the lease is renewed while the job runs, so a worker starting later leaves it alone
+    time.sleep(0.5)
+    assert second.resume() == []
+    release.set()
+    run_to_completion(first)
+    run_to_completion(second)
+    assert [name for name, _ in calls] == ["a.txt"]
+    assert second.store.get_job(job_id)["status"] == "completed"
+
+    # a job whose owner died without finishing is taken over once its lease lapses
+    store = second.store
+    orphan = store.create_job("bucket", "folder", ["b.txt"])
+    assert store.claim(orphan, "dead-worker", -1)
+    third = ingest_jobs.IngestJobRunner(ingest_jobs.JobStore(path), lease_seconds=0.3)
+    assert third.resume() == [orphan]
+    run_to_completion(third)
+    assert store.get_job(orphan)["status"] == "completed"
+    assert store.claim(orphan, "anyone", 10) is False
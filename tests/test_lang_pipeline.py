@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+
+from langchain_core.messages import AIMessage
+
+import lang_pipeline
+
+ANSWER = {"answer": "Metformin [Source: Treatment]", "citations": ["Treatment"]}
+
+
+def test_formatting_node_streams_only_the_answer_text(monkeypatch):
+    def invoke_llm(messages, on_token=None):
+        content = json.dumps(ANSWER)
+        for i in range(0, len(content), 4):
+            on_token(content[i:i + 4])
+        return AIMessage(content=content)
+
+    monkeypatch.setattr(lang_pipeline, "invoke_llm", invoke_llm)
+    tokens = []
+    config = {"configurable": {"token_sink": lambda token, attempt: tokens.append((token, attempt))}}
+
+    update = lang_pipeline.response_formatting_node({"query": "q", "context": "c", "retry_count": 0}, config)
+
+    assert update["final_response"] == ANSWER
+    assert "".join(token for token, _ in tokens) == ANSWER["answer"]
+    assert {attempt for _, attempt in tokens} == {1}
+
+
+class EndlessGraph:
+    """Streams tokens until the token sink stops it."""
+
+    def __init__(self):
+        self.tokens = 0
+        self.stopped = threading.Event()
+
+    def stream(self, state, config=None, stream_mode=None):
+        sink = config["configurable"]["token_sink"]
+        try:
+            yield {"retrieval": {"retrieved_chunks": []}}
+            for i in range(10000):
+                sink(f"t{i} ", 1)
+                self.tokens += 1
+                time.sleep(0.001)
+            yield {"response_formatting": {"final_response": ANSWER}}
+        finally:
+            self.stopped.set()
+
+
+def test_closing_the_stream_cancels_the_run(monkeypatch):
+    graph = EndlessGraph()
+    monkeypatch.setattr(lang_pipeline, "get_graph", lambda: graph)
+
+    events = lang_pipeline.stream_pipeline("q")
+    assert next(events) == ("node", {"node": "retrieval", "retrieved_chunks": 0})
+    assert next(events)[0] == "token"
+    events.close()
+
+    assert graph.stopped.wait(5)
+    assert graph.tokens < 10000
+
+
+def stub_llm(monkeypatch, verdict, answer, single_call=None):
+    """invoke_llm stand-in answering by prompt: the validator, the single-call prompt or the answer prompt."""
+    prompts = []
+
+    def invoke_llm(messages, on_token=None):
+        system = messages[0].content
+        if "clinical validator" in system:
+            prompts.append("validate")
+            return AIMessage(content=verdict)
+        if '"sufficient"' in system:
+            prompts.append("single_call")
+            return AIMessage(content=single_call)
+        prompts.append("answer")
+        return AIMessage(content=answer)
+
+    monkeypatch.setattr(lang_pipeline, "invoke_llm", invoke_llm)
+    return prompts
+
+
+def speculative(mode):
+    return lang_pipeline.speculative_answer_node({"query": "q", "context": "c", "mode": mode})
+
+
+def test_speculative_mode_keeps_the_draft_only_when_validation_says_yes(monkeypatch):
+    stub_llm(monkeypatch, "Yes.", json.dumps(ANSWER))
+    assert speculative("speculative") == {"is_valid": "yes", "final_response": ANSWER}
+
+    stub_llm(monkeypatch, "no", json.dumps(ANSWER))
+    assert speculative("speculative") == {"is_valid": "no"}
+
+
+def test_speculative_mode_with_unparsable_output(monkeypatch):
+    # a verdict without "yes" is a no; an answer that is not JSON is kept as plain text
+    stub_llm(monkeypatch, "unsure", json.dumps(ANSWER))
+    assert speculative("speculative") == {"is_valid": "no"}
+
+    stub_llm(monkeypatch, "yes", "Metformin [Source: Treatment]")
+    assert speculative("speculative")["final_response"] == {"answer": "Metformin [Source: Treatment]", "citations": []}
+
+
+def test_single_call_mode_yes_and_no(monkeypatch):
+    prompts = stub_llm(monkeypatch, "no", "unused", single_call=json.dumps({"sufficient": "yes", **ANSWER}))
+    assert speculative("single_call") == {"is_valid": "yes", "final_response": ANSWER}
+
+    stub_llm(monkeypatch, "yes", "unused", single_call='{"sufficient": "no", "answer": "", "citations": []}')
+    assert speculative("single_call") == {"is_valid": "no"}
+    assert prompts == ["single_call"]
+
+
+def test_single_call_mode_falls_back_to_separate_calls_when_unparsable(monkeypatch):
+    prompts = stub_llm(monkeypatch, "yes", json.dumps(ANSWER), single_call="Sufficient: yes. Metformin first.")
+    assert speculative("single_call") == {"is_valid": "yes", "final_response": ANSWER}
+    assert prompts == ["single_call", "validate", "answer"]
+
+    prompts = stub_llm(monkeypatch, "no", json.dumps(ANSWER), single_call='{"answer": "truncated')
+    assert speculative("single_call") == {"is_valid": "no"}
+    assert prompts == ["single_call", "validate"]
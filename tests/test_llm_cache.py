@@ -0,0 +1,129 @@
+import cache
+import llm_cache
+from cache import MISSING, LRUCache, SQLiteCache, TieredCache
+from config import get_settings
+
+
+def test_lru_cache_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1  # "a" is now most recently used
+    lru.set("c", 3)
+
+    assert lru.get("b", MISSING) is MISSING
+    assert lru.get("a") == 1
+    assert lru.get("c") == 3
+    assert lru.stats()["evictions"] == 1
+
+
+def test_lru_cache_expires_entries(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+
+    lru = LRUCache(max_entries=10, ttl_seconds=5)
+    lru.set("k", "v")
+    now[0] += 4
+    assert lru.get("k") == "v"
+    now[0] += 2
+    assert lru.get("k") is None
+    assert lru.stats()["hits"] == 1
+    assert lru.stats()["misses"] == 1
+
+
+def test_sqlite_cache_persists_and_bounds_size(tmp_path):
+    path = str(tmp_path / "llm.sqlite3")
+    disk = SQLiteCache(path, max_entries=2)
+    disk.set("a", {"x": 1})
+    disk.set("b", "two")
+    disk.set("c", "three")
+
+    reopened = SQLiteCache(path, max_entries=2)
+    assert len(reopened) == 2
+    assert reopened.get("c") == "three"
+    assert reopened.get("a", MISSING) is MISSING
+
+
+def test_tiered_cache_promotes_disk_hits_to_memory(tmp_path):
+    memory = LRUCache()
+    disk = SQLiteCache(str(tmp_path / "llm.sqlite3"))
+    disk.set("k", "cached answer")
+
+    tiered = TieredCache(memory, disk)
+    assert tiered.get("k") == "cached answer"
+    assert memory.get("k") == "cached answer"
+    assert tiered.stats()["hits"] == 1
+
+
+def test_cached_completion_calls_llm_once_per_identical_request(monkeypatch):
+    monkeypatch.setenv("LLM_CACHE_ENABLED", "true")
+    monkeypatch.setenv("LLM_CACHE_PATH", "")
+    get_settings.cache_clear()
+    llm_cache.get_llm_cache.cache_clear()
+
+    calls = []
+
+    def call():
+        calls.append(1)
+        return "answer"
+
+    messages = [{"role": "user", "content": "What is HbA1c?"}]
+    assert llm_cache.cached_completion("gpt-4o-mini", messages, {}, call) == "answer"
+    assert llm_cache.cached_completion("gpt-4o-mini", messages, {}, call) == "answer"
+    assert llm_cache.cached_completion("gpt-4o", messages, {}, call) == "answer"
+
+    assert len(calls) == 2
+    assert llm_cache.get_llm_cache().stats()["hits"] == 1
+
+    get_settings.cache_clear()
+    llm_cache.get_llm_cache.cache_clear()
+
+
+def test_sqlite_cache_hits_only_write_back_stale_access_times(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "time", lambda: now[0])
+    disk = SQLiteCache(str(tmp_path / "llm.sqlite3"), touch_seconds=60)
+    disk.set("k", "v")
+
+    statements = []
+    disk._conn.set_trace_callback(statements.append)
+    now[0] += 10
+    assert disk.get("k") == "v"
+    assert not [s for s in statements if s.startswith("UPDATE")]
+
+    now[0] += 60
+    assert disk.get("k") == "v"
+    assert len([s for s in statements if s.startswith("UPDATE")]) == 1
+
+
+def test_sqlite_cache_evicts_only_when_over_capacity(tmp_path):
+    disk = SQLiteCache(str(tmp_path / "llm.sqlite3"), max_entries=20)
+    statements = []
+    disk._conn.set_trace_callback(statements.append)
+    for i in range(20):
+        disk.set(f"k{i}", i)
+    assert not [s for s in statements if s.startswith("DELETE")]
+
+    disk.set("k20", 20)
+    assert len(disk) == 18  # trimmed to 90% of capacity, oldest first
+    assert disk.get("k0", MISSING) is MISSING
+    assert disk.get("k20") == 20
+
+    statements.clear()
+    disk.set("k21", 21)
+    disk.set("k22", 22)
+    assert not [s for s in statements if s.startswith("DELETE")]
+
+
+class BrokenCache:
+    def get(self, key, default=None):
+        raise cache.sqlite3.OperationalError("database is locked")
+
+    def set(self, key, value):
+        raise cache.sqlite3.OperationalError("database is locked")
+
+
+def test_cached_completion_treats_cache_errors_as_a_miss(monkeypatch):
+    monkeypatch.setattr(llm_cache, "get_llm_cache", lambda: BrokenCache())
+    messages = [{"role": "user", "content": "What is HbA1c?"}]
+    assert llm_cache.cached_completion("gpt-4o-mini", messages, {}, lambda: "answer") == "answer"
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import metrics
+from main import app
+
+
+def test_collect_attributes_nodes_and_llm_calls_to_the_run():
+    def node(state, config=None):
+        pool = ThreadPoolExecutor(max_workers=1)
+        pool.submit(metrics.in_context(metrics.observe_llm_call), "gpt", 0.2, 100, 20, False).result()
+        metrics.observe_llm_call("gpt", 0.001, 100, 20, cached=True)
+        return state
+
+    timed = metrics.timed_node("validation", node)
+    with metrics.collect() as collected:
+        timed({"query": "q"}, config={})
+    # outside collect() nothing is attributed to the run
+    metrics.observe_llm_call("gpt", 0.3, 5, 5, False)
+
+    summary = collected.summary(retries=1)
+    assert [n["node"] for n in summary["nodes"]] == ["validation"]
+    assert summary["retries"] == 1
+    assert summary["llm"] == {
+        "calls": 2,
+        "cache_hits": 1,
+        "prompt_tokens": 100,
+        "completion_tokens": 20,
+        "seconds": 0.201,
+    }
+
+
+def test_metrics_endpoint_renders_prometheus_histograms():
+    metrics.reset()
+    metrics.observe_node("quality_review", 0.3)
+
+    res = TestClient(app).get("/metrics")
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("text/plain")
+    assert 'vlrag_node_duration_seconds_bucket{node="quality_review",le="0.25"} 0' in res.text
+    assert 'vlrag_node_duration_seconds_bucket{node="quality_review",le="0.5"} 1' in res.text
+    assert 'vlrag_node_duration_seconds_count{node="quality_review"} 1' in res.text
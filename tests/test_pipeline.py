@@ -0,0 +1,251 @@
+import threading
+import time
+
+import pytest
+
+import pipeline
+from benchmarks.fakes import FakeOpenAI, FakeSupabase
+
+TEXT = (
+    "1 Treatment\n\nMetformin is first line therapy for adults.\n\n"
+    "1.1 Dosing\n\nStart with a low dose and titrate.\n\n"
+    "2 Monitoring\n\nCheck HbA1c every three months.\n"
+)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """process_document against the in-memory Supabase and OpenAI stand-ins, without the LLM cache."""
+    db = FakeSupabase()
+    db.openai = FakeOpenAI()
+    monkeypatch.setattr(pipeline, "get_supabase_client", lambda: db)
+    monkeypatch.setattr(pipeline, "get_openai_client", lambda: db.openai)
+    monkeypatch.setattr(pipeline, "cached_completion", lambda model, messages, params, call: call())
+    monkeypatch.setattr(pipeline.data_version, "bump", lambda: None)
+    return db
+
+
+def chunk_rows(db):
+    return sorted(db.tables.get("chunks", []), key=lambda row: row["position_in_doc"])
+
+
+def rows_at(*positions):
+    return [{"document_id": "d1", "content": f"chunk {p}", "position_in_doc": p} for p in positions]
+
+
+def test_insert_chunks_batches_rows_and_maps_ids_by_position(db):
+    chunk_ids = pipeline.insert_chunks(rows_at(4, 0, 2, 1, 3), batch_size=2)
+
+    assert db.calls[("chunks", "insert")] == 3
+    stored = {row["position_in_doc"]: row["id"] for row in db.tables["chunks"]}
+    assert chunk_ids == stored and sorted(chunk_ids) == [0, 1, 2, 3, 4]
+
+
+def test_rejected_batch_is_retried_row_by_row(db, monkeypatch):
+    class RejectsPosition2:
+        def table(self, name):
+            query = db.table(name)
+            insert = query.insert
+
+            def checked_insert(payload):
+                rows = payload if isinstance(payload, list) else [payload]
+                if any(row["position_in_doc"] == 2 for row in rows):
+                    raise RuntimeError("invalid byte sequence")
+                return insert(payload)
+
+            query.insert = checked_insert
+            return query
+
+    monkeypatch.setattr(pipeline, "get_supabase_client", lambda: RejectsPosition2())
+    chunk_ids = pipeline.insert_chunks(rows_at(0, 1, 2, 3), batch_size=2)
+
+    # the first batch goes in whole; the second one falls back and only loses the bad row
+    assert sorted(chunk_ids) == [0, 1, 3]
+    assert sorted(row["position_in_doc"] for row in db.tables["chunks"]) == [0, 1, 3]
+
+
+def test_partial_insert_keeps_the_previous_version(db, monkeypatch):
+    assert pipeline.process_document(TEXT, "a.txt", "src://a") == "processed"
+    old_ids = {row["id"] for row in chunk_rows(db)}
+    old_hash = db.tables["documents"][0]["content_hash"]
+
+    insert_chunks = pipeline.insert_chunks
+    # the last row of the new version is rejected
+    monkeypatch.setattr(pipeline, "insert_chunks", lambda rows: insert_chunks(rows[:-1]))
+    pipeline.process_document(TEXT.replace("three", "six"), "a.txt", "src://a")
+
+    assert old_ids <= {row["id"] for row in chunk_rows(db)}
+    assert db.tables["documents"][0]["content_hash"] == old_hash
+
+
+def test_chapter_summaries_are_stored_with_the_chunk_insert(db):
+    assert pipeline.process_document(TEXT, "a.txt", "src://a") == "processed"
+
+    rows = chunk_rows(db)
+    assert rows[0]["chapter_summary"] and rows[0]["chapter_summary"] == rows[1]["chapter_summary"]
+    assert rows[2]["chapter_summary"] != rows[0]["chapter_summary"]
+    # no follow-up update per chapter
+    assert ("chunks", "update") not in db.calls
+
+
+def test_failed_chapter_summary_leaves_the_document_to_be_retried(db, monkeypatch):
+    def create_chapter_summary(texts, chapter_name):
+        raise RuntimeError("rate limited")
+
+    monkeypatch.setattr(pipeline, "create_chapter_summary", create_chapter_summary)
+    assert pipeline.process_document(TEXT, "a.txt", "src://a") == "processed"
+    assert db.tables["documents"][0].get("content_hash") is None
+
+
+def test_unchanged_file_is_skipped_without_llm_calls(db):
+    assert pipeline.process_document(TEXT, "a.txt", "src://a") == "processed"
+    calls = db.openai.calls
+    rows = chunk_rows(db)
+
+    assert pipeline.process_document(TEXT, "a.txt", "src://a") == "skipped"
+    assert db.openai.calls == calls
+    assert chunk_rows(db) == rows
+
+
+def test_changed_file_only_resummarizes_changed_chunks_and_chapters(db):
+    assert pipeline.process_document(TEXT, "a.txt", "src://a") == "processed"
+    # three chunk summaries and two chapter summaries
+    assert db.openai.calls == 5
+    before = {row["section_heading"]: row for row in chunk_rows(db)}
+
+    assert pipeline.process_document(TEXT.replace("three", "six"), "a.txt", "src://a") == "processed"
+    # only the Monitoring chunk and its chapter are summarized again
+    assert db.openai.calls == 7
+    after = {row["section_heading"]: row for row in chunk_rows(db)}
+    assert len(db.tables["chunks"]) == 3
+    for heading in ("1 Treatment", "1.1 Dosing"):
+        assert after[heading]["summary"] == before[heading]["summary"]
+        assert after[heading]["chapter_summary"] == before[heading]["chapter_summary"]
+    assert after["2 Monitoring"]["content_hash"] != before["2 Monitoring"]["content_hash"]
+
+
+def test_reusable_chapter_summaries_need_exactly_the_same_chunks():
+    previous = [
+        {"content_hash": "a", "chapter_summary": "A"},
+        {"content_hash": "b", "chapter_summary": "A"},
+        {"content_hash": "c", "chapter_summary": "C"},
+        {"content_hash": "d", "chapter_summary": "C"},
+    ]
+    chapters = {
+        "same": [{"content_hash": "a"}, {"content_hash": "b"}],
+        "shrunk": [{"content_hash": "c"}],
+        "new chunk": [{"content_hash": "d"}, {"content_hash": "e"}],
+    }
+    assert pipeline.reusable_chapter_summaries(chapters, previous) == {"same": "A"}
+
+
+def test_find_document_picks_one_row_per_source_without_deleting(capsys):
+    db = FakeSupabase()
+    db.tables["documents"] = [
+        {"id": "d3", "source": "s", "content_hash": "h3"},
+        {"id": "d1", "source": "s", "content_hash": None},
+        {"id": "d2", "source": "s", "content_hash": "h2"},
+        {"id": "d4", "source": "other", "content_hash": "h4"},
+    ]
+    db.tables["chunks"] = [{"id": f"c{doc}", "document_id": doc} for doc in ("d1", "d2", "d3", "d4")]
+
+    # the first fully ingested row by id wins, whatever order the rows come back in
+    assert pipeline.find_document(db, "s")["id"] == "d2"
+    assert "3 document rows for s" in capsys.readouterr().out
+    # duplicates may belong to a run still in progress: the lookup never deletes
+    assert len(db.tables["documents"]) == 4 and len(db.tables["chunks"]) == 4
+    assert ("documents", "delete") not in db.calls
+
+    assert pipeline.find_document(db, "other")["id"] == "d4"
+    assert pipeline.find_document(db, "missing") is None
+
+
+class FakeStorage:
+    """storage.from_(bucket).list(folder, options) over a fixed folder listing, recording each page request."""
+
+    def __init__(self, names):
+        self.names = sorted(names)
+        self.pages = []
+
+    def from_(self, bucket):
+        return self
+
+    def list(self, folder, options):
+        self.pages.append((folder, options["offset"], options["limit"]))
+        return [{"name": name} for name in self.names[options["offset"]:options["offset"] + options["limit"]]]
+
+
+def test_list_bucket_files_reads_every_page(monkeypatch):
+    storage = FakeStorage([f"{i}.txt" for i in range(5)])
+    monkeypatch.setattr(pipeline, "get_supabase_client", lambda: type("Client", (), {"storage": storage})())
+
+    assert [f["name"] for f in pipeline.list_bucket_files("bucket", "folder", page_size=2)] == [
+        "0.txt", "1.txt", "2.txt", "3.txt", "4.txt",
+    ]
+    assert storage.pages == [("folder", 0, 2), ("folder", 2, 2), ("folder", 4, 2)]
+
+
+def test_process_storage_bucket_reports_every_outcome(monkeypatch):
+    storage = FakeStorage(["a.txt", "b.txt", "broken.txt", "bad-download.txt", "notes.md", "same.txt"])
+    monkeypatch.setattr(pipeline, "get_supabase_client", lambda: type("Client", (), {"storage": storage})())
+    monkeypatch.setattr(pipeline.settings, "storage_bucket", "bucket")
+    monkeypatch.setattr(pipeline.settings, "storage_folder", "folder")
+    monkeypatch.setattr(pipeline.settings, "storage_list_page_size", 2)
+    monkeypatch.setattr(pipeline.settings, "ingest_document_workers", 2)
+    monkeypatch.setattr(pipeline.settings, "download_prefetch", 1)
+    monkeypatch.setattr(pipeline.bm25_index, "save_index", lambda: None)
+
+    def download_text(bucket, path):
+        if path.endswith("bad-download.txt"):
+            raise RuntimeError("object not found")
+        return f"text of {path}"
+
+    processed = []
+
+    def process_document(text, filename, source):
+        processed.append((filename, source, text))
+        if filename == "broken.txt":
+            raise ValueError("no headings")
+        return "skipped" if filename == "same.txt" else "processed"
+
+    monkeypatch.setattr(pipeline, "download_text", download_text)
+    monkeypatch.setattr(pipeline, "process_document", process_document)
+
+    stats = pipeline.process_storage_bucket()
+
+    # notes.md and same.txt are skipped; the failed download and the failing document are counted once each
+    assert {k: stats[k] for k in ("processed", "skipped", "failed")} == {"processed": 2, "skipped": 2, "failed": 2}
+    assert stats["seconds"] >= 0
+    assert sorted(name for name, _, _ in processed) == ["a.txt", "b.txt", "broken.txt", "same.txt"]
+    assert ("a.txt", "supabase://bucket/folder/a.txt", "text of folder/a.txt") in processed
+    assert [offset for _, offset, _ in storage.pages] == [0, 2, 4, 6]
+
+
+def test_rate_limiter_spaces_calls_from_several_threads():
+    limiter = pipeline.RateLimiter(per_minute=1200)  # one call every 50ms
+    starts = []
+    lock = threading.Lock()
+
+    def call():
+        limiter.wait()
+        with lock:
+            starts.append(time.monotonic())
+
+    threads = [threading.Thread(target=call) for _ in range(6)]
+    began = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # the k-th call gets the k-th slot, so it cannot start before k intervals have passed
+    starts.sort()
+    for k, started in enumerate(starts):
+        assert started - began >= k * limiter.interval - 0.001
+
+
+def test_rate_limiter_disabled_never_waits(monkeypatch):
+    monkeypatch.setattr(pipeline.time, "sleep", lambda seconds: pytest.fail("slept"))
+    limiter = pipeline.RateLimiter(per_minute=0)
+    for _ in range(100):
+        limiter.wait()
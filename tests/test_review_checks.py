@@ -0,0 +1,55 @@
+import review_checks
+
+CHUNKS = [
+    {"section_heading": "3.1 Pharmacological Treatment", "content": "Metformin is first line."},
+    {"section_heading": "Monitoring", "content": "Check HbA1c every 3 months."},
+]
+
+
+def test_well_cited_answer_passes_without_the_auditor():
+    response = {
+        "answer": "Metformin is first line [Source: 3.1 Pharmacological Treatment]. "
+                  "Check HbA1c every 3 months [Source: Monitoring].",
+        "citations": ["3.1 Pharmacological Treatment", "Monitoring"],
+    }
+    result = review_checks.check_answer(response, CHUNKS)
+    assert result["passed"] and not result["uncertain"]
+    assert not review_checks.needs_llm_review(result, response["answer"], rate=0.0)
+
+
+def test_missing_inline_citations_fail_with_feedback():
+    result = review_checks.check_answer({"answer": "Metformin is first line.", "citations": []}, CHUNKS)
+    assert not result["passed"]
+    assert "[Source: Section Name]" in review_checks.feedback(result)
+
+
+def test_citation_of_a_section_that_was_not_retrieved_fails():
+    response = {"answer": "Use insulin [Source: Insulin Therapy].", "citations": ["Insulin Therapy"]}
+    result = review_checks.check_answer(response, CHUNKS)
+    assert not result["passed"]
+    assert '"Insulin Therapy"' in review_checks.feedback(result)
+    assert '"Monitoring"' in review_checks.feedback(result)
+
+
+def test_bad_shape_and_leaked_json_fail():
+    assert not review_checks.check_answer("not a dict", CHUNKS)["passed"]
+    assert not review_checks.check_answer({"answer": "x [Source: Monitoring]", "citations": "Monitoring"}, CHUNKS)["passed"]
+    leaked = {"answer": '```json\n{"answer": "Metformin [Source: Monitoring]"}\n```', "citations": []}
+    assert not review_checks.check_answer(leaked, CHUNKS)["passed"]
+
+
+def test_partial_heading_match_is_uncertain_and_goes_to_the_auditor():
+    response = {"answer": "Metformin is first line [Source: Pharmacological Treatment].",
+                "citations": ["Pharmacological Treatment"]}
+    result = review_checks.check_answer(response, CHUNKS)
+    assert result["passed"] and result["uncertain"]
+    assert review_checks.needs_llm_review(result, response["answer"], rate=0.0)
+
+
+def test_sampling_is_deterministic_and_respects_the_rate():
+    answers = [f"answer {i}" for i in range(1000)]
+    picked = [a for a in answers if review_checks.sampled(a, 0.2)]
+    assert 120 < len(picked) < 280
+    assert picked == [a for a in answers if review_checks.sampled(a, 0.2)]
+    assert not review_checks.sampled("anything", 0.0)
+    assert review_checks.sampled("anything", 1.0)
@@ -7,7 +7,10 @@ client = TestClient(app)
 
 def test_search_returns_empty_results_for_no_matches(monkeypatch):
     # mock the search function used by the router
-    monkeypatch.setattr(search_router_module, "search_chunks", lambda q, top_k, document_id: [])
+    async def fake_search(q, top_k, document_id):
+        return []
+
+    monkeypatch.setattr(search_router_module, "search_chunks_async", fake_search)
     res = client.post("/search", json={"query": "thiswillnotmatchanything", "top_k": 3})
     assert res.status_code == 200
     body = res.json()
@@ -17,4 +20,18 @@ def test_search_returns_empty_results_for_no_matches(monkeypatch):
 
 def test_search_requires_query():
     res = client.post("/search", json={"query": ""})
-    assert res.status_code == 422
\ No newline at end of file
+    assert res.status_code == 422
+
+def test_search_batch_returns_results_in_input_order(monkeypatch):
+    async def fake_batch(requests):
+        return [{"query": q, "results": [{"id": i}]} for i, (q, _top_k, _doc) in enumerate(requests)]
+
+    monkeypatch.setattr(search_router_module, "search_batch_async", fake_batch)
+    res = client.post("/search/batch", json={"queries": [{"query": "a"}, {"query": "b", "top_k": 5}]})
+    assert res.status_code == 200
+    assert [r["query"] for r in res.json()["results"]] == ["a", "b"]
+
+
+def test_search_batch_requires_queries():
+    res = client.post("/search/batch", json={"queries": []})
+    assert res.status_code == 422
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import data_version
+import search_service
+
+
+class DummyRes:
+    def __init__(self, data):
+        self.data = data
+
+
+class DummyQuery:
+    def __init__(self, client, name, rows):
+        self.client = client
+        self.name = name
+        self.rows = rows
+        self.ids = None
+
+    def select(self, *_args, **_kwargs):
+        return self
+
+    def in_(self, _column, values):
+        self.ids = list(values)
+        return self
+
+    def execute(self):
+        self.client.calls.append((self.name, sorted(self.ids) if self.ids else None))
+        if self.ids is None:
+            return DummyRes([dict(r) for r in self.rows])
+        return DummyRes([dict(r) for r in self.rows if r["id"] in self.ids])
+
+
+class DummyClient:
+    def __init__(self, rpc_rows, lookup_rows):
+        self.rpc_rows = rpc_rows
+        self.lookup_rows = lookup_rows
+        self.calls = []
+
+    def rpc(self, *_args, **_kwargs):
+        return DummyQuery(self, "rpc", self.rpc_rows)
+
+    def table(self, name):
+        return DummyQuery(self, name, self.lookup_rows)
+
+
+def make_client():
+    return DummyClient(
+        rpc_rows=[{"id": 1, "document_id": "d1"}, {"id": 2, "document_id": "d2"}],
+        lookup_rows=[
+            {"id": "d1", "title": "a.txt", "url": "https://a"},
+            {"id": "d2", "title": "b.txt", "url": None},
+        ],
+    )
+
+
+def test_search_caches_titles_and_urls(monkeypatch):
+    search_service.invalidate_document()
+    client = make_client()
+    monkeypatch.setattr(search_service, "get_supabase_client", lambda: client)
+
+    first = search_service.search_chunks("metformin", 2)
+    # a different top_k misses the result cache but not the lookup cache
+    second = search_service.search_chunks("metformin", 3)
+
+    assert [r["url"] for r in first] == ["https://a", None]
+    assert [r["url"] for r in second] == ["https://a", None]
+    assert client.calls == [
+        ("rpc", None),
+        (search_service.URL_LOOKUP_VIEW, ["d1", "d2"]),
+        ("rpc", None),
+    ]
+
+
+def test_invalidate_document_refetches_only_that_document(monkeypatch):
+    search_service.invalidate_document()
+    client = make_client()
+    monkeypatch.setattr(search_service, "get_supabase_client", lambda: client)
+
+    search_service.search_chunks("metformin", 2)
+    search_service.invalidate_document("d1", "a.txt")
+    client.lookup_rows[0]["url"] = "https://a-v2"
+    results = search_service.search_chunks("metformin", 2)
+
+    assert results[0]["url"] == "https://a-v2"
+    assert client.calls[-1] == (search_service.URL_LOOKUP_VIEW, ["d1"])
+
+
+def test_lookups_are_refetched_after_ingestion_in_another_process(monkeypatch):
+    search_service.invalidate_document()
+    client = make_client()
+    monkeypatch.setattr(search_service, "get_supabase_client", lambda: client)
+    version = ["v1"]
+    monkeypatch.setattr(data_version, "current", lambda: version[0])
+
+    search_service.search_chunks("metformin", 2)
+    # the CLI re-ingested a.txt with a new URL mapping and published a new version
+    client.lookup_rows[0]["url"] = "https://a-v2"
+    version[0] = "v2"
+    results = search_service.search_chunks("metformin", 3)
+
+    assert results[0]["url"] == "https://a-v2"
+    assert client.calls[-1] == (search_service.URL_LOOKUP_VIEW, ["d1", "d2"])
+
+
+def test_cached_results_are_dropped_when_the_data_version_moves(monkeypatch):
+    search_service.invalidate_document()
+    client = make_client()
+    monkeypatch.setattr(search_service, "get_supabase_client", lambda: client)
+    version = ["v1"]
+    monkeypatch.setattr(data_version, "current", lambda: version[0])
+
+    search_service.search_chunks("metformin", 2)
+    search_service.search_chunks("metformin", 2)
+    assert client.calls.count(("rpc", None)) == 1
+
+    # re-ingestion elsewhere replaced the chunks (and their ids)
+    client.rpc_rows = [{"id": 3, "document_id": "d1"}]
+    version[0] = "v2"
+    assert [r["id"] for r in search_service.search_chunks("metformin", 2)] == [3]
+
+
+def test_search_results_are_cached_by_normalized_query(monkeypatch):
+    search_service.invalidate_document()
+    client = make_client()
+    monkeypatch.setattr(search_service, "get_supabase_client", lambda: client)
+
+    first = search_service.search_chunks("Metformin, dose?", 2)
+    first[0]["url"] = "mutated by caller"
+    second = search_service.search_chunks("  metformin dose ", 2)
+
+    assert second[0]["url"] == "https://a"
+    assert [name for name, _ in client.calls].count("rpc") == 1
+
+
+class AsyncDummyQuery(DummyQuery):
+    async def execute(self):
+        await asyncio.sleep(0.01)
+        return super().execute()
+
+
+class AsyncDummyClient(DummyClient):
+    def rpc(self, *_args, **_kwargs):
+        return AsyncDummyQuery(self, "rpc", self.rpc_rows)
+
+    def table(self, name):
+        return AsyncDummyQuery(self, name, self.lookup_rows)
+
+
+def test_concurrent_identical_searches_share_one_backend_call(monkeypatch):
+    search_service.invalidate_document()
+    client = AsyncDummyClient(make_client().rpc_rows, make_client().lookup_rows)
+
+    async def get_client():
+        return client
+
+    monkeypatch.setattr(search_service, "get_async_supabase_client", get_client)
+
+    async def run():
+        return await asyncio.gather(*[
+            search_service.search_chunks_async(q, 2) for q in ("metformin", "Metformin!", "metformin ")
+        ])
+
+    results = asyncio.run(run())
+
+    assert all([r["url"] for r in res] == ["https://a", None] for res in results)
+    assert [name for name, _ in client.calls].count("rpc") == 1
+    assert search_service.result_cache_stats()["in_flight"] == 0
+
+
+def test_search_batch_dedupes_queries_and_enriches_once(monkeypatch):
+    search_service.invalidate_document()
+    client = AsyncDummyClient(make_client().rpc_rows, make_client().lookup_rows)
+
+    async def get_client():
+        return client
+
+    monkeypatch.setattr(search_service, "get_async_supabase_client", get_client)
+
+    batch = [("metformin", 2, None), ("insulin", 2, None), ("Metformin?", 2, None)]
+    outputs = asyncio.run(search_service.search_batch_async(batch))
+
+    assert [o["query"] for o in outputs] == ["metformin", "insulin", "Metformin?"]
+    assert all([r["url"] for r in o["results"]] == ["https://a", None] for o in outputs)
+    assert [name for name, _ in client.calls].count("rpc") == 2
+    assert client.calls.count((search_service.URL_LOOKUP_VIEW, ["d1", "d2"])) == 1
+    assert len(client.calls) == 3
+
+
+def test_search_batch_returns_unenriched_results_when_the_lookup_fails(monkeypatch):
+    search_service.invalidate_document()
+    client = AsyncDummyClient(make_client().rpc_rows, make_client().lookup_rows)
+    lookups = []
+
+    class FailingLookup(AsyncDummyQuery):
+        async def execute(self):
+            lookups.append(self.ids)
+            if len(lookups) == 1:
+                raise RuntimeError("lookup view unavailable")
+            return await super().execute()
+
+    client.table = lambda name: FailingLookup(client, name, client.lookup_rows)
+
+    async def get_client():
+        return client
+
+    monkeypatch.setattr(search_service, "get_async_supabase_client", get_client)
+
+    outputs = asyncio.run(search_service.search_batch_async([("metformin", 2, None), ("insulin", 2, None)]))
+    assert [[(r["id"], r["url"]) for r in o["results"]] for o in outputs] == [[(1, None), (2, None)]] * 2
+
+    # unenriched results are not cached: the next batch looks the URLs up again
+    outputs = asyncio.run(search_service.search_batch_async([("metformin", 2, None)]))
+    assert [r["url"] for r in outputs[0]["results"]] == ["https://a", None]
+    assert len(lookups) == 2
+
+
+def test_bm25_index_is_loaded_off_the_event_loop(monkeypatch):
+    threads = []
+
+    class Index:
+        def search(self, query, top_k, document_id):
+            return []
+
+    def get_index():
+        # building or reloading the snapshot is slow synchronous work
+        threads.append(threading.current_thread())
+        return Index()
+
+    monkeypatch.setattr(search_service.settings, "search_backend", "bm25")
+    monkeypatch.setattr(search_service.bm25_index, "get_index", get_index)
+
+    async def run():
+        results = await search_service._run_backend_async(None, "metformin", 3, None)
+        return results, threading.current_thread()
+
+    results, loop_thread = asyncio.run(run())
+    assert results == []
+    assert threads and threads[0] is not loop_thread
@@ -0,0 +1,82 @@
+from contextlib import contextmanager
+
+import clients
+import storage_reader
+from storage_reader import PageLimiter, read_pages
+
+
+def pieces(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_form_feed_pages_are_cut_on_the_fly():
+    text = "first page\fsecond page\fthird page\ffourth"
+    assert read_pages(pieces(text.encode(), 3), max_pages=2) == "first page\n\nsecond page"
+
+
+def test_page_markers_match_the_whole_text_split():
+    text = "Intro\nPage 1\nTreatment\n\n  Page 2 Metformin\nPage 3\nrest"
+    # same result as re.split(r"\n\s*Page\s+\d+\b", text)[:2] joined by blank lines
+    assert read_pages(pieces(text.encode(), 4), max_pages=2) == "Intro\n\n\nTreatment"
+
+
+def test_fewer_pages_than_the_limit_returns_the_file_unchanged():
+    text = "Page 1 heading\nbody\fsecond"
+    assert read_pages(pieces(text.encode(), 5), max_pages=3) == text
+    assert read_pages(pieces(text.encode(), 5), max_pages=0) == text
+
+    markers = "Intro\nPage 1\nTreatment\n\n  Page 2 Metformin\nrest"
+    for size in (1, 4, 64):
+        assert read_pages(pieces(markers.encode(), size), max_pages=5) == markers
+
+
+def test_multibyte_characters_split_across_chunks():
+    text = "Glykämie – 血糖\fnext"
+    assert read_pages(pieces(text.encode(), 1), max_pages=1) == "Glykämie – 血糖"
+
+
+def test_feed_reports_when_the_limit_is_reached():
+    limiter = PageLimiter(1)
+    assert limiter.feed("one\nPage") is False
+    assert limiter.feed(" 2\ntwo") is True
+    assert limiter.close() == "one"
+
+
+class FakeResponse:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.read = 0
+
+    def raise_for_status(self):
+        pass
+
+    def iter_bytes(self, chunk_size):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+
+def test_read_text_stops_downloading_after_the_page_limit(monkeypatch):
+    response = FakeResponse([b"a\f", b"b\f", b"c\f", b"d\f", b"e"])
+    requested = []
+
+    class FakeHttp:
+        @contextmanager
+        def stream(self, method, url):
+            requested.append((method, url))
+            yield response
+
+    class FakeBucket:
+        def create_signed_url(self, path, expires_in):
+            return {"signedURL": f"https://storage.test/{path}?token=t"}
+
+    class FakeStorage:
+        def from_(self, bucket):
+            return FakeBucket()
+
+    client = type("FakeClient", (), {"storage": FakeStorage()})()
+    monkeypatch.setattr(clients, "get_http_client", lambda: FakeHttp())
+
+    assert storage_reader.read_text(client, "bucket", "folder/doc.txt", max_pages=2) == "a\n\nb"
+    assert requested == [("GET", "https://storage.test/folder/doc.txt?token=t")]
+    assert response.read == 2
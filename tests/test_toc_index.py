@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import data_version
+import toc_index
+
+
+def test_build_toc_keeps_document_order_and_levels():
+    chunks = [
+        {"heading": "Treatment", "level": 1, "position": 2},
+        {"heading": "Introduction", "level": 1, "position": 0},
+        {"heading": "Scope", "level": 2, "position": 1},
+        {"heading": "Treatment", "level": 1, "position": 3},
+    ]
+    toc = toc_index.build_toc(chunks)
+
+    assert [e["heading"] for e in toc] == ["Introduction", "Scope", "Treatment"]
+    assert toc_index.format_toc(toc) == "- Introduction\n  - Scope\n- Treatment"
+
+
+def test_get_toc_is_cached_until_invalidated(monkeypatch):
+    calls = []
+
+    class DummyRes:
+        def __init__(self, data):
+            self.data = data
+
+    class DummyTable:
+        def select(self, *_args, **_kwargs):
+            return self
+
+        def eq(self, *_args, **_kwargs):
+            return self
+
+        def limit(self, *_args, **_kwargs):
+            return self
+
+        def execute(self):
+            calls.append(1)
+            return DummyRes([{"toc": [{"heading": "Introduction", "level": 1, "position": 0}]}])
+
+    class DummyClient:
+        def table(self, *_args, **_kwargs):
+            return DummyTable()
+
+    toc_index.invalidate_toc()
+    monkeypatch.setattr(toc_index, "get_supabase_client", lambda: DummyClient())
+    monkeypatch.setattr(data_version, "current", lambda: "v1")
+
+    assert toc_index.get_toc("doc")[0]["heading"] == "Introduction"
+    toc_index.get_toc("doc")
+    assert len(calls) == 1
+
+    toc_index.invalidate_toc("doc")
+    toc_index.get_toc("doc")
+    assert len(calls) == 2
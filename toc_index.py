@@ -0,0 +1,74 @@
+from typing import Dict, List, Optional
+
+import data_version
+from cache import LRUCache
+from config import get_settings
+from supabase_client import get_supabase_client
+
+settings = get_settings()
+
+# (document id, local version, shared data version) -> ordered TOC entries
+_toc_cache = LRUCache(settings.toc_cache_entries, settings.toc_cache_ttl_seconds or None)
+# bumped by invalidate_toc when this process re-ingests a document; ingestion in
+# another process is picked up through data_version instead
+_versions: Dict[str, int] = {}
+
+
+def build_toc(chunks: List[Dict]) -> List[Dict]:
+    """
+    Ordered, de-duplicated table of contents from chunk dicts with
+    "heading", "level" and "position" keys (as produced by chunk_by_headings).
+    """
+    toc = []
+    seen = set()
+    for chunk in sorted(chunks, key=lambda c: c.get("position", 0)):
+        heading = chunk.get("heading")
+        if not heading or heading in seen:
+            continue
+        seen.add(heading)
+        toc.append({"heading": heading, "level": chunk.get("level", 1), "position": chunk.get("position", 0)})
+    return toc
+
+
+def format_toc(toc: List[Dict]) -> str:
+    return "\n".join(f"{'  ' * (max(entry.get('level', 1), 1) - 1)}- {entry['heading']}" for entry in toc)
+
+
+def invalidate_toc(doc_id: Optional[str] = None) -> None:
+    """Forget the cached TOC of one document (or of every document when doc_id is None)."""
+    if doc_id is None:
+        _versions.clear()
+        _toc_cache.clear()
+        return
+    _versions[doc_id] = _versions.get(doc_id, 0) + 1
+
+
+def get_toc(doc_id: str) -> List[Dict]:
+    """
+    TOC for a document, built at ingest time and stored on documents.toc.
+    Served from memory until the document is re-ingested (here or, within
+    DATA_VERSION_CHECK_SECONDS, in another process); documents ingested before the
+    toc column existed fall back to one ordered scan of their chunk headings.
+    """
+    key = (doc_id, _versions.get(doc_id, 0), data_version.current())
+    toc = _toc_cache.get(key)
+    if toc is not None:
+        return toc
+
+    sb = get_supabase_client()
+    res = sb.table("documents").select("toc").eq("id", doc_id).limit(1).execute()
+    toc = res.data[0].get("toc") if res.data else None
+
+    if not toc:
+        rows = sb.table("chunks") \
+            .select("section_heading, position_in_doc") \
+            .eq("document_id", doc_id) \
+            .order("position_in_doc") \
+            .execute().data or []
+        toc = build_toc([
+            {"heading": row["section_heading"], "level": 1, "position": row.get("position_in_doc") or 0}
+            for row in rows
+        ])
+
+    _toc_cache.set(key, toc)
+    return toc